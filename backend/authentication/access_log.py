@@ -0,0 +1,297 @@
+import atexit
+import base64
+import csv
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import VPNAccessLog
+
+
+class AccessLogWriter:
+    """VPN 접근 로그 버퍼 기록기
+
+    요청 경로에서는 메모리 버퍼에 이벤트만 추가하고, 백그라운드 스레드가
+    크기 기준(ACCESS_LOG_BATCH_SIZE) 또는 시간 기준(ACCESS_LOG_FLUSH_INTERVAL)에
+    도달하면 bulk_create로 한 번에 저장한다. 프로세스 종료 시 남은 이벤트를 저장하며,
+    ACCESS_LOG_SYNC가 켜져 있으면 (테스트용) 호출 즉시 저장한다.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, max_buffer=None):
+        self.batch_size = batch_size or getattr(settings, 'ACCESS_LOG_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'ACCESS_LOG_FLUSH_INTERVAL', 1.0)
+        # 저장이 계속 실패할 때 메모리가 무한히 늘지 않도록 버퍼 상한을 둠
+        self.max_buffer = max_buffer or getattr(settings, 'ACCESS_LOG_MAX_BUFFER', 10000)
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+
+    @property
+    def sync(self):
+        return getattr(settings, 'ACCESS_LOG_SYNC', False)
+
+    def log(self, **fields):
+        """접근 로그 이벤트 추가 (이벤트 발생 시각을 access_time으로 보존)"""
+        fields.setdefault('access_time', timezone.now())
+        self._enqueue([VPNAccessLog(**fields)])
+
+    async def alog(self, **fields):
+        """비동기 뷰용 log (버퍼 추가는 바로, 즉시 저장 모드면 스레드에서 저장)"""
+        if self.sync or self._closed:
+            fields.setdefault('access_time', timezone.now())
+            await sync_to_async(self.log)(**fields)
+        else:
+            self.log(**fields)
+
+    def log_many(self, entries):
+        """여러 이벤트를 한 번에 추가 (필드 dict 목록)"""
+        for fields in entries:
+            self.log(**fields)
+
+    def flush(self):
+        """버퍼에 쌓인 이벤트를 즉시 저장, 저장한 건수 반환"""
+        with self._condition:
+            pending, self._buffer = self._buffer, []
+        if not pending:
+            return 0
+        return self._write(pending)
+
+    def close(self):
+        """남은 이벤트를 저장하고 백그라운드 스레드 종료"""
+        self._closed = True
+        with self._condition:
+            self._condition.notify()
+        self.flush()
+
+    def stats(self):
+        with self._condition:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'written': self.written,
+            'flushes': self.flushes,
+            'dropped': self.dropped,
+        }
+
+    def _enqueue(self, items):
+        if self.sync or self._closed:
+            self._write(items)
+            return
+
+        self._ensure_thread()
+        with self._condition:
+            self._buffer.extend(items)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def _write(self, entries):
+        with self._flush_lock:
+            try:
+                VPNAccessLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            except Exception as e:
+                print(f"Access log flush failed ({len(entries)} events): {str(e)}")
+                self._requeue(entries)
+                return 0
+            self.written += len(entries)
+            self.flushes += 1
+            return len(entries)
+
+    def _requeue(self, entries):
+        if self.sync or self._closed:
+            self.dropped += len(entries)
+            return
+        with self._condition:
+            room = max(self.max_buffer - len(self._buffer), 0)
+            self._buffer[:0] = entries[:room]
+            self.dropped += len(entries) - min(room, len(entries))
+
+    def _ensure_thread(self):
+        # gunicorn이 fork한 워커에서는 부모의 스레드가 없으므로 워커별로 새로 시작
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._buffer = []
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            deadline = time.monotonic() + self.flush_interval
+            with self._condition:
+                while len(self._buffer) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            close_old_connections()
+            self.flush()
+
+
+access_log_writer = AccessLogWriter()
+atexit.register(access_log_writer.close)
+
+
+# 접근 로그 API 공통 필드 (values()로 조회하여 모델 인스턴스를 만들지 않음)
+ACCESS_LOG_FIELDS = ('id', 'username', 'client_ip', 'access_time', 'two_factor_verified', 'access_granted')
+
+
+def encode_cursor(access_time, log_id):
+    """(access_time, id) 커서를 URL에 안전한 문자열로 변환"""
+    raw = f"{access_time.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        access_time, log_id = raw.rsplit('|', 1)
+        parsed = parse_datetime(access_time)
+        if parsed is None:
+            raise ValueError
+        return parsed, int(log_id)
+    except Exception:
+        raise ValueError('잘못된 cursor 값입니다.')
+
+
+def _parse_datetime_param(value, name, end_of_day=False):
+    """ISO 날짜/일시 파라미터 해석 (날짜만 주어지면 하루의 시작 또는 끝)"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} 형식이 올바르지 않습니다. (예: 2025-07-01 또는 2025-07-01T09:00:00)')
+        parsed = datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_bool_param(value, name):
+    lowered = value.lower()
+    if lowered in ('true', '1', 'granted'):
+        return True
+    if lowered in ('false', '0', 'denied'):
+        return False
+    raise ValueError(f'{name} 값은 true 또는 false 이어야 합니다.')
+
+
+def filter_access_logs(params):
+    """쿼리 파라미터로 접근 로그 QuerySet 구성 (최신순, 잘못된 값이면 ValueError)
+
+    지원 파라미터: username, client_ip, start, end, granted
+    """
+    start = _parse_datetime_param(params['start'], 'start') if params.get('start') else None
+    end = _parse_datetime_param(params['end'], 'end', end_of_day=True) if params.get('end') else None
+
+    queryset = VPNAccessLog.objects.in_time_range(start, end)
+    if params.get('username'):
+        queryset = queryset.filter(username=params['username'])
+    if params.get('client_ip'):
+        queryset = queryset.filter(client_ip=params['client_ip'])
+    if params.get('granted'):
+        queryset = queryset.filter(access_granted=_parse_bool_param(params['granted'], 'granted'))
+    return queryset.order_by('-access_time', '-id')
+
+
+def paginate_access_logs(queryset, cursor=None, limit=50):
+    """(access_time, id) 키셋 페이지네이션
+
+    OFFSET 대신 마지막 행의 (access_time, id)보다 오래된 행만 인덱스에서 읽으므로
+    아무리 깊은 페이지라도 응답 시간이 일정하다. 반환값: (행 목록, 다음 cursor 또는 None)
+
+    OR 조건만으로는 인덱스 범위를 정할 수 없어 (SQLite 는 인덱스 전체를 훑음)
+    access_time <= 커서 시각 조건을 따로 붙여 인덱스 탐색 시작점을 정한다.
+    """
+    if cursor:
+        access_time, log_id = decode_cursor(cursor)
+        queryset = queryset.filter(access_time__lte=access_time).filter(
+            Q(access_time__lt=access_time) | Q(access_time=access_time, id__lt=log_id)
+        )
+
+    rows = list(queryset.values(*ACCESS_LOG_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['access_time'], last['id'])
+    return rows, next_cursor
+
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+
+
+class _EchoWriter:
+    """csv.writer가 쓴 한 줄을 그대로 돌려주는 가짜 파일 객체"""
+
+    def write(self, value):
+        return value
+
+
+def _export_lines(rows, output):
+    if output == 'csv':
+        writer = csv.writer(_EchoWriter())
+        yield writer.writerow(ACCESS_LOG_FIELDS)
+        for row in rows:
+            yield writer.writerow((row[0], row[1], row[2], row[3].isoformat(), row[4], row[5]))
+    else:
+        for row in rows:
+            yield json.dumps({
+                'id': row[0],
+                'username': row[1],
+                'client_ip': row[2],
+                'access_time': row[3].isoformat(),
+                'two_factor_verified': row[4],
+                'access_granted': row[5],
+            }, ensure_ascii=False) + '\n'
+
+
+def stream_access_logs(queryset, output='ndjson', compress=False, chunk_size=None):
+    """접근 로그 내보내기 스트림 (bytes 조각 생성기)
+
+    DB에서 chunk_size 행씩 읽어 바로 직렬화하므로 전체 건수와 무관하게 메모리 사용량이 일정하다.
+    첫 행은 즉시 내보내고 이후에는 chunk_size 행 단위로 묶어 전송하며, compress가 켜져 있으면
+    전송하는 조각마다 gzip 압축을 이어서 적용한다.
+    """
+    chunk_size = chunk_size or getattr(settings, 'ACCESS_LOG_EXPORT_CHUNK_SIZE', 2000)
+    rows = queryset.values_list(*ACCESS_LOG_FIELDS).iterator(chunk_size=chunk_size)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+
+    def encode(parts, final=False):
+        data = ''.join(parts).encode('utf-8')
+        if compressor is None:
+            return data
+        data = compressor.compress(data)
+        # 조각마다 SYNC_FLUSH 하여 압축 중에도 클라이언트가 바로 받을 수 있게 함
+        return data + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    parts = []
+    sent_first = False
+    for line in _export_lines(rows, output):
+        parts.append(line)
+        if not sent_first or len(parts) >= chunk_size:
+            yield encode(parts)
+            parts = []
+            sent_first = True
+    if parts or compressor is not None:
+        yield encode(parts, final=True)
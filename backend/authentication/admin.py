@@ -1,7 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group, User
 from django.contrib.auth.admin import UserAdmin
-from .models import VPNGroupPolicy, UserTwoFactorAuth, VPNAccessLog
+from .models import VPNGroupPolicy, UserTwoFactorAuth, TwoFactorBackupCode, VPNAccessLog, SlackNotification
+
+class TwoFactorBackupCodeInline(admin.TabularInline):
+    model = TwoFactorBackupCode
+    fields = ['prefix', 'used_at', 'created_at']
+    readonly_fields = ['prefix', 'used_at', 'created_at']
+    extra = 0
+    
+    def has_add_permission(self, request, obj=None):
+        return False  # 백업 코드는 발급 API로만 생성 (평문은 저장하지 않음)
 
 @admin.register(UserTwoFactorAuth)
 class UserTwoFactorAuthAdmin(admin.ModelAdmin):
@@ -9,13 +18,14 @@ class UserTwoFactorAuthAdmin(admin.ModelAdmin):
     list_filter = ['is_enabled', 'created_at']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['secret_key', 'created_at', 'updated_at']
+    inlines = [TwoFactorBackupCodeInline]
     
     fieldsets = (
         ('사용자 정보', {
             'fields': ('user',)
         }),
         ('2FA 설정', {
-            'fields': ('secret_key', 'is_enabled', 'backup_tokens')
+            'fields': ('secret_key', 'is_enabled')
         }),
         ('타임스탬프', {
             'fields': ('created_at', 'updated_at'),
@@ -34,6 +44,17 @@ class VPNAccessLogAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         return False  # 로그는 수동으로 추가할 수 없음
 
+@admin.register(SlackNotification)
+class SlackNotificationAdmin(admin.ModelAdmin):
+    list_display = ['username', 'kind', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['username']
+    readonly_fields = ['user', 'username', 'kind', 'payload', 'attempts', 'last_error', 'created_at', 'sent_at']
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        return False  # 알림은 아웃박스를 통해서만 생성
+
 @admin.register(VPNGroupPolicy)
 class VPNGroupPolicyAdmin(admin.ModelAdmin):
     list_display = ['group', 'require_2fa', 'enable_time_restriction', 'time_restriction_display', 'created_at']
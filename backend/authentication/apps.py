@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        # 판정 캐시 무효화 시그널 등록
+        from . import signals  # noqa: F401
+
+        # 요청별 DB 쿼리 집계 래퍼 (새 DB 연결마다 설치) 와 메트릭 collector 등록
+        from django.db.backends.signals import connection_created
+        from .decision_cache import decision_cache_metrics
+        from .metrics import install_db_wrapper, registry
+        from .notifications import outbox_metrics
+        connection_created.connect(install_db_wrapper)
+        registry.register_collector(decision_cache_metrics)
+        registry.register_collector(outbox_metrics)
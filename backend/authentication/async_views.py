@@ -0,0 +1,169 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .access_log import access_log_writer
+from .backup_codes import looks_like_backup_code
+from .decisions import aget_access_decision
+from .ingest import connection_event_writer
+from .metrics import record_decision
+from .models import UserTwoFactorAuth
+from .notifications import aenqueue_2fa_setup_slack
+from .rate_limit import client_address, verify_limiter
+from .views import _ingest_auth_error, _parse_connection_batch, _status_params, _status_result, _too_many_attempts, _verify_result
+
+# ASGI 서버 (ASYNC_VIEWS=True) 에서 Lambda 가 호출하는 경로를 처리하는 비동기 뷰.
+# DB 를 기다리는 동안 워커가 다른 요청을 처리할 수 있도록 async ORM 을 사용하며,
+# 응답 본문과 판정 로직은 동기 뷰 (views.py) 와 같은 함수를 공유한다.
+# DRF 를 거치지 않으므로 DRF 인증은 적용되지 않으며 (세 API 모두 AllowAny), 동기 check-status 에
+# 걸리는 DRF 요청 제한 (DEFAULT_THROTTLE_CLASSES) 만 _throttle_wait 로 같은 저장소 (기본 캐시) 에 적용한다.
+
+
+async def _limiter(method, *args):
+    """시도 제한 저장소가 공유 캐시면 스레드에서, 프로세스 내 저장소면 바로 호출"""
+    if verify_limiter.store.blocking:
+        return await sync_to_async(method)(*args)
+    return method(*args)
+
+
+def _throttle_wait(request):
+    """DRF 기본 요청 제한을 익명 요청으로 적용, 초과하면 대기 시간 (초) 반환
+
+    Lambda 는 인증 없이 호출하므로 동기 뷰에서도 익명 (클라이언트 IP 기준) 으로 세어지며,
+    DRF 와 마찬가지로 모든 제한을 확인하고 가장 긴 대기 시간을 쓴다.
+    """
+    drf_request = Request(request, authenticators=())
+    durations = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            durations.append(throttle.wait())
+    if not durations:
+        return None
+    return max((duration for duration in durations if duration is not None), default=0)
+
+
+def _throttled(wait):
+    """DRF 의 429 응답과 같은 본문/Retry-After"""
+    response = JsonResponse({'detail': str(Throttled(wait).detail)}, status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+async def check_2fa_status(request):
+    """Lambda에서 호출하는 2FA 상태 확인 API (비동기)"""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    # 요청 제한 저장소 (기본 캐시) 는 동기 API 이므로 스레드에서 확인
+    wait = await sync_to_async(_throttle_wait)(request)
+    if wait is not None:
+        return _throttled(wait)
+    params = _status_params(request)
+    if not params['username']:
+        return JsonResponse({'success': False, 'error': 'Username required'}, status=400)
+
+    try:
+        decision = await aget_access_decision(params['username'])
+        record_decision(decision)
+        payload, log_fields, notify_user = _status_result(decision, params)
+
+        if log_fields:
+            await access_log_writer.alog(**log_fields)
+            print(f"VPN access log recorded for {params['username']} from {params['client_ip']}")
+
+        if notify_user:
+            slack_queued = await aenqueue_2fa_setup_slack(notify_user)
+            print(f"2FA setup Slack message queued for {params['username']}: {slack_queued}")
+
+        return JsonResponse(payload)
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+async def verify_2fa(request):
+    """2FA 토큰 검증 API (비동기)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        username = data.get('username')
+        token = data.get('token')
+        client_ip = data.get('client_ip', request.META.get('REMOTE_ADDR'))
+        # IP 기준 시도 제한은 본문의 client_ip (접근 로그용) 가 아니라 실제 요청 주소로 셈
+        limit_ip = client_address(request)
+
+        # 잠긴 사용자/IP 는 DB 조회 전에 거부
+        rate_limited = getattr(settings, 'VERIFY_RATE_LIMIT_ENABLED', True)
+        if rate_limited:
+            retry_after = await _limiter(verify_limiter.check, username, limit_ip)
+            if retry_after:
+                return _too_many_attempts(retry_after)
+
+        try:
+            two_factor_auth = await UserTwoFactorAuth.objects.select_related('user').aget(user__username=username)
+        except UserTwoFactorAuth.DoesNotExist:
+            if rate_limited:
+                await _limiter(verify_limiter.record_failure, username, limit_ip)
+            raise
+
+        is_valid = await two_factor_auth.averify_token(token)
+
+        used_backup_code = False
+        if not is_valid and two_factor_auth.is_enabled and looks_like_backup_code(token):
+            is_valid = used_backup_code = await two_factor_auth.averify_backup_code(token)
+
+        if rate_limited:
+            if is_valid:
+                await _limiter(verify_limiter.record_success, username, limit_ip)
+            else:
+                await _limiter(verify_limiter.record_failure, username, limit_ip)
+
+        # 첫 번째 인증 성공 시 2FA 활성화 (post_save 신호로 판정 캐시 버전 증가)
+        if is_valid and not two_factor_auth.is_enabled:
+            two_factor_auth.is_enabled = True
+            await two_factor_auth.asave()
+
+        await access_log_writer.alog(
+            user=two_factor_auth.user,
+            username=username,
+            client_ip=client_ip,
+            two_factor_verified=is_valid,
+            access_granted=is_valid
+        )
+
+        return JsonResponse(_verify_result(is_valid, used_backup_code))
+
+    except (User.DoesNotExist, UserTwoFactorAuth.DoesNotExist):
+        return JsonResponse({'success': False, 'error': 'User or 2FA not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+async def log_vpn_connection(request):
+    """VPN 연결 이벤트 수집 API (Connection Handler Lambda용, 비동기)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    rejected = _ingest_auth_error(request)
+    if rejected:
+        return JsonResponse(rejected[0], status=rejected[1])
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON 본문이 올바르지 않습니다.'}, status=400)
+
+    events, body, status_code = _parse_connection_batch(payload)
+    if events:
+        await connection_event_writer.asubmit(events)
+    return JsonResponse(body, status=status_code)
@@ -0,0 +1,61 @@
+import hashlib
+import hmac
+import secrets
+
+BACKUP_CODE_COUNT = 10
+# 헷갈리기 쉬운 문자 (0/O, 1/I) 를 뺀 32자 (문자당 5비트)
+BACKUP_CODE_ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+BACKUP_CODE_GROUPS = 4
+BACKUP_CODE_GROUP_LENGTH = 4
+# 앞 네 글자는 조회 키로 평문 저장, 나머지 12글자 (60비트) 가 비밀 값
+BACKUP_CODE_PREFIX_LENGTH = 4
+BACKUP_CODE_LENGTH = BACKUP_CODE_GROUPS * BACKUP_CODE_GROUP_LENGTH
+
+
+def normalize_code(code):
+    """사용자가 입력한 백업 코드를 비교용 형태로 변환 (구분자/공백 제거, 대문자), 형식이 아니면 None"""
+    if not isinstance(code, str):
+        return None
+    code = code.replace('-', '').replace(' ', '').strip().upper()
+    if len(code) != BACKUP_CODE_LENGTH or any(char not in BACKUP_CODE_ALPHABET for char in code):
+        return None
+    return code
+
+
+def looks_like_backup_code(token):
+    """TOTP 코드 (숫자 6자리) 가 아닌 백업 코드 형식인지 확인 (DB 조회 전에 사용)"""
+    return normalize_code(token) is not None
+
+
+def format_code(code):
+    """XXXX-XXXX-XXXX-XXXX 형태로 표시"""
+    return '-'.join(
+        code[index:index + BACKUP_CODE_GROUP_LENGTH] for index in range(0, len(code), BACKUP_CODE_GROUP_LENGTH)
+    )
+
+
+def hash_code(code, salt):
+    """정규화된 코드의 솔트 SHA-256 해시 (코드 자체가 60비트 이상의 무작위 값이라 느린 KDF 불필요)"""
+    return hashlib.sha256(f'{salt}:{code}'.encode()).hexdigest()
+
+
+def check_code(code, salt, code_hash):
+    return hmac.compare_digest(hash_code(code, salt), code_hash)
+
+
+def generate_codes(count=BACKUP_CODE_COUNT):
+    """접두사가 서로 다른 백업 코드 count 개 생성
+
+    반환값: [(표시용 코드, 접두사, 솔트, 해시), ...]
+    """
+    codes = []
+    prefixes = set()
+    while len(codes) < count:
+        code = ''.join(secrets.choice(BACKUP_CODE_ALPHABET) for _ in range(BACKUP_CODE_LENGTH))
+        prefix = code[:BACKUP_CODE_PREFIX_LENGTH]
+        if prefix in prefixes:
+            continue
+        prefixes.add(prefix)
+        salt = secrets.token_hex(8)
+        codes.append((format_code(code), prefix, salt, hash_code(code, salt)))
+    return codes
@@ -0,0 +1,275 @@
+import json
+import platform
+import time
+from datetime import time as dt_time, timedelta
+
+import django
+import pyotp
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from .decision_cache import decision_cache
+from .decisions import get_access_decision
+from .directory import chunked
+from .loadgen import percentile
+from .models import UserTwoFactorAuth, VPNAccessLog, VPNGroupPolicy
+from .qr import qr_cache
+
+# 결과 JSON 형식 버전 (필드가 바뀌면 올려서 이전 결과와 섞이지 않게 함)
+BENCHMARK_SCHEMA_VERSION = 1
+SEED_CHUNK_SIZE = 5000
+# 결과 비교 키 (같은 케이스, 같은 데이터 크기끼리만 비교)
+RESULT_KEY_FIELDS = ('case', 'users', 'groups', 'logs')
+# 테스트 트랜잭션/롤백용 세이브포인트는 실제 요청 경로의 쿼리가 아니므로 세지 않음
+_TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryCounter:
+    """측정 중인 호출에서 실행된 쿼리 수 (connection.execute_wrapper 로 설치)"""
+
+    def __init__(self):
+        self.active = False
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active and not sql.lstrip().upper().startswith(_TRANSACTION_CONTROL):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed_dataset(users, groups, logs, prefix='bench'):
+    """벤치마크 데이터 생성 (사용자마다 같은 groups 개 그룹에 소속, 시간 제한 정책 포함)
+
+    접근 로그는 사용자들에게 돌아가며 최근 90일에 고르게 나눠 기록한다.
+    반환값: {'usernames', 'secrets', 'policies'}
+    """
+    Group.objects.bulk_create([Group(name=f'{prefix}-group-{index}') for index in range(groups)])
+    group_objects = list(Group.objects.filter(name__startswith=f'{prefix}-group-').order_by('id'))
+    VPNGroupPolicy.objects.bulk_create([
+        VPNGroupPolicy(
+            group=group,
+            enable_time_restriction=True,
+            allowed_start_time=dt_time(0, 0),
+            allowed_end_time=dt_time(23, 59),
+            allowed_weekdays='1,2,3,4,5,6,7',
+        )
+        for group in group_objects
+    ])
+
+    usernames = [f'{prefix}-user-{index}' for index in range(users)]
+    # 비밀번호 해시는 한 번만 계산 (VPN 전용 계정과 같은 로그인 불가 비밀번호)
+    password = make_password(None)
+    secrets = {}
+    membership = User.groups.through
+    for chunk in chunked(usernames, SEED_CHUNK_SIZE):
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@company.com', password=password) for username in chunk
+        ])
+        user_ids = dict(User.objects.filter(username__in=chunk).values_list('username', 'id'))
+        two_factor_auths = []
+        for username in chunk:
+            secrets[username] = pyotp.random_base32()
+            two_factor_auths.append(UserTwoFactorAuth(
+                user_id=user_ids[username], secret_key=secrets[username], is_enabled=True
+            ))
+        UserTwoFactorAuth.objects.bulk_create(two_factor_auths)
+        membership.objects.bulk_create([
+            membership(user_id=user_ids[username], group_id=group.id) for username in chunk for group in group_objects
+        ], batch_size=SEED_CHUNK_SIZE)
+
+    if logs and users:
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        now = timezone.now()
+        spacing = timedelta(days=90) / logs
+        for chunk in chunked(range(logs), SEED_CHUNK_SIZE):
+            entries = []
+            for index in chunk:
+                username = usernames[index % users]
+                entries.append(VPNAccessLog(
+                    user_id=user_ids[username],
+                    username=username,
+                    client_ip=f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}',
+                    access_time=now - spacing * index,
+                    two_factor_verified=True,
+                    access_granted=True,
+                ))
+            VPNAccessLog.objects.bulk_create(entries)
+
+    policies = list(VPNGroupPolicy.objects.filter(group__in=group_objects).order_by('id'))
+    return {'usernames': usernames, 'secrets': secrets, 'policies': policies}
+
+
+def _client_ip(index):
+    # DRF 익명 요청 제한 (IP별) 에 걸리지 않도록 요청마다 다른 IP 사용
+    return f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+
+
+def build_cases(dataset):
+    """측정 케이스 목록 [(이름, 준비 함수 또는 None, 측정 함수)]
+
+    준비 함수는 측정 시간과 쿼리 수에 포함되지 않는다 (캐시 비우기/채우기, 토큰 재사용 기록 초기화 등).
+    """
+    usernames = dataset['usernames']
+    secrets = dataset['secrets']
+    policies = dataset['policies']
+    client = Client()
+    cases = []
+
+    two_factor_auths = list(
+        UserTwoFactorAuth.objects.select_related('user').filter(user__username__in=usernames[:1000]).order_by('id')
+    )
+    if two_factor_auths:
+        tokens = [pyotp.TOTP(auth.secret_key).now() for auth in two_factor_auths]
+
+        def verify_token_valid(index):
+            # 재사용 방지 기록 (DB 갱신) 을 빼고 토큰 계산/비교 비용만 측정
+            two_factor_auths[index % len(two_factor_auths)].verify_token(tokens[index % len(tokens)], consume=False)
+
+        def verify_token_invalid(index):
+            two_factor_auths[index % len(two_factor_auths)].verify_token('000000')
+
+        def get_qr_code(index):
+            two_factor_auths[index % len(two_factor_auths)].get_qr_code()
+
+        cases += [
+            ('verify_token.valid', None, verify_token_valid),
+            ('verify_token.invalid', None, verify_token_invalid),
+            ('get_qr_code.render', lambda index: qr_cache.clear(), get_qr_code),
+            ('get_qr_code.cached', get_qr_code, get_qr_code),
+        ]
+
+    if policies:
+        def is_access_allowed_now(index):
+            policies[index % len(policies)].is_access_allowed_now()
+
+        cases.append(('is_access_allowed_now', None, is_access_allowed_now))
+
+    if usernames:
+        def check_status(index):
+            return client.get('/api/auth/check-status/', {
+                'username': usernames[index % len(usernames)], 'send_email': 'false', 'source': 'lambda_vpn_check',
+            }, REMOTE_ADDR=_client_ip(index))
+
+        def warm_decision(index):
+            get_access_decision(usernames[index % len(usernames)])
+
+        def reset_step(index):
+            UserTwoFactorAuth.objects.filter(user__username=usernames[index % len(usernames)]).update(last_totp_step=None)
+
+        def verify(index, valid=True):
+            username = usernames[index % len(usernames)]
+            token = pyotp.TOTP(secrets[username]).now() if valid else '000000'
+            return client.post('/api/auth/verify-2fa/', {
+                'username': username, 'token': token, 'client_ip': _client_ip(index),
+            }, content_type='application/json')
+
+        def verify_invalid(index):
+            return verify(index, valid=False)
+
+        cases += [
+            ('check_2fa_status.miss', lambda index: decision_cache.clear(), check_status),
+            ('check_2fa_status.hit', warm_decision, check_status),
+            ('verify_2fa.valid', reset_step, verify),
+            ('verify_2fa.invalid', None, verify_invalid),
+        ]
+    return cases
+
+
+def measure(prepare, operation, iterations, warmup, counter):
+    """호출마다 시간을 재서 요약 (마이크로초), 쿼리 수는 호출당 평균, 4xx/5xx 응답은 errors 로 집계"""
+    for index in range(warmup):
+        if prepare:
+            prepare(index)
+        operation(index)
+
+    timings = []
+    errors = 0
+    counter.count = 0
+    for index in range(iterations):
+        if prepare:
+            prepare(index)
+        counter.active = True
+        started = time.perf_counter()
+        response = operation(index)
+        timings.append(time.perf_counter() - started)
+        counter.active = False
+        if getattr(response, 'status_code', 200) >= 400:
+            errors += 1
+
+    ordered = sorted(timings)
+    return {
+        'iterations': iterations,
+        'mean_us': round(sum(ordered) / len(ordered) * 1e6, 2),
+        'min_us': round(ordered[0] * 1e6, 2),
+        'p50_us': round(percentile(ordered, 0.50) * 1e6, 2),
+        'p95_us': round(percentile(ordered, 0.95) * 1e6, 2),
+        'p99_us': round(percentile(ordered, 0.99) * 1e6, 2),
+        'queries_per_op': round(counter.count / iterations, 2),
+        'errors': errors,
+    }
+
+
+def run_dataset(users, groups, logs, iterations, warmup=5, cases=None):
+    """데이터를 만들고 케이스별로 측정 (호출하는 쪽에서 트랜잭션으로 감싸 롤백할 것)"""
+    decision_cache.clear()
+    qr_cache.clear()
+    started = time.perf_counter()
+    dataset = seed_dataset(users, groups, logs)
+    seed_seconds = time.perf_counter() - started
+
+    counter = QueryCounter()
+    results = []
+    with connection.execute_wrapper(counter):
+        for name, prepare, operation in build_cases(dataset):
+            if cases and name not in cases and name.split('.')[0] not in cases:
+                continue
+            result = measure(prepare, operation, iterations, warmup, counter)
+            results.append({'case': name, 'users': users, 'groups': groups, 'logs': logs, **result})
+    return results, round(seed_seconds, 3)
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+    }
+
+
+def result_key(result):
+    return tuple(result[field] for field in RESULT_KEY_FIELDS)
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    if report.get('schema') != BENCHMARK_SCHEMA_VERSION:
+        raise ValueError(f"결과 형식 버전이 다릅니다: {report.get('schema')} (현재 {BENCHMARK_SCHEMA_VERSION})")
+    return report
+
+
+def compare_results(baseline, results, max_slowdown):
+    """기준 결과와 비교하여 회귀 목록 반환
+
+    쿼리 수는 실행 환경과 무관하므로 늘어나면 바로 회귀로 보고, 시간은 p50 이 기준의
+    max_slowdown 배를 넘을 때만 회귀로 본다 (같은 장비에서 측정한 기준과 비교할 것).
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        name = '{} (users={}, groups={}, logs={})'.format(*result_key(result))
+        if result['queries_per_op'] > before['queries_per_op']:
+            regressions.append(f"{name}: 쿼리 {before['queries_per_op']} -> {result['queries_per_op']}")
+        if before['p50_us'] and result['p50_us'] > before['p50_us'] * max_slowdown:
+            regressions.append(
+                f"{name}: p50 {before['p50_us']}µs -> {result['p50_us']}µs "
+                f"({result['p50_us'] / before['p50_us']:.2f}배)"
+            )
+    return regressions
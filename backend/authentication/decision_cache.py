@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class DecisionCache:
+    """프로세스 내 접근 판정 LRU 캐시
+
+    - 최대 항목 수를 넘으면 가장 오래 사용되지 않은 항목부터 제거
+    - 항목별 만료 시각 (시간 제한 정책이 바뀌는 시각까지만 유효)
+    - 항목마다 DB 버전 카운터 값을 함께 저장하여, 다른 워커/노드에서 변경이 생기면 무효화
+    """
+
+    def __init__(self, max_entries=10000, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """유효한 항목이면 값 반환, 없거나 만료/버전 불일치면 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version == version and time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, version, ttl=None):
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+decision_cache = DecisionCache(
+    max_entries=getattr(settings, 'DECISION_CACHE_MAX_ENTRIES', 10000),
+    default_ttl=getattr(settings, 'DECISION_CACHE_TTL', 60),
+)
+
+
+def decision_cache_metrics():
+    """메트릭 collector: 프로세스 내 판정 캐시 통계"""
+    stats = decision_cache.stats()
+    return [
+        ('vpn_decision_cache_entries', 'gauge', '판정 캐시 항목 수', [({}, stats['size'])]),
+        ('vpn_decision_cache_lookups_total', 'counter', '판정 캐시 조회 수 (적중 여부별)', [
+            ({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses']),
+        ]),
+        ('vpn_decision_cache_evictions_total', 'counter', '판정 캐시 용량 초과로 제거된 항목 수', [({}, stats['evictions'])]),
+    ]
+
+
+GLOBAL_VERSION_PK = 1
+
+
+def _versions_queryset(username):
+    """전체 버전 (pk=1) 과 사용자별 버전 행을 한 번에 조회하는 QuerySet"""
+    from .models import DecisionCacheVersion
+    condition = Q(pk=GLOBAL_VERSION_PK)
+    if username is not None:
+        condition |= Q(username=username)
+    return DecisionCacheVersion.objects.filter(condition).values_list('username', 'version')
+
+
+def _combine_versions(rows, username):
+    versions = dict(rows)
+    if username is None:
+        return versions.get(None, 0)
+    return versions.get(None, 0), versions.get(username, 0)
+
+
+def get_cache_version(username=None):
+    """DB에 저장된 판정 캐시 버전 (모든 워커/노드가 공유)
+
+    username 을 주면 (전체 버전, 사용자별 버전) 을 쿼리 한 번으로 조회한다. 그룹 정책처럼 여러
+    사용자에게 영향을 주는 변경은 전체 버전을, 한 사용자의 2FA/계정 변경은 그 사용자 버전만 올린다.
+    """
+    return _combine_versions(_versions_queryset(username), username)
+
+
+async def aget_cache_version(username=None):
+    return _combine_versions([row async for row in _versions_queryset(username)], username)
+
+
+def bump_cache_version():
+    """판정에 영향을 주는 데이터가 바뀌었음을 모든 워커/노드에 알림 (전체 사용자)"""
+    from .models import DecisionCacheVersion
+    updated = DecisionCacheVersion.objects.filter(pk=GLOBAL_VERSION_PK).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        DecisionCacheVersion.objects.get_or_create(pk=GLOBAL_VERSION_PK, defaults={'version': 1})
+
+
+def bump_user_cache_version(*usernames):
+    """특정 사용자들의 판정만 모든 워커/노드에서 무효화 (다른 사용자의 캐시 항목은 유지)"""
+    from .models import DecisionCacheVersion
+    for username in {username for username in usernames if username}:
+        updated = DecisionCacheVersion.objects.filter(username=username).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            # 전체 버전 행이 먼저 있어야 사용자 행이 pk=1 을 차지하지 않음
+            DecisionCacheVersion.objects.get_or_create(pk=GLOBAL_VERSION_PK, defaults={'version': 0})
+            DecisionCacheVersion.objects.get_or_create(username=username, defaults={'version': 1})
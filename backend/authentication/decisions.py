@@ -0,0 +1,137 @@
+import time
+
+from django.contrib.auth.models import Group, User
+from django.db.models import Prefetch
+
+from .decision_cache import aget_cache_version, decision_cache, get_cache_version
+from .models import UserTwoFactorAuth
+from .policy_engine import evaluate_policies
+
+
+def _empty_decision():
+    return {
+        'user_id': None,
+        'is_active': False,
+        'has_2fa': False,
+        'is_enabled': False,
+        'has_secret': False,
+        'time_restriction_error': None,
+        'changes_at': None,
+    }
+
+
+def _decision_queryset():
+    """판정 조회 QuerySet (고정된 2개 쿼리, 그룹 수와 무관)
+
+    1) 사용자 + 2FA 레코드 (LEFT JOIN)
+    2) 시간 제한이 켜진 소속 그룹 + 정책 (JOIN)
+    """
+    restricted_groups = Prefetch(
+        'groups',
+        queryset=Group.objects.filter(vpn_policy__enable_time_restriction=True).select_related('vpn_policy'),
+        to_attr='restricted_groups',
+    )
+    return (
+        User.objects.select_related('two_factor_auth')
+        .prefetch_related(restricted_groups)
+        .only('id', 'username', 'is_active', 'two_factor_auth__id', 'two_factor_auth__is_enabled', 'two_factor_auth__secret_key')
+    )
+
+
+def _build_decision(user, username):
+    """조회한 사용자 (그룹/정책/2FA 포함) 로 판정 구성 (DB 조회 없음)"""
+    decision = _empty_decision()
+    decision['user_id'] = user.pk
+    decision['is_active'] = user.is_active
+
+    # 비활성화된 사용자 (퇴사자, 디렉터리에서 잠긴 계정) 는 2FA/시간 제한과 관계없이 거부
+    if not user.is_active:
+        print(f"Inactive user denied: {username}")
+        return decision
+
+    # 사용자 그룹별 시간 제한 정책 수집
+    compiled_policies = []
+    for group in user.restricted_groups:
+        try:
+            compiled_policies.append(group.vpn_policy.compiled())
+        except Exception as e:
+            print(f"Error checking time restriction for group {group.name}: {e}")
+            continue
+
+    # 모든 정책을 한 번에 판정하고, 판정이 바뀌는 시각까지를 유효 기간으로 사용
+    if compiled_policies:
+        is_allowed, time_message, changes_at = evaluate_policies(compiled_policies)
+        if changes_at is not None:
+            decision['changes_at'] = changes_at.timestamp()
+        if not is_allowed:
+            print(f"Time restriction denied for {username}: {time_message}")
+            decision['time_restriction_error'] = time_message
+            return decision
+        print(f"Time check passed for {username}: {time_message}")
+
+    try:
+        two_factor_auth = user.two_factor_auth
+    except UserTwoFactorAuth.DoesNotExist:
+        return decision
+
+    decision['has_2fa'] = True
+    decision['is_enabled'] = two_factor_auth.is_enabled
+    decision['has_secret'] = bool(two_factor_auth.secret_key)
+    return decision
+
+
+def resolve_access_decision(username):
+    """사용자의 VPN 접근 판정에 필요한 정보를 DB에서 조회
+
+    반환값 (dict):
+        user_id: 사용자 ID (사용자가 없으면 None)
+        is_active: 사용자 활성 여부 (비활성이면 나머지 항목은 조회하지 않음)
+        has_2fa / is_enabled / has_secret: 2FA 레코드 상태
+        time_restriction_error: 시간 제한으로 거부된 경우 사유 메시지
+        changes_at: 시간 제한 정책상 판정이 바뀌는 시각 (epoch 초, 없으면 None)
+    """
+    try:
+        user = _decision_queryset().get(username=username)
+    except User.DoesNotExist:
+        return _empty_decision()
+    return _build_decision(user, username)
+
+
+async def aresolve_access_decision(username):
+    """resolve_access_decision 의 비동기 버전 (async ORM)"""
+    try:
+        user = await _decision_queryset().aget(username=username)
+    except User.DoesNotExist:
+        return _empty_decision()
+    return _build_decision(user, username)
+
+
+def get_access_decision(username):
+    """판정 캐시를 거쳐 접근 판정 조회 (캐시 미스 시 DB 조회 후 저장)"""
+    # 버전을 먼저 읽어야 조회 도중 변경이 생겨도 오래된 판정이 새 버전으로 저장되지 않음
+    version = get_cache_version(username)
+    decision = decision_cache.get(username, version)
+    if decision is not None:
+        return decision
+
+    decision = resolve_access_decision(username)
+    ttl = None
+    if decision['changes_at'] is not None:
+        ttl = decision['changes_at'] - time.time()
+    decision_cache.set(username, decision, version, ttl)
+    return decision
+
+
+async def aget_access_decision(username):
+    """get_access_decision 의 비동기 버전 (캐시 적중 시 버전 카운터 조회 1회만 대기)"""
+    version = await aget_cache_version(username)
+    decision = decision_cache.get(username, version)
+    if decision is not None:
+        return decision
+
+    decision = await aresolve_access_decision(username)
+    ttl = None
+    if decision['changes_at'] is not None:
+        ttl = decision['changes_at'] - time.time()
+    decision_cache.set(username, decision, version, ttl)
+    return decision
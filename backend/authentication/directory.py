@@ -0,0 +1,319 @@
+import base64
+import csv
+import itertools
+import math
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+
+from .decision_cache import bump_cache_version, decision_cache
+
+IMPORT_CHUNK_SIZE = 1000
+# 한 번의 동기화로 비활성화할 수 있는 사용자 수 기본값 (관리 대상 활성 사용자 대비 비율)
+DEFAULT_MAX_DEACTIVATE = '10%'
+
+
+def chunked(iterable, size):
+    """반복자를 size 개씩 묶어서 반환 (전체를 메모리에 올리지 않음)"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_csv_usernames(path):
+    """CSV 첫 번째 열의 사용자명을 한 줄씩 읽음 (첫 줄은 헤더)"""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # 헤더 건너뛰기
+        for row in reader:
+            if row and row[0].strip():
+                yield row[0].strip()
+
+
+def invalidate_decisions():
+    """bulk_create 는 post_save/m2m_changed 신호를 보내지 않으므로 판정 캐시를 직접 무효화"""
+    decision_cache.clear()
+    bump_cache_version()
+
+
+def import_users_chunk(usernames, group):
+    """사용자명 묶음을 생성하고 그룹에 추가 (한 트랜잭션, 고정된 쿼리 수)
+
+    이미 있는 사용자와 그룹 소속은 IN 조회 한 번씩으로 확인하고, 없는 것만 bulk_create 한다.
+    반환값: (생성한 사용자 수, 그룹에 추가한 사용자 수)
+    """
+    usernames = list(dict.fromkeys(usernames))
+    membership = User.groups.through
+
+    with transaction.atomic():
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+        new_users = [
+            # VPN 전용 계정은 Django 로그인 불가능하도록 설정
+            User(username=username, email=f'{username}@company.com', is_active=True, password=make_password(None))
+            for username in usernames if username not in user_ids
+        ]
+        if new_users:
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            # ignore_conflicts 사용 시 pk 가 채워지지 않으므로 새 사용자 ID 를 다시 조회
+            user_ids.update(User.objects.filter(
+                username__in=[user.username for user in new_users]
+            ).values_list('username', 'id'))
+
+        ids = [user_ids[username] for username in usernames if username in user_ids]
+        members = set(membership.objects.filter(group_id=group.id, user_id__in=ids).values_list('user_id', flat=True))
+        new_members = [membership(user_id=user_id, group_id=group.id) for user_id in ids if user_id not in members]
+        if new_members:
+            membership.objects.bulk_create(new_members, ignore_conflicts=True)
+
+        if new_users or new_members:
+            invalidate_decisions()
+
+    return len(new_users), len(new_members)
+
+
+# AD userAccountControl 의 ACCOUNTDISABLE 비트
+AD_ACCOUNT_DISABLED = 0x2
+# LDIF 에서 읽는 속성 (objectGUID, objectSid 같은 바이너리 속성은 해석하지 않음)
+LDIF_ATTRIBUTES = frozenset((
+    'dn', 'objectclass', 'samaccountname', 'uid', 'memberof', 'member', 'cn', 'useraccountcontrol',
+))
+# objectClass 로 항목 종류 판별 (AD 그룹도 sAMAccountName 이 있으므로 그룹을 먼저 확인)
+LDIF_GROUP_CLASSES = frozenset(('group', 'groupofnames', 'groupofuniquenames'))
+LDIF_USER_CLASSES = frozenset(('user', 'person', 'organizationalperson', 'inetorgperson'))
+# AD 컴퓨터 계정은 objectClass 에 user 도 포함하므로 따로 제외
+LDIF_SKIP_CLASSES = frozenset(('computer',))
+GROUP_SEPARATORS = (';', '|')
+
+
+def _split_groups(value):
+    for separator in GROUP_SEPARATORS:
+        value = value.replace(separator, ',')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def parse_directory_csv(path):
+    """CSV 스냅샷 해석 (username, groups, enabled 열, groups 는 ; 또는 | 로 구분)
+
+    반환값: {사용자명: {'groups': 그룹명 집합, 'active': 활성 여부}}
+    """
+    snapshot = {}
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file):
+            username = (row.get('username') or '').strip()
+            if not username:
+                continue
+            enabled = (row.get('enabled') or 'true').strip().lower() not in ('false', '0', 'no', 'disabled')
+            entry = snapshot.setdefault(username, {'groups': set(), 'active': enabled})
+            entry['groups'] |= _split_groups(row.get('groups') or '')
+            entry['active'] = entry['active'] and enabled
+    return snapshot
+
+
+def _iter_ldif_entries(path):
+    """LDIF 항목을 {속성명(소문자): [값 ...]} 형태로 하나씩 반환 (줄 이어쓰기, base64 값 지원)
+
+    LDIF_ATTRIBUTES 에 있는 속성만 반환하므로 바이너리 속성의 base64 값은 디코딩하지 않는다.
+    """
+
+    def parse_entry(lines):
+        entry = {}
+        for line in lines:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name not in LDIF_ATTRIBUTES:
+                continue
+            if value.startswith(':'):
+                value = base64.b64decode(value[1:].strip()).decode('utf-8', errors='replace')
+            else:
+                value = value.strip()
+            entry.setdefault(name, []).append(value)
+        return entry
+
+    lines = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for raw in file:
+            line = raw.rstrip('\r\n')
+            if line.startswith(' ') and lines:
+                lines[-1] += line[1:]
+            elif not line.strip():
+                if lines:
+                    yield parse_entry(lines)
+                    lines = []
+            elif not line.startswith('#'):
+                lines.append(line)
+    if lines:
+        yield parse_entry(lines)
+
+
+def _cn_from_dn(dn):
+    first = dn.split(',', 1)[0]
+    name, _, value = first.partition('=')
+    return value.strip() if value else dn.strip()
+
+
+def parse_directory_ldif(path):
+    """LDIF 스냅샷 해석 (사용자 항목의 memberOf 와 그룹 항목의 member 모두 지원)
+
+    항목 종류는 objectClass 로 판별하고 (그룹 -> 사용자 순, 컴퓨터 계정 제외), objectClass 가 없는
+    항목만 속성으로 추정한다 (member 가 있으면 그룹, 사용자명이 있으면 사용자).
+    사용자명은 sAMAccountName, 없으면 uid 를 사용한다.
+    반환값: {사용자명: {'groups': 그룹명 집합, 'active': 활성 여부}}
+    """
+    snapshot = {}
+    username_by_dn = {}
+    group_members = []
+
+    for entry in _iter_ldif_entries(path):
+        dn = (entry.get('dn') or [''])[0]
+        username = (entry.get('samaccountname') or entry.get('uid') or [None])[0]
+        object_classes = {value.strip().lower() for value in entry.get('objectclass', [])}
+        if object_classes:
+            is_group = bool(object_classes & LDIF_GROUP_CLASSES)
+            is_user = not is_group and bool(object_classes & LDIF_USER_CLASSES) and not object_classes & LDIF_SKIP_CLASSES
+        else:
+            is_group = 'member' in entry
+            is_user = not is_group and bool(username)
+
+        if is_group:
+            group_name = (entry.get('cn') or [_cn_from_dn(dn)])[0]
+            group_members.append((group_name, entry.get('member', [])))
+        elif is_user and username:
+            control = (entry.get('useraccountcontrol') or ['0'])[0]
+            active = not (int(control) & AD_ACCOUNT_DISABLED) if control.isdigit() else True
+            user = snapshot.setdefault(username, {'groups': set(), 'active': active})
+            user['groups'] |= {_cn_from_dn(group_dn) for group_dn in entry.get('memberof', [])}
+            username_by_dn[dn.lower()] = username
+
+    for group_name, member_dns in group_members:
+        for member_dn in member_dns:
+            username = username_by_dn.get(member_dn.lower())
+            if username:
+                snapshot[username]['groups'].add(group_name)
+    return snapshot
+
+
+def load_directory_state(group_names):
+    """DB의 현재 상태를 한 번에 조회 (관리 대상: 스태프/관리자가 아닌 사용자, 스냅샷에 나온 그룹)"""
+    membership = User.groups.through
+    users = {
+        username: {'id': user_id, 'active': is_active, 'managed': not (is_staff or is_superuser)}
+        for user_id, username, is_active, is_staff, is_superuser in User.objects.values_list(
+            'id', 'username', 'is_active', 'is_staff', 'is_superuser'
+        )
+    }
+    groups = dict(Group.objects.filter(name__in=group_names).values_list('name', 'id'))
+    members = set(membership.objects.filter(group_id__in=groups.values()).values_list('user_id', 'group_id'))
+    return {'users': users, 'groups': groups, 'members': members}
+
+
+def diff_directory(snapshot, state):
+    """스냅샷과 DB 상태의 차이를 메모리에서 계산
+
+    - 스냅샷에만 있는 사용자/그룹은 생성, 스냅샷에 없거나 비활성인 관리 대상 사용자는 비활성화
+    - 그룹 소속은 스냅샷에 나온 그룹에 대해서만 추가/제거 (그 밖의 Django 그룹은 건드리지 않음)
+    """
+    users = state['users']
+    group_names = {name for entry in snapshot.values() for name in entry['groups']}
+
+    create_users = sorted(
+        (username, entry['active']) for username, entry in snapshot.items() if username not in users
+    )
+    activate = sorted(
+        info['id'] for username, info in users.items()
+        if info['managed'] and not info['active'] and snapshot.get(username, {}).get('active')
+    )
+    deactivate = sorted(
+        info['id'] for username, info in users.items()
+        if info['managed'] and info['active'] and not snapshot.get(username, {}).get('active')
+    )
+
+    desired = {
+        (username, group_name)
+        for username, entry in snapshot.items()
+        if username not in users or users[username]['managed']
+        for group_name in entry['groups']
+    }
+    username_by_id = {info['id']: username for username, info in users.items()}
+    group_name_by_id = {group_id: name for name, group_id in state['groups'].items()}
+    current = {(username_by_id[user_id], group_name_by_id[group_id]) for user_id, group_id in state['members']}
+    removals = {
+        pair for pair in current - desired
+        if users[pair[0]]['managed']
+    }
+
+    return {
+        'create_users': create_users,
+        'create_groups': sorted(group_names - set(state['groups'])),
+        'activate': activate,
+        'deactivate': deactivate,
+        'add_members': sorted(desired - current),
+        'remove_members': sorted(removals),
+    }
+
+
+def deactivation_limit(state, max_deactivate=DEFAULT_MAX_DEACTIVATE):
+    """한 번에 비활성화할 수 있는 사용자 수 (잘못된 값이면 ValueError)
+
+    max_deactivate 는 사람 수 ('50') 또는 관리 대상 활성 사용자 대비 비율 ('10%').
+    비어 있거나 잘린 스냅샷이 전체 사용자를 비활성화하지 않도록 하는 안전장치다.
+    """
+    value = str(max_deactivate).strip()
+    if value.endswith('%'):
+        ratio = float(value[:-1])
+        if ratio < 0:
+            raise ValueError(value)
+        managed_active = sum(1 for info in state['users'].values() if info['managed'] and info['active'])
+        return math.ceil(managed_active * ratio / 100)
+    limit = int(value)
+    if limit < 0:
+        raise ValueError(value)
+    return limit
+
+
+def apply_directory_diff(diff, state, chunk_size=IMPORT_CHUNK_SIZE):
+    """계산된 차이만 일괄 반영 (단계별 트랜잭션), 변경이 있으면 판정 캐시 무효화"""
+    membership = User.groups.through
+    user_ids = {username: info['id'] for username, info in state['users'].items()}
+    group_ids = dict(state['groups'])
+
+    with transaction.atomic():
+        for chunk in chunked(diff['create_users'], chunk_size):
+            User.objects.bulk_create([
+                User(username=username, email=f'{username}@company.com', is_active=active,
+                     password=make_password(None))
+                for username, active in chunk
+            ], ignore_conflicts=True)
+            user_ids.update(User.objects.filter(
+                username__in=[username for username, _ in chunk]
+            ).values_list('username', 'id'))
+        if diff['create_groups']:
+            Group.objects.bulk_create([Group(name=name) for name in diff['create_groups']], ignore_conflicts=True)
+            group_ids.update(Group.objects.filter(name__in=diff['create_groups']).values_list('name', 'id'))
+
+    with transaction.atomic():
+        for chunk in chunked(diff['activate'], chunk_size):
+            User.objects.filter(id__in=chunk).update(is_active=True)
+        for chunk in chunked(diff['deactivate'], chunk_size):
+            User.objects.filter(id__in=chunk).update(is_active=False)
+
+    with transaction.atomic():
+        for chunk in chunked(diff['add_members'], chunk_size):
+            membership.objects.bulk_create([
+                membership(user_id=user_ids[username], group_id=group_ids[group_name])
+                for username, group_name in chunk
+            ], ignore_conflicts=True)
+
+        removals_by_group = {}
+        for username, group_name in diff['remove_members']:
+            removals_by_group.setdefault(group_ids[group_name], []).append(user_ids[username])
+        for group_id, ids in removals_by_group.items():
+            for chunk in chunked(ids, chunk_size):
+                membership.objects.filter(group_id=group_id, user_id__in=chunk).delete()
+
+    if any(diff.values()):
+        invalidate_decisions()
@@ -0,0 +1,79 @@
+import itertools
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+# AWS describe_client_vpn_connections 의 MaxResults 허용 범위
+MIN_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 1000
+
+
+def make_connection(endpoint_id, index, username, status='active', established=None):
+    """AWS 응답과 같은 형태의 Client VPN 연결 항목 생성"""
+    established = established or timezone.now() - timedelta(minutes=index % 600)
+    conn = {
+        'ClientVpnEndpointId': endpoint_id,
+        'Timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'ConnectionId': f'cvpn-connection-{index:017x}',
+        'Username': username,
+        'ConnectionEstablishedTime': established.strftime('%Y-%m-%d %H:%M:%S'),
+        'IngressBytes': '0',
+        'EgressBytes': '0',
+        'IngressPackets': '0',
+        'EgressPackets': '0',
+        'ClientIp': f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}',
+        'CommonName': username,
+        'Status': {'Code': status},
+    }
+    if status == 'terminated':
+        conn['ConnectionEndTime'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    return conn
+
+
+def terminate_connection(conn, ended=None):
+    """스텁 연결을 종료 상태로 변경"""
+    conn['Status'] = {'Code': 'terminated'}
+    conn['ConnectionEndTime'] = (ended or timezone.now()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class StubEC2Client:
+    """describe_client_vpn_connections 만 흉내 내는 로컬 EC2 클라이언트 (테스트/벤치마크용)
+
+    NextToken 페이지네이션과 호출당 지연 시간(latency)을 재현하므로 실제 AWS 없이
+    수만 건 규모의 sync_vpn_connections 를 측정할 수 있다.
+    """
+
+    def __init__(self, connections=None, latency=0.0):
+        self.connections = list(connections or [])
+        self.latency = latency
+        self.calls = 0
+
+    @classmethod
+    def generate(cls, count, usernames, endpoint_id='cvpn-endpoint-stub', terminated_every=0, latency=0.0, start=0):
+        """usernames 를 돌아가며 count 개 연결 생성 (terminated_every 마다 종료된 연결 포함)
+
+        start 는 연결 번호 시작값으로, 여러 스텁 엔드포인트의 ConnectionId 가 겹치지 않게 할 때 사용한다.
+        """
+        usernames = list(usernames) or ['vpnuser']
+        cycle = itertools.cycle(usernames)
+        connections = []
+        for index in range(start, start + count):
+            status = 'terminated' if terminated_every and index % terminated_every == terminated_every - 1 else 'active'
+            connections.append(make_connection(endpoint_id, index, next(cycle), status))
+        return cls(connections, latency=latency)
+
+    def describe_client_vpn_connections(self, ClientVpnEndpointId, MaxResults=None, NextToken=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        page_size = min(max(MaxResults or MAX_PAGE_SIZE, MIN_PAGE_SIZE), MAX_PAGE_SIZE)
+        matching = [conn for conn in self.connections if conn['ClientVpnEndpointId'] == ClientVpnEndpointId]
+        start = int(NextToken or 0)
+        page = matching[start:start + page_size]
+
+        response = {'Connections': page}
+        if start + page_size < len(matching):
+            response['NextToken'] = str(start + page_size)
+        return response
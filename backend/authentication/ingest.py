@@ -0,0 +1,224 @@
+import atexit
+import ipaddress
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .access_log import AccessLogWriter
+from .models import UserTwoFactorAuth, VPNAccessLog
+from .vpn_sync import _chunks, close_connection_logs, insert_connection_logs
+
+CONNECTION_STATUSES = ('connected', 'disconnected')
+
+
+def _get(raw, name):
+    # Lambda 이벤트 원본의 하이픈 표기 (vpn-ip, connection-id ...) 도 허용
+    value = raw.get(name)
+    if value in (None, ''):
+        value = raw.get(name.replace('_', '-'))
+    return value
+
+
+def _parse_ip(value, name, required=False):
+    if not value:
+        if required:
+            raise ValueError(f'{name} 값이 필요합니다.')
+        return None
+    try:
+        return str(ipaddress.ip_address(str(value).strip()))
+    except ValueError:
+        raise ValueError(f'{name} 형식이 올바르지 않습니다: {value}')
+
+
+def _parse_event_time(value):
+    """이벤트 발생 시각 (epoch 초 또는 ISO 문자열), 없으면 수신 시각
+
+    해석할 수 없거나 범위를 벗어난 값 (예: 1e20) 은 ValueError 로 바꿔 해당 이벤트만 거부되게 한다.
+    """
+    if value in (None, ''):
+        return timezone.now()
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (OverflowError, OSError):
+        raise ValueError(f'event_time 범위를 벗어났습니다: {value}')
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value))
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError(f'event_time 형식이 올바르지 않습니다: {value}')
+
+
+def normalize_connection_event(raw):
+    """연결 이벤트 검증 및 정규화 (잘못된 이벤트면 ValueError)"""
+    if not isinstance(raw, dict):
+        raise ValueError('이벤트는 JSON 객체여야 합니다.')
+
+    username = str(_get(raw, 'username') or '').strip()
+    if not username or len(username) > 150:
+        raise ValueError('username 값이 올바르지 않습니다.')
+    connection_id = str(_get(raw, 'connection_id') or '').strip()
+    if len(connection_id) > 64:
+        raise ValueError('connection_id 값이 너무 깁니다.')
+    status = str(_get(raw, 'connection_status') or 'connected').lower()
+    if status not in CONNECTION_STATUSES:
+        raise ValueError(f'connection_status 값은 {", ".join(CONNECTION_STATUSES)} 중 하나여야 합니다.')
+    try:
+        event_time = _parse_event_time(_get(raw, 'event_time'))
+    except ValueError:
+        raise ValueError('event_time 형식이 올바르지 않습니다.')
+
+    return {
+        'username': username,
+        'vpn_ip': _parse_ip(_get(raw, 'vpn_ip'), 'vpn_ip', required=status == 'connected'),
+        'public_ip': _parse_ip(_get(raw, 'public_ip'), 'public_ip'),
+        'connection_id': connection_id,
+        'connection_status': status,
+        'event_time': event_time,
+    }
+
+
+def store_connection_events(events):
+    """정규화된 연결 이벤트를 일괄 저장, 반환값: (새로 기록한 연결 수, 아직 연결 로그가 없는 종료 이벤트 목록)
+
+    연결 이벤트는 connection_id 기준으로 한 번만 기록하고 (재전송/중복 수신은 무시),
+    connection_id 가 없으면 (사용자명, 이벤트 시각) 으로 중복을 거른다. 종료 이벤트는 기존 로그에
+    종료 시각을 남기며, 연결 이벤트보다 먼저 도착해 닫을 로그가 없으면 호출자가 다시 시도하도록
+    돌려준다. 사용자/2FA/기존 연결은 이벤트 수와 무관하게 몇 번의 IN 조회로 확인한다.
+    """
+    connects = []
+    seen = set()
+    seen_untracked = set()
+    disconnects = {}
+    for event in events:
+        if event['connection_status'] == 'disconnected':
+            if event['connection_id']:
+                disconnects.setdefault(event['connection_id'], event)
+            continue
+        if event['connection_id']:
+            if event['connection_id'] in seen:
+                continue
+            seen.add(event['connection_id'])
+        else:
+            key = (event['username'], event['event_time'])
+            if key in seen_untracked:
+                continue
+            seen_untracked.add(key)
+        connects.append(event)
+
+    users = {}
+    for chunk in _chunks({event['username'] for event in connects}):
+        queryset = (
+            User.objects.filter(username__in=chunk)
+            .select_related('two_factor_auth')
+            .only('id', 'username', 'two_factor_auth__id', 'two_factor_auth__is_enabled')
+        )
+        for user in queryset:
+            users[user.username] = user
+
+    existing = set()
+    for chunk in _chunks(seen | set(disconnects)):
+        existing.update(VPNAccessLog.objects.filter(connection_id__in=chunk).values_list('connection_id', flat=True))
+
+    existing_untracked = set()
+    if seen_untracked:
+        times = {event_time for _, event_time in seen_untracked}
+        for chunk in _chunks({username for username, _ in seen_untracked}):
+            existing_untracked.update(
+                VPNAccessLog.objects.filter(
+                    connection_id='', connection_status='connected', username__in=chunk, access_time__in=times,
+                ).values_list('username', 'access_time')
+            )
+
+    entries = []
+    for event in connects:
+        if event['connection_id'] in existing:
+            continue
+        if not event['connection_id'] and (event['username'], event['event_time']) in existing_untracked:
+            continue
+        user = users.get(event['username'])
+        if user is None:
+            print(f"VPN connection event for unknown user: {event['username']}")
+            continue
+        try:
+            two_factor_verified = user.two_factor_auth.is_enabled
+        except UserTwoFactorAuth.DoesNotExist:
+            two_factor_verified = False
+        entries.append(VPNAccessLog(
+            user=user,
+            username=user.username,
+            client_ip=event['public_ip'] or event['vpn_ip'],
+            vpn_ip=event['vpn_ip'],
+            connection_id=event['connection_id'],
+            connection_status='connected',
+            access_time=event['event_time'],
+            two_factor_verified=two_factor_verified,
+            access_granted=True,  # Connection Handler 는 연결이 수립된 뒤에 호출됨
+        ))
+
+    stored = insert_connection_logs(entries)
+    logged = existing | {entry.connection_id for entry in entries}
+    matched = [
+        ({'ConnectionId': connection_id}, event['event_time'])
+        for connection_id, event in disconnects.items() if connection_id in logged
+    ]
+    if matched:
+        close_connection_logs(matched)
+    unmatched = [event for connection_id, event in disconnects.items() if connection_id not in logged]
+    return stored, unmatched
+
+
+class ConnectionEventWriter(AccessLogWriter):
+    """연결 이벤트 버퍼 기록기
+
+    요청 경로에서는 검증된 이벤트를 메모리 버퍼에 넣고 바로 응답하며, 사용자 조회와
+    중복 확인, 저장은 백그라운드 스레드가 모아서 한 번에 처리한다. 연결 로그보다 먼저 도착한
+    종료 이벤트는 보류해 두었다가 이후 저장 때 함께 다시 처리하며,
+    CONNECTION_DISCONNECT_HOLD_SECONDS 가 지나도 연결 로그가 없으면 버린다.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._held = []
+
+    def submit(self, events):
+        """정규화된 이벤트 목록 추가"""
+        self._enqueue(list(events))
+
+    async def asubmit(self, events):
+        """비동기 뷰용 submit (즉시 저장 모드면 스레드에서 저장)"""
+        if self.sync or self._closed:
+            await sync_to_async(self.submit)(events)
+        else:
+            self.submit(events)
+
+    def _write(self, events):
+        with self._flush_lock:
+            held, self._held = self._held, []
+            try:
+                stored, unmatched = store_connection_events(held + events)
+            except Exception as e:
+                print(f"VPN connection event flush failed ({len(events)} events): {str(e)}")
+                self._hold(held)
+                self._requeue(events)
+                return 0
+            self._hold(unmatched)
+            self.written += len(events)
+            self.flushes += 1
+            return stored
+
+    def _hold(self, disconnects):
+        """연결 로그가 아직 없는 종료 이벤트 보류 (보류 기간이 지난 이벤트와 상한 초과분은 버림)"""
+        hold_seconds = getattr(settings, 'CONNECTION_DISCONNECT_HOLD_SECONDS', 3600)
+        since = timezone.now() - timedelta(seconds=hold_seconds)
+        kept = [event for event in disconnects if event['event_time'] >= since][:self.max_buffer]
+        self.dropped += len(disconnects) - len(kept)
+        self._held = kept
+
+
+connection_event_writer = ConnectionEventWriter()
+atexit.register(connection_event_writer.close)
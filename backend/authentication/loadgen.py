@@ -0,0 +1,138 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    """지연 시간 (초) 목록과 응답 코드 목록 요약"""
+    ordered = sorted(latencies)
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    return {
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'statuses': {str(status): count for status, count in sorted(counts.items())},
+    }
+
+
+class WSGIDriver:
+    """WSGIHandler 를 스레드 풀로 호출 (gunicorn 동기 워커/스레드 수 = workers)"""
+
+    def __init__(self, workers, headers=()):
+        self.workers = workers
+        self.headers = tuple(headers)
+        self.handler = WSGIHandler()
+
+    def call(self, request):
+        method, path, query, body, client_ip = request
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'REMOTE_ADDR': client_ip,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': io.StringIO(),
+        }
+        for name, value in self.headers:
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        statuses = []
+        started = time.perf_counter()
+        response = self.handler(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return time.perf_counter() - started, statuses[0]
+
+    def run(self, requests):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.call, requests))
+        elapsed = time.perf_counter() - started
+        return summarize([latency for latency, _ in results], [status for _, status in results], elapsed)
+
+
+class ASGIDriver:
+    """ASGIHandler 를 하나의 이벤트 루프에서 호출 (동시 요청 수 = concurrency, uvicorn 워커 1개에 해당)"""
+
+    def __init__(self, concurrency, headers=()):
+        self.concurrency = concurrency
+        self.headers = [(name.lower().encode(), value.encode()) for name, value in headers]
+        self.handler = ASGIHandler()
+
+    async def call(self, request):
+        method, path, query, body, client_ip = request
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'), *self.headers],
+            'client': (client_ip, 40000),
+            'server': ('localhost', 80),
+        }
+        disconnected = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # 응답이 끝날 때까지 클라이언트 연결 유지
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        statuses = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await self.handler(scope, receive, send)
+        disconnected.set()
+        return time.perf_counter() - started, statuses[0]
+
+    async def _run(self, requests):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(request):
+            async with semaphore:
+                return await self.call(request)
+
+        return await asyncio.gather(*(limited(request) for request in requests))
+
+    def run(self, requests):
+        started = time.perf_counter()
+        results = asyncio.run(self._run(requests))
+        elapsed = time.perf_counter() - started
+        return summarize([latency for latency, _ in results], [status for _, status in results], elapsed)
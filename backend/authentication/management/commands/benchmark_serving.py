@@ -0,0 +1,106 @@
+import json
+import secrets
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from authentication.decision_cache import decision_cache
+from authentication.loadgen import ASGIDriver, WSGIDriver
+
+ENDPOINTS = ('check-status', 'verify-2fa', 'log-vpn-connection')
+
+class Command(BaseCommand):
+    help = 'Lambda 호출 경로의 WSGI (동기 뷰, 스레드 풀) / ASGI (비동기 뷰, 이벤트 루프) 처리량 비교 (프로세스 내)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='check-status', help='측정할 API (log-vpn-connection 은 DB에 연결 로그를 기록함)')
+        parser.add_argument('--requests', type=int, default=2000, help='모드별 요청 수')
+        parser.add_argument('--workers', type=int, default=8, help='WSGI 동시 처리 수 (gunicorn 워커 x 스레드)')
+        parser.add_argument('--concurrency', type=int, default=64, help='ASGI 동시 요청 수 (Lambda 동시 호출 수)')
+        parser.add_argument('--db-latency', type=float, default=2.0, help='쿼리당 추가 지연 (ms, RDS 등 원격 DB 왕복 시간 가정)')
+        parser.add_argument('--users', type=int, default=1000, help='요청에 사용할 사용자 수 (판정 캐시 미스를 만들기 위해 여러 명 사용)')
+        parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+
+    def build_requests(self, endpoint, usernames, count):
+        run_id = uuid.uuid4().hex[:8]
+        requests = []
+        for index in range(count):
+            username = usernames[index % len(usernames)]
+            client_ip = f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+            if endpoint == 'check-status':
+                query = f'username={username}&send_email=false&source=lambda_vpn_check'
+                requests.append(('GET', 'check-status/', query, b'', client_ip))
+            elif endpoint == 'verify-2fa':
+                body = json.dumps({'username': username, 'token': '000000', 'client_ip': client_ip}).encode()
+                requests.append(('POST', 'verify-2fa/', '', body, client_ip))
+            else:
+                body = json.dumps({'events': [{
+                    'username': username, 'vpn_ip': '172.16.0.10', 'public_ip': client_ip,
+                    'connection_id': f'cvpn-connection-bench-{run_id}-{index}',
+                }]}).encode()
+                requests.append(('POST', 'log-vpn-connection/', '', body, client_ip))
+        return requests
+
+    def handle(self, *args, **options):
+        usernames = list(User.objects.order_by('id').values_list('username', flat=True)[:options['users']])
+        if not usernames:
+            raise CommandError('DB에 사용자가 없습니다. create_vpn_users 로 먼저 사용자를 만드세요.')
+
+        # 원격 DB 왕복 시간 흉내 (스레드마다 새로 열리는 연결에도 적용)
+        latency = options['db_latency'] / 1000.0
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if latency > 0:
+            connection_created.connect(install_delay, weak=False)
+
+        # log-vpn-connection 은 공유 비밀 토큰이 필요하므로 측정 동안만 임시 토큰 사용
+        ingest_token = secrets.token_hex(16)
+        headers = [('Authorization', f'Bearer {ingest_token}')]
+
+        results = {}
+        try:
+            with override_settings(
+                ROOT_URLCONF='authentication.serving_urls', VERIFY_RATE_LIMIT_ENABLED=False,
+                CONNECTION_INGEST_TOKEN=ingest_token,
+            ):
+                for mode, driver in (
+                    ('wsgi', WSGIDriver(options['workers'], headers)),
+                    ('asgi', ASGIDriver(options['concurrency'], headers)),
+                ):
+                    decision_cache.clear()
+                    requests = [
+                        (method, f'/{"sync" if mode == "wsgi" else "async"}/{path}', query, body, client_ip)
+                        for method, path, query, body, client_ip in self.build_requests(
+                            options['endpoint'], usernames, options['requests']
+                        )
+                    ]
+                    results[mode] = driver.run(requests)
+        finally:
+            connection_created.disconnect(install_delay)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'endpoint': options['endpoint'], 'options': {
+                key: options[key] for key in ('requests', 'workers', 'concurrency', 'db_latency', 'users')
+            }, 'results': results}, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['endpoint']}: 요청 {options['requests']}건, DB 지연 {options['db_latency']}ms, "
+            f"WSGI 동시 처리 {options['workers']}, ASGI 동시 요청 {options['concurrency']}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"  {mode:4s} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:7.2f}ms  "
+                f"p95 {result['p95_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  {result['statuses']}"
+            )
+        if results['wsgi']['rps']:
+            self.stdout.write(self.style.SUCCESS(f"  ASGI/WSGI 처리량: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}배"))
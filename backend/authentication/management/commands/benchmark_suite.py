@@ -0,0 +1,109 @@
+import contextlib
+import itertools
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from authentication.benchmarks import (
+    BENCHMARK_SCHEMA_VERSION, compare_results, environment_info, load_results, run_dataset,
+)
+
+def parse_sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise CommandError(f'크기 목록은 쉼표로 구분한 정수여야 합니다: {value}')
+    if not sizes or min(sizes) < 0:
+        raise CommandError(f'크기 목록이 올바르지 않습니다: {value}')
+    return sizes
+
+class Command(BaseCommand):
+    help = '인증 핵심 경로 마이크로 벤치마크 (데이터 크기별 시간/쿼리 수, JSON 결과로 릴리스 간 회귀 비교)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=str, default='100,1000', help='사용자 수 목록 (쉼표 구분)')
+        parser.add_argument('--groups', type=str, default='1,5', help='사용자당 그룹 수 목록 (쉼표 구분)')
+        parser.add_argument('--logs', type=str, default='0,10000', help='접근 로그 테이블 행 수 목록 (쉼표 구분)')
+        parser.add_argument('--iterations', type=int, default=200, help='케이스별 측정 횟수')
+        parser.add_argument('--warmup', type=int, default=5, help='케이스별 측정 전 준비 호출 횟수')
+        parser.add_argument('--case', action='append', help='측정할 케이스 (예: check_2fa_status, verify_token.valid, 여러 번 지정 가능)')
+        parser.add_argument('--in-place', action='store_true', help='임시 테스트 DB 대신 설정된 DB에서 실행 (생성한 데이터는 롤백)')
+        parser.add_argument('--output', type=str, help='결과 JSON 파일 경로')
+        parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+        parser.add_argument('--baseline', type=str, help='비교할 이전 결과 JSON 파일 (회귀가 있으면 실패)')
+        parser.add_argument('--max-slowdown', type=float, default=1.5, help='p50 회귀로 보는 기준 대비 배수')
+
+    def handle(self, *args, **options):
+        sizes = list(itertools.product(
+            parse_sizes(options['users']), parse_sizes(options['groups']), parse_sizes(options['logs'])
+        ))
+        iterations = max(options['iterations'], 1)
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = load_results(options['baseline'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'기준 결과를 읽을 수 없습니다: {str(e)}')
+
+        # 기본은 빈 임시 DB (마이그레이션만 적용) 에서 측정하여 기존 데이터와 무관하게 반복 가능하게 함
+        old_name = None
+        if not options['in_place']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        results, datasets = [], []
+        try:
+            # 로그는 즉시 저장하여 쿼리 수에 포함, 실패 제한은 잘못된 토큰 측정이 잠기지 않도록 끔
+            # 뷰의 print 로그는 버려서 JSON 출력과 섞이지 않게 함
+            with override_settings(
+                ACCESS_LOG_SYNC=True, VERIFY_RATE_LIMIT_ENABLED=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ), open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                for users, groups, logs in sizes:
+                    with transaction.atomic():
+                        dataset_results, seed_seconds = run_dataset(
+                            users, groups, logs, iterations, max(options['warmup'], 0), options['case']
+                        )
+                        transaction.set_rollback(True)
+                    results.extend(dataset_results)
+                    datasets.append({'users': users, 'groups': groups, 'logs': logs, 'seed_s': seed_seconds})
+                    if not options['json']:
+                        self.write_table(users, groups, logs, seed_seconds, dataset_results)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'schema': BENCHMARK_SCHEMA_VERSION,
+            'generated_at': timezone.now().isoformat(),
+            'environment': environment_info(),
+            'config': {'iterations': iterations, 'warmup': options['warmup'], 'in_place': options['in_place']},
+            'datasets': datasets,
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            if not options['json']:
+                self.stdout.write(f"결과 저장: {options['output']}")
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['max_slowdown'])
+            if regressions:
+                raise CommandError('성능 회귀 발견:\n' + '\n'.join(f'  {line}' for line in regressions))
+            if not options['json']:
+                self.stdout.write(self.style.SUCCESS(f"기준 결과 대비 회귀 없음 ({options['baseline']})"))
+
+    def write_table(self, users, groups, logs, seed_seconds, results):
+        self.stdout.write(f'[사용자 {users}, 사용자당 그룹 {groups}, 로그 {logs}] 데이터 생성 {seed_seconds:.2f}s')
+        for result in results:
+            errors = f"  오류 {result['errors']}" if result['errors'] else ''
+            self.stdout.write(
+                f"  {result['case']:24s} p50 {result['p50_us']:10.1f}µs  p95 {result['p95_us']:10.1f}µs  "
+                f"쿼리 {result['queries_per_op']:5.2f}{errors}"
+            )
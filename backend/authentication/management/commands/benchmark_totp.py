@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from authentication.totp import keyed_mac, match_token
+import pyotp
+import timeit
+
+class Command(BaseCommand):
+    help = 'TOTP 검증 마이크로 벤치마크 (기존 pyotp 경로와 캐시된 비밀 키 경로 비교)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='경로별 반복 횟수')
+        parser.add_argument('--secrets', type=int, default=100, help='사용할 비밀 키 수 (사용자 수)')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        secrets = [pyotp.random_base32() for _ in range(max(options['secrets'], 1))]
+        keyed_mac.cache_clear()
+        # 현재 단계 코드 (일치) 와 틀린 코드 (허용 범위 전체 확인) 를 각각 측정
+        cases = {
+            'valid': [(secret, pyotp.TOTP(secret).now()) for secret in secrets],
+            'invalid': [(secret, '000000') for secret in secrets],
+        }
+        rounds = max(iterations // len(secrets), 1)
+
+        for case, pairs in cases.items():
+            def legacy():
+                for secret, token in pairs:
+                    pyotp.TOTP(secret).verify(token, valid_window=1)
+
+            def fast():
+                for secret, token in pairs:
+                    match_token(secret, token)
+
+            results = {}
+            for name, function in (('pyotp', legacy), ('fast_path', fast)):
+                function()  # 비밀 키 캐시 준비
+                seconds = min(timeit.repeat(function, number=rounds, repeat=3))
+                results[name] = seconds / (rounds * len(pairs)) * 1e6
+
+            self.stdout.write(f'[{case}]')
+            for name, micros in results.items():
+                self.stdout.write(f'  {name:10s} {micros:8.2f} µs/검증')
+            self.stdout.write(self.style.SUCCESS(f'  속도 향상: {results["pyotp"] / results["fast_path"]:.1f}배'))
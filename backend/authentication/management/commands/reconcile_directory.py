@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from authentication.directory import (
+    DEFAULT_MAX_DEACTIVATE, IMPORT_CHUNK_SIZE, apply_directory_diff, deactivation_limit, diff_directory,
+    load_directory_state, parse_directory_csv, parse_directory_ldif,
+)
+import time
+
+class Command(BaseCommand):
+    help = '디렉터리(AD/LDAP) 사용자/그룹 전체 스냅샷과 Django 사용자/그룹 소속을 일치시킵니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', type=str, help='디렉터리 스냅샷 파일 (CSV 또는 LDIF)')
+        parser.add_argument('--format', dest='snapshot_format', choices=['csv', 'ldif'],
+                            help='스냅샷 형식 (기본: 파일 확장자로 판단)')
+        parser.add_argument('--dry-run', action='store_true', help='변경 내용만 출력하고 반영하지 않음')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='한 번에 반영할 행 수')
+        parser.add_argument('--max-deactivate', type=str, default=DEFAULT_MAX_DEACTIVATE,
+                            help='한 번에 비활성화할 수 있는 사용자 수 또는 관리 대상 활성 사용자 대비 비율 (예: 50, 10%%)')
+        parser.add_argument('--force', action='store_true',
+                            help='빈 스냅샷이나 비활성화 한도 초과도 그대로 반영')
+
+    def handle(self, *args, **options):
+        path = options['snapshot']
+        snapshot_format = options['snapshot_format'] or ('ldif' if path.lower().endswith('.ldif') else 'csv')
+        timings = {}
+
+        started = time.perf_counter()
+        try:
+            if snapshot_format == 'ldif':
+                snapshot = parse_directory_ldif(path)
+            else:
+                snapshot = parse_directory_csv(path)
+        except FileNotFoundError:
+            raise CommandError(f'스냅샷 파일을 찾을 수 없습니다: {path}')
+        timings['parse'] = time.perf_counter() - started
+
+        if not snapshot and not options['force']:
+            raise CommandError('스냅샷에 사용자가 없습니다. 모든 사용자를 비활성화하려면 --force 를 지정하세요.')
+
+        started = time.perf_counter()
+        group_names = {name for entry in snapshot.values() for name in entry['groups']}
+        state = load_directory_state(group_names)
+        timings['load'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        diff = diff_directory(snapshot, state)
+        timings['diff'] = time.perf_counter() - started
+
+        self.stdout.write(
+            f'스냅샷: 사용자 {len(snapshot)}명, 그룹 {len(group_names)}개 / '
+            f'DB: 사용자 {len(state["users"])}명, 관리 대상 소속 {len(state["members"])}건'
+        )
+        self.stdout.write(
+            f'사용자 생성 {len(diff["create_users"])}, 그룹 생성 {len(diff["create_groups"])}, '
+            f'활성화 {len(diff["activate"])}, 비활성화 {len(diff["deactivate"])}, '
+            f'소속 추가 {len(diff["add_members"])}, 소속 제거 {len(diff["remove_members"])}'
+        )
+
+        try:
+            limit = deactivation_limit(state, options['max_deactivate'])
+        except ValueError:
+            raise CommandError(f"--max-deactivate 값이 올바르지 않습니다: {options['max_deactivate']}")
+        if len(diff['deactivate']) > limit and not options['force']:
+            message = (
+                f"비활성화 대상 {len(diff['deactivate'])}명이 한도 {limit}명 ({options['max_deactivate']}) 을 넘습니다. "
+                f"스냅샷이 잘리지 않았는지 확인하고, 의도한 변경이면 --max-deactivate 또는 --force 를 지정하세요."
+            )
+            if not options['dry_run']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'⚠️  {message}'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('🧪 DRY-RUN 완료: 변경 사항을 반영하지 않았습니다.'))
+        elif any(diff.values()):
+            started = time.perf_counter()
+            apply_directory_diff(diff, state, max(options['chunk_size'], 1))
+            timings['apply'] = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS('✅ 디렉터리 동기화 완료'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ 변경 사항 없음'))
+
+        self.stdout.write('⏱️  ' + ', '.join(f'{phase} {seconds * 1000:.0f}ms' for phase, seconds in timings.items()))
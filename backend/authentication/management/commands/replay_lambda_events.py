@@ -0,0 +1,111 @@
+import contextlib
+import json
+import os
+import secrets
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from authentication.access_log import access_log_writer
+from authentication.ingest import connection_event_writer
+from authentication.replay import LocalBackend, QueryLoad, Replayer, generate_storm, load_events
+
+class Command(BaseCommand):
+    help = '기록된 Client VPN 사전 인증/연결 이벤트 (JSONL) 를 실제 Lambda 핸들러 코드로 로컬 백엔드에 재생'
+
+    def add_arguments(self, parser):
+        parser.add_argument('events', type=str, help='이벤트 JSONL 파일 (한 줄에 Lambda 이벤트 하나 또는 {"type", "at", "event"})')
+        parser.add_argument('--concurrency', type=int, default=10, help='동시에 실행되는 Lambda 컨테이너 수')
+        parser.add_argument('--speed', type=float, default=1.0, help='시간 압축 배수 (60 이면 1시간 분량을 1분에, 0 이면 간격 없이 재생)')
+        parser.add_argument('--backend-url', type=str, help='이미 실행 중인 백엔드 주소 (예: http://127.0.0.1:8000/api/auth, 지정하지 않으면 프로세스 안에서 띄우고 쿼리 수도 집계)')
+        parser.add_argument('--lambda-dir', type=str, default=str(settings.BASE_DIR.parent / 'lambda'), help='Lambda 핸들러 소스 디렉터리')
+        parser.add_argument('--generate-storm', type=int, default=0, metavar='COUNT', help='재생 대신 DB 사용자로 COUNT 건의 접속 폭주 이벤트 파일을 생성')
+        parser.add_argument('--storm-duration', type=float, default=900.0, help='생성할 접속 폭주 구간 길이 (초)')
+        parser.add_argument('--seed', type=int, help='이벤트 생성 난수 시드')
+        parser.add_argument('--json', action='store_true', help='결과를 JSON으로 출력')
+
+    def handle(self, *args, **options):
+        if options['generate_storm']:
+            return self.write_storm(options)
+
+        try:
+            events = load_events(options['events'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'이벤트 파일을 읽을 수 없습니다: {str(e)}')
+        if not events:
+            raise CommandError('재생할 이벤트가 없습니다.')
+
+        query_load = None
+        with contextlib.ExitStack() as stack:
+            backend_url = options['backend_url']
+            # 실행 중인 백엔드에는 Lambda 환경변수 (CONNECTION_INGEST_TOKEN) 의 토큰을 그대로 사용
+            ingest_token = ''
+            if not backend_url:
+                query_load = QueryLoad()
+                ingest_token = settings.CONNECTION_INGEST_TOKEN or secrets.token_hex(16)
+                stack.enter_context(override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1'], CONNECTION_INGEST_TOKEN=ingest_token,
+                ))
+                backend_url = stack.enter_context(LocalBackend(get_wsgi_application(), query_load)).url
+            replayer = Replayer(
+                options['lambda_dir'], backend_url, options['concurrency'], options['speed'], ingest_token
+            )
+            # 핸들러와 뷰의 print 로그는 버려서 결과 출력과 섞이지 않게 함
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            with contextlib.redirect_stdout(devnull):
+                report = replayer.run(events)
+                if query_load is not None:
+                    # 버퍼에 남은 접근 로그/연결 이벤트까지 저장해야 쿼리 수가 맞음
+                    access_log_writer.flush()
+                    connection_event_writer.flush()
+
+        report['backend'] = query_load.summary(len(events)) if query_load is not None else None
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.write_report(report)
+
+    def write_storm(self, options):
+        usernames = list(User.objects.filter(is_active=True).order_by('id').values_list('username', flat=True))
+        if not usernames:
+            raise CommandError('DB에 사용자가 없습니다. create_vpn_users 로 먼저 사용자를 만드세요.')
+        lines = generate_storm(usernames, options['generate_storm'], options['storm_duration'], seed=options['seed'])
+        with open(options['events'], 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(json.dumps(line) + '\n')
+        self.stdout.write(self.style.SUCCESS(
+            f"이벤트 {len(lines)}건 생성: {options['events']} ({options['storm_duration']:.0f}초 구간)"
+        ))
+
+    def write_report(self, report):
+        self.stdout.write(
+            f"이벤트 {report['events']}건, {report['elapsed_s']}s (속도 x{report['speed']}, 컨테이너 {report['concurrency']})"
+        )
+        for event_type, summary in report['types'].items():
+            line = (
+                f"  {event_type:10s} {summary['requests']:6d}건  p50 {summary['p50_ms']:7.2f}ms  "
+                f"p95 {summary['p95_ms']:7.2f}ms  p99 {summary['p99_ms']:7.2f}ms"
+            )
+            if 'lambda_cache_hits' in summary:
+                line += f"  Lambda 캐시 적중 {summary['lambda_cache_hits']}"
+            self.stdout.write(line)
+            for code, count in sorted(summary['outcomes'].items(), key=lambda item: -item[1]):
+                style = self.style.SUCCESS if code in ('allowed', 'logged') else self.style.WARNING
+                self.stdout.write(style(f"      {code:24s} {count}"))
+        lag = report['lag']
+        self.stdout.write(f"  시작 지연 p50 {lag['p50_ms']:.2f}ms  p95 {lag['p95_ms']:.2f}ms  p99 {lag['p99_ms']:.2f}ms")
+
+        backend = report['backend']
+        if backend is None:
+            self.stdout.write('  백엔드 쿼리 수: 외부 백엔드라 집계하지 않음')
+            return
+        self.stdout.write(
+            f"  백엔드 요청 {backend['requests']}건, 쿼리 {backend['queries']}건 (이벤트당 {backend['queries_per_event']})"
+        )
+        for path, endpoint in backend['endpoints'].items():
+            per_request = endpoint.get('queries_per_request')
+            per_request = f"요청당 {per_request}" if per_request is not None else ''
+            self.stdout.write(
+                f"      {path:36s} 요청 {endpoint['requests']:6d}  쿼리 {endpoint['queries']:7d}  {per_request}  {endpoint['statuses']}"
+            )
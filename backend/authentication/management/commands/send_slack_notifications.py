@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.metrics import serve_metrics
+from authentication.notifications import SlackSender, deliver_pending
+
+
+class Command(BaseCommand):
+    help = '슬랙 알림 아웃박스를 발송합니다 (기본: 주기적으로 계속 실행)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='대기 중인 알림을 한 번만 발송하고 종료')
+        parser.add_argument('--interval', type=float, default=5.0, help='대기 알림 확인 주기 (초)')
+        parser.add_argument('--batch-size', type=int, default=50, help='한 번에 발송할 최대 알림 수')
+        parser.add_argument('--webhook-url', type=str, help='슬랙 웹훅 URL (기본: SLACK_WEBHOOK_URL 설정)')
+        parser.add_argument('--metrics-port', type=int, help='발송 지연/실패 메트릭을 노출할 포트 (/metrics, Prometheus 형식)')
+
+    def handle(self, *args, **options):
+        webhook_url = options.get('webhook_url') or getattr(settings, 'SLACK_WEBHOOK_URL', '')
+        if not webhook_url:
+            self.stdout.write(self.style.ERROR('SLACK_WEBHOOK_URL not configured'))
+            return
+
+        sender = SlackSender(webhook_url=webhook_url)
+        self.stdout.write(f"📨 슬랙 알림 워커 시작 (주기: {options['interval']}초)")
+        metrics_server = None
+        if options.get('metrics_port'):
+            # 웹 서버와 다른 프로세스이므로 발송 메트릭은 워커가 직접 노출
+            metrics_server = serve_metrics(options['metrics_port'])
+            self.stdout.write(f"📈 메트릭: http://0.0.0.0:{options['metrics_port']}/metrics")
+
+        try:
+            while True:
+                summary = deliver_pending(sender, batch_size=options['batch_size'])
+                if summary['sent'] or summary['failed'] or summary['retried']:
+                    self.stdout.write(
+                        f"발송: {summary['sent']}, 재시도 예정: {summary['retried']}, 실패: {summary['failed']}"
+                    )
+
+                if options['once']:
+                    break
+
+                # 429를 받았으면 Retry-After 동안 대기, 배치가 가득 찼으면 바로 다음 배치 처리
+                if summary['rate_limited']:
+                    time.sleep(max(summary['retry_after'], options['interval']))
+                elif summary['sent'] + summary['failed'] + summary['retried'] < options['batch_size']:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('워커를 종료합니다.')
+        finally:
+            sender.close()
+            if metrics_server is not None:
+                metrics_server.shutdown()
@@ -1,14 +1,26 @@
 import boto3
-import json
+import signal
+import threading
+import time
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from authentication.models import UserTwoFactorAuth, VPNAccessLog
+from django.db import close_old_connections
 from django.utils import timezone
+from authentication.ec2_stub import StubEC2Client
+from authentication.vpn_sync import (
+    DESCRIBE_PAGE_SIZE, MAX_FETCH_WORKERS, ConnectionTracker, close_connection_logs, connection_duration,
+    fetch_all_endpoints, parse_endpoint_targets, plan_connection_logs, stale_connection_logs, write_connection_logs,
+)
 import os
 
 class Command(BaseCommand):
     help = 'AWS API를 통해 활성 VPN 연결을 조회하고 로그에 기록'
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 데몬이 DB에 열린 채로 남은 연결 로그를 정리했는지 (모든 엔드포인트 조회에 성공한 첫 폴링에서 1회)
+        self.reconciled = False
+
     def mask_username(self, username):
         """사용자명 마스킹 처리"""
         if '@' in username:
@@ -23,7 +35,7 @@ class Command(BaseCommand):
                 return username[:2] + '*' * (len(username) - 2)
             else:
                 return username[0] + '*'
-    
+
     def mask_ip(self, ip):
         """IP 주소 마스킹 처리"""
         parts = ip.split('.')
@@ -35,111 +47,288 @@ class Command(BaseCommand):
         parser.add_argument(
             '--endpoint-id',
             type=str,
-            default=os.getenv('CLIENT_VPN_ENDPOINT_ID', 'cvpn-endpoint-xxxxxx'),
-            help='Client VPN Endpoint ID'
+            action='append',
+            help='Client VPN Endpoint ID (여러 번 지정 또는 쉼표 구분, 리전이 다르면 "리전:엔드포인트")'
+        )
+        parser.add_argument(
+            '--region',
+            type=str,
+            default=os.getenv('AWS_REGION', 'your-aws-region'),
+            help='리전을 지정하지 않은 엔드포인트의 AWS 리전'
+        )
+        parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=MAX_FETCH_WORKERS,
+            help='동시에 조회하는 엔드포인트 수'
         )
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='실제 로그 기록 없이 테스트 실행'
         )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=DESCRIBE_PAGE_SIZE,
+            help='describe_client_vpn_connections 페이지 크기 (5~1000)'
+        )
+        parser.add_argument(
+            '--stub-connections',
+            type=int,
+            default=0,
+            help='AWS 대신 로컬 EC2 스텁에서 지정한 수의 연결을 생성 (벤치마크용, DB 사용자명을 돌아가며 사용)'
+        )
+        parser.add_argument(
+            '--stub-latency',
+            type=float,
+            default=0.0,
+            help='로컬 EC2 스텁의 API 호출당 지연 시간 (초)'
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='주기적으로 폴링하며 신규/종료 연결 변경분만 기록'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=float(os.getenv('VPN_SYNC_INTERVAL', '15')),
+            help='데몬 기본 폴링 간격 (초, 변경이 있으면 이 간격으로 되돌아감)'
+        )
+        parser.add_argument(
+            '--max-interval',
+            type=float,
+            default=float(os.getenv('VPN_SYNC_MAX_INTERVAL', '120')),
+            help='변경이 없을 때 늘어나는 폴링 간격 상한 (초)'
+        )
+        parser.add_argument(
+            '--max-polls',
+            type=int,
+            default=0,
+            help='지정한 횟수만큼 폴링 후 종료 (0이면 무제한)'
+        )
+
+    def get_targets(self, options):
+        """조회할 (리전, 엔드포인트) 목록 (옵션이 없으면 CLIENT_VPN_ENDPOINTS / CLIENT_VPN_ENDPOINT_ID 사용)"""
+        values = options['endpoint_id'] or [
+            os.getenv('CLIENT_VPN_ENDPOINTS') or os.getenv('CLIENT_VPN_ENDPOINT_ID', 'cvpn-endpoint-xxxxxx')
+        ]
+        return parse_endpoint_targets(values, options['region'])
+
+    def get_client_factory(self, options):
+        """엔드포인트별 EC2 클라이언트를 만들어 재사용하는 함수 반환
+
+        반환된 함수는 fetch_all_endpoints 의 작업 스레드에서 동시에 호출되므로
+        clients 조회와 생성을 잠금으로 묶어 엔드포인트마다 클라이언트가 하나만 만들어지게 한다.
+        """
+        clients = {}
+        clients_lock = threading.Lock()
+        stub_usernames = None
+        if options['stub_connections']:
+            stub_usernames = list(User.objects.values_list('username', flat=True))
+
+        def client_factory(region, endpoint_id):
+            key = (region, endpoint_id)
+            with clients_lock:
+                if key not in clients:
+                    if stub_usernames is not None:
+                        clients[key] = StubEC2Client.generate(
+                            options['stub_connections'], stub_usernames, endpoint_id=endpoint_id,
+                            latency=options['stub_latency'], start=len(clients) * options['stub_connections'],
+                        )
+                    else:
+                        # boto3 기본 세션은 스레드 간 공유가 안전하지 않으므로 엔드포인트마다 세션을 따로 생성
+                        clients[key] = boto3.session.Session().client('ec2', region_name=region)
+                return clients[key]
+
+        return client_factory
+
+    def fetch(self, targets, client_factory, options):
+        """모든 엔드포인트를 동시에 조회하고 엔드포인트별 결과 출력, 성공한 결과만 반환"""
+        results = fetch_all_endpoints(targets, client_factory, options['page_size'], options['max_workers'])
+        succeeded = []
+        for result in results:
+            name = f"{result['region']}/{result['endpoint_id']}"
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"❌ AWS API 호출 실패 ({name}): {result['error']}"))
+                continue
+            succeeded.append(result)
+            if (len(results) > 1 and not options['daemon']) or options['verbosity'] >= 2:
+                self.stdout.write(
+                    f"   {name}: 연결 {len(result['connections'])}건, {result['pages']} 페이지, "
+                    f"{result['elapsed_ms']:.0f}ms"
+                )
+        return succeeded
 
     def handle(self, *args, **options):
-        endpoint_id = options['endpoint_id']
+        if options['daemon']:
+            return self.run_daemon(options)
+
+        targets = self.get_targets(options)
         dry_run = options['dry_run']
-        
-        self.stdout.write(f"🔍 Client VPN 연결 조회 중... (Endpoint: {endpoint_id})")
-        
-        try:
-            # AWS EC2 클라이언트 생성
-            region = os.getenv('AWS_REGION', 'your-aws-region')
-            ec2_client = boto3.client('ec2', region_name=region)
-            
-            # 활성 VPN 연결 조회
-            response = ec2_client.describe_client_vpn_connections(
-                ClientVpnEndpointId=endpoint_id
-            )
-            
-            connections = response.get('Connections', [])
-            active_connections = [conn for conn in connections if conn['Status']['Code'] == 'active']
-            
-            self.stdout.write(f"📊 총 연결: {len(connections)}, 활성 연결: {len(active_connections)}")
-            
-            logged_count = 0
-            
-            for conn in active_connections:
-                username = conn.get('Username')
-                vpn_ip = conn.get('ClientIp')
-                connection_id = conn.get('ConnectionId')
-                established_time = conn.get('ConnectionEstablishedTime')
-                
-                if not username or not vpn_ip:
-                    continue
-                
+        verbose = options['verbosity'] >= 2
+
+        endpoint_names = ', '.join(endpoint_id for _, endpoint_id in targets)
+        self.stdout.write(f"🔍 Client VPN 연결 조회 중... (Endpoint: {endpoint_names})")
+
+        started = time.perf_counter()
+        # 활성 VPN 연결 조회 (엔드포인트별로 동시에, NextToken을 따라 모든 페이지)
+        results = self.fetch(targets, self.get_client_factory(options), options)
+        fetched = time.perf_counter()
+        if not results:
+            return
+
+        connections = [conn for result in results for conn in result['connections']]
+        pages = sum(result['pages'] for result in results)
+        active_count = sum(1 for conn in connections if conn.get('Status', {}).get('Code') == 'active')
+        self.stdout.write(f"📊 총 연결: {len(connections)}, 활성 연결: {active_count} ({pages} 페이지)")
+
+        # 모든 엔드포인트의 연결을 합쳐 사용자/2FA/기존 로그를 몇 번의 일괄 조회로 확인
+        entries, skipped = plan_connection_logs(connections)
+        planned = time.perf_counter()
+
+        if verbose:
+            for entry in entries:
                 # 개인정보 마스킹 처리
-                masked_username = self.mask_username(username)
-                masked_ip = self.mask_ip(vpn_ip)
-                self.stdout.write(f"🔗 활성 연결: {masked_username} -> {masked_ip} (연결시간: {established_time})")
-                
-                if dry_run:
-                    self.stdout.write(f"   [DRY-RUN] 로그 기록 시뮬레이션")
-                    logged_count += 1
-                    continue
-                
-                try:
-                    # 사용자 및 2FA 정보 조회
-                    user = User.objects.get(username=username)
-                    two_factor_auth = UserTwoFactorAuth.objects.get(user=user)
-                    
-                    # 중복 로그 방지: 같은 connection_id가 이미 기록되었는지 확인
-                    existing_log = VPNAccessLog.objects.filter(
-                        username=username,
-                        client_ip=vpn_ip,
-                        access_time__gte=timezone.now() - timezone.timedelta(hours=1)
-                    ).first()
-                    
-                    if existing_log:
-                        self.stdout.write(f"   ⚠️  중복 로그 건너뜀: {masked_username} -> {masked_ip}")
-                        continue
-                    
-                    # VPN 연결 로그 기록
-                    VPNAccessLog.objects.create(
-                        user=user,
-                        username=username,
-                        client_ip=vpn_ip,
-                        two_factor_verified=two_factor_auth.is_enabled,
-                        access_granted=True  # 활성 연결이므로 접근 허용됨
-                    )
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f"   ✅ 로그 기록 완료: {masked_username} -> {masked_ip}")
-                    )
-                    logged_count += 1
-                    
-                except User.DoesNotExist:
-                    self.stdout.write(
-                        self.style.WARNING(f"   ⚠️  사용자를 찾을 수 없음: {masked_username}")
-                    )
-                except UserTwoFactorAuth.DoesNotExist:
-                    self.stdout.write(
-                        self.style.WARNING(f"   ⚠️  2FA 정보를 찾을 수 없음: {masked_username}")
-                    )
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"   ❌ 로그 기록 실패: {masked_username} -> {str(e)}")
-                    )
-            
-            if dry_run:
                 self.stdout.write(
-                    self.style.SUCCESS(f"🧪 DRY-RUN 완료: {logged_count}개 연결이 로그에 기록될 예정")
+                    f"🔗 활성 연결: {self.mask_username(entry.username)} -> {self.mask_ip(entry.vpn_ip)}"
                 )
-            else:
-                self.stdout.write(
-                    self.style.SUCCESS(f"🎉 동기화 완료: {logged_count}개 VPN 연결이 로그에 기록됨")
-                )
-                
+
+        if skipped['duplicate']:
+            self.stdout.write(f"   ⚠️  중복 로그 건너뜀: {skipped['duplicate']}건")
+        if skipped['unknown_user']:
+            self.stdout.write(self.style.WARNING(f"   ⚠️  사용자를 찾을 수 없음: {skipped['unknown_user']}건"))
+        if skipped['no_2fa']:
+            self.stdout.write(self.style.WARNING(f"   ⚠️  2FA 정보를 찾을 수 없음: {skipped['no_2fa']}건"))
+
+        if dry_run:
+            self.stdout.write(
+                self.style.SUCCESS(f"🧪 DRY-RUN 완료: {len(entries)}개 연결이 로그에 기록될 예정")
+            )
+            return
+
+        try:
+            logged_count = write_connection_logs(entries)
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f"❌ AWS API 호출 실패: {str(e)}")
+                self.style.ERROR(f"❌ 로그 기록 실패: {str(e)}")
             )
-            return
\ No newline at end of file
+            return
+        written = time.perf_counter()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 동기화 완료: {logged_count}개 VPN 연결이 로그에 기록됨")
+        )
+        self.stdout.write(
+            f"⏱️  조회 {(fetched - started) * 1000:.0f}ms, 확인 {(planned - fetched) * 1000:.0f}ms, "
+            f"기록 {(written - planned) * 1000:.0f}ms"
+        )
+
+    def run_daemon(self, options):
+        """연결 목록을 주기적으로 폴링하며 변경분만 기록
+
+        변경이 없으면 폴링 간격을 두 배씩 늘려 (--max-interval 까지) AWS API 호출을 줄이고,
+        신규/종료 연결이 생기면 즉시 기본 간격으로 되돌린다. SIGTERM/SIGINT 를 받으면
+        진행 중인 폴링을 마친 뒤 종료한다.
+        """
+        targets = self.get_targets(options)
+        base_interval = max(options['interval'], 0.0)
+        max_interval = max(options['max_interval'], base_interval)
+        interval = base_interval
+
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *args: stop.set())
+
+        client_factory = self.get_client_factory(options)
+        # 엔드포인트별로 상태를 따로 두어 조회에 실패한 엔드포인트의 연결이 종료로 처리되지 않게 함
+        trackers = {target: ConnectionTracker() for target in targets}
+        polls = 0
+
+        endpoint_names = ', '.join(endpoint_id for _, endpoint_id in targets)
+        self.stdout.write(f"🔄 VPN 연결 동기화 데몬 시작 (Endpoint: {endpoint_names}, 간격: {base_interval}s~{max_interval}s)")
+
+        while not stop.is_set():
+            polls += 1
+            close_old_connections()
+            try:
+                changed = self.poll_once(targets, client_factory, trackers, options)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ 폴링 실패: {str(e)}"))
+                changed = False
+
+            interval = base_interval if changed else min(max(interval, 1.0) * 2, max_interval)
+            if options['max_polls'] and polls >= options['max_polls']:
+                break
+            stop.wait(interval)
+
+        self.stdout.write(f"🛑 VPN 연결 동기화 데몬 종료 ({polls}회 폴링)")
+
+    def poll_once(self, targets, client_factory, trackers, options):
+        """한 번 폴링하여 신규 연결은 기록하고 종료 연결은 종료 시각을 남김, 변경 여부 반환
+
+        엔드포인트별 상태는 기록이 끝난 뒤에만 갱신하므로, 기록에 실패하면 같은 변경분을
+        다음 폴링에서 다시 기록한다.
+        """
+        started = timezone.now()
+        results = self.fetch(targets, client_factory, options)
+        now = timezone.now()
+        new, terminated, pending = [], [], []
+        for result in results:
+            tracker = trackers[(result['region'], result['endpoint_id'])]
+            endpoint_new, endpoint_terminated, current = tracker.diff(result['connections'], now)
+            new.extend(endpoint_new)
+            terminated.extend(endpoint_terminated)
+            pending.append((tracker, current))
+
+        stale = []
+        reconcile = not self.reconciled and len(results) == len(targets)
+        if reconcile:
+            # 데몬이 멈춰 있던 동안 종료된 연결은 직전 상태가 없어 종료로 잡히지 않으므로 DB 기준으로 정리
+            active_ids = {connection_id for _, current in pending for connection_id in current}
+            seen = {conn['ConnectionId'] for conn, _ in terminated}
+            connections = [conn for result in results for conn in result['connections']]
+            endpoint_ids = {endpoint_id for _, endpoint_id in targets}
+            for conn, ended_at in stale_connection_logs(endpoint_ids, active_ids, connections, started, now):
+                if conn['ConnectionId'] not in seen:
+                    stale.append((conn, ended_at))
+
+        def commit():
+            for tracker, current in pending:
+                tracker.commit(current)
+            if reconcile:
+                self.reconciled = True
+
+        if not new and not terminated and not stale:
+            commit()
+            return False
+        if options['dry_run']:
+            self.stdout.write(f"   [DRY-RUN] 신규 {len(new)}건, 종료 {len(terminated)}건, 남은 열린 로그 {len(stale)}건")
+            commit()
+            return True
+
+        logged_count = 0
+        if new:
+            entries, _ = plan_connection_logs(new)
+            logged_count = write_connection_logs(entries)
+        closed_count = close_connection_logs(terminated) if terminated else 0
+        stale_count = close_connection_logs(stale) if stale else 0
+        commit()
+
+        if stale_count:
+            self.stdout.write(f"🧹 데몬 중지 동안 종료된 연결 로그 {stale_count}건 종료 처리")
+
+        for conn, ended_at in terminated:
+            duration = connection_duration(conn, ended_at)
+            duration_text = f"{duration / 60:.1f}분" if duration is not None else "알 수 없음"
+            self.stdout.write(
+                f"🔌 연결 종료: {self.mask_username(conn['Username'])} -> {self.mask_ip(conn['ClientIp'])} "
+                f"(연결 시간: {duration_text})"
+            )
+        self.stdout.write(
+            f"[{now.strftime('%H:%M:%S')}] 신규 {len(new)}건 (기록 {logged_count}건), "
+            f"종료 {len(terminated)}건 (갱신 {closed_count}건), 활성 {sum(len(t.active or {}) for t in trackers.values())}건"
+        )
+        return True
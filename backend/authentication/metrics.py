@@ -0,0 +1,299 @@
+import bisect
+import contextvars
+import hmac
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# 요청 지연 시간 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 요청당 DB 시간 버킷 (초)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# 요청당 쿼리 수 버킷
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DECISION_OUTCOMES = ('granted', '2fa_missing', 'time_restricted', 'unknown_user', 'inactive_user')
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """단조 증가 카운터 (레이블 값 조합별)"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}'
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (기록은 버킷 위치 계산과 덧셈만, 누적 합은 출력할 때 계산)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # 버킷별 개수 (마지막 칸은 +Inf), 합계
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series_list = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for label_values, (counts, total) in series_list:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """프로세스 내 메트릭 모음 (Prometheus 텍스트 형식으로 출력)
+
+    collector 는 출력할 때마다 호출되어 [(이름, 종류, 설명, [(레이블 dict, 값) ...])] 를 반환하며,
+    이미 다른 곳에서 세고 있는 값 (판정 캐시 적중 수, 아웃박스 대기 건수 등) 을 그대로 노출한다.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'vpn_http_requests_total', 'HTTP 요청 수', ('view', 'method', 'status'),
+)
+http_request_duration = registry.histogram(
+    'vpn_http_request_duration_seconds', 'HTTP 요청 처리 시간 (초)', ('view',), LATENCY_BUCKETS,
+)
+http_request_queries = registry.histogram(
+    'vpn_http_request_db_queries', '요청당 DB 쿼리 수', ('view',), QUERY_COUNT_BUCKETS,
+)
+http_request_db_time = registry.histogram(
+    'vpn_http_request_db_seconds', '요청당 DB 쿼리 시간 합계 (초)', ('view',), DB_TIME_BUCKETS,
+)
+access_decisions = registry.counter(
+    'vpn_access_decisions_total', 'check-status 접근 판정 수 (결과별)', ('outcome',),
+)
+slack_sends = registry.counter(
+    'vpn_slack_send_total', '슬랙 웹훅 발송 시도 수 (결과별)', ('result',),
+)
+slack_send_duration = registry.histogram(
+    'vpn_slack_send_duration_seconds', '슬랙 웹훅 발송 시간 (초)', (), LATENCY_BUCKETS,
+)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# 처리 중인 요청의 DB 사용량 (sync_to_async 스레드에도 컨텍스트가 복사되어 비동기 뷰의 쿼리도 집계됨)
+_request_stats = contextvars.ContextVar('vpn_request_stats', default=None)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """요청 처리 중인 쿼리의 수와 시간 기록 (요청 밖의 쿼리는 그대로 실행)"""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """connection_created 수신기 (새 DB 연결마다 쿼리 집계 래퍼 설치)"""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def finish_request(token):
+    _request_stats.reset(token)
+
+
+def record_request(view, method, status, seconds, stats):
+    method = method if method in HTTP_METHODS else 'OTHER'
+    http_requests.inc(view, method, str(status))
+    http_request_duration.observe(seconds, view)
+    http_request_queries.observe(stats.queries, view)
+    http_request_db_time.observe(stats.db_seconds, view)
+
+
+def decision_outcome(decision):
+    """접근 판정 결과 분류 (DECISION_OUTCOMES 중 하나)"""
+    if decision['user_id'] is None:
+        return 'unknown_user'
+    if not decision['is_active']:
+        return 'inactive_user'
+    if decision['time_restriction_error']:
+        return 'time_restricted'
+    if not decision['has_2fa'] or not decision['is_enabled']:
+        return '2fa_missing'
+    return 'granted'
+
+
+def record_decision(decision):
+    access_decisions.inc(decision_outcome(decision))
+
+
+def record_slack_send(seconds, result):
+    slack_send_duration.observe(seconds)
+    slack_sends.inc(result)
+
+
+def metrics_access_error(authorization):
+    """/metrics 접근 확인, 허용하면 None, 아니면 응답 코드
+
+    METRICS_ENABLED 가 꺼져 있거나, DEBUG 가 아닌데 METRICS_TOKEN 이 없으면 404 (노출하지 않음),
+    토큰이 있으면 Authorization: Bearer <토큰> 이 일치하지 않을 때 401.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return 404
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return None if settings.DEBUG else 404
+    if not hmac.compare_digest((authorization or '').encode(), f'Bearer {token}'.encode()):
+        return 401
+    return None
+
+
+def serve_metrics(port, host='0.0.0.0'):
+    """별도 프로세스 (슬랙 워커 등) 의 메트릭을 노출하는 HTTP 서버 시작 (데몬 스레드)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            error = metrics_access_error(self.headers.get('Authorization'))
+            if error:
+                self.send_error(error)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_slacknotification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vpnaccesslog',
+            name='access_time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
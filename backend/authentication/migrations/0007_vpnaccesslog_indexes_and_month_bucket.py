@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:41
+
+import datetime
+
+import authentication.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_access_month(apps, schema_editor):
+    """기존 로그의 월 버킷을 한 번의 UPDATE로 채움"""
+    VPNAccessLog = apps.get_model('authentication', 'VPNAccessLog')
+    utc = datetime.timezone.utc
+    VPNAccessLog.objects.update(
+        access_month=ExtractYear('access_time', tzinfo=utc) * 100 + ExtractMonth('access_time', tzinfo=utc)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_vpnaccesslog_access_time_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='access_month',
+            field=authentication.models.MonthBucketField(default=0),
+        ),
+        migrations.RunPython(backfill_access_month, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['-access_time', '-id'], name='accesslog_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['username', '-access_time'], name='accesslog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['client_ip', '-access_time'], name='accesslog_ip_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['access_month', '-access_time'], name='accesslog_month_time_idx'),
+        ),
+    ]
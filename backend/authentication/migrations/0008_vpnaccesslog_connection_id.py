@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_vpnaccesslog_indexes_and_month_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='connection_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='vpnaccesslog',
+            constraint=models.UniqueConstraint(condition=models.Q(('connection_id', ''), _negated=True), fields=('connection_id',), name='accesslog_connection_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_vpnaccesslog_connection_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='disconnected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_vpnaccesslog_disconnected_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='connection_status',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='vpn_ip',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_vpnaccesslog_vpn_ip_connection_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertwofactorauth',
+            name='last_totp_step',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
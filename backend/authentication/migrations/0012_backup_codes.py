@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0011_usertwofactorauth_last_totp_step'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usertwofactorauth',
+            name='backup_tokens',
+        ),
+        migrations.CreateModel(
+            name='TwoFactorBackupCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=8)),
+                ('salt', models.CharField(max_length=32)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('two_factor_auth', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backup_codes', to='authentication.usertwofactorauth')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('two_factor_auth', 'prefix'), name='backupcode_prefix_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_backup_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decisioncacheversion',
+            name='username',
+            field=models.CharField(blank=True, max_length=150, null=True, unique=True),
+        ),
+    ]
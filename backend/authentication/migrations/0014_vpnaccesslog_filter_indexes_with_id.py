@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_decisioncacheversion_username'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vpnaccesslog',
+            name='accesslog_user_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vpnaccesslog',
+            name='accesslog_ip_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['username', '-access_time', '-id'], name='accesslog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vpnaccesslog',
+            index=models.Index(fields=['client_ip', '-access_time', '-id'], name='accesslog_ip_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0014_vpnaccesslog_filter_indexes_with_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vpnaccesslog',
+            name='endpoint_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -1,13 +1,17 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import ExtractMonth, ExtractYear
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
+from django.conf import settings
 import pyotp
-import qrcode
-import io
 import base64
-from datetime import timedelta, datetime, time
+from datetime import timedelta, datetime, time, timezone as dt_timezone
 import uuid
 import pytz
+from .policy_engine import compile_policy, evaluate_policies
+from .backup_codes import BACKUP_CODE_PREFIX_LENGTH, check_code, generate_codes, normalize_code
+from .qr import provisioning_uri, qr_cache
+from .totp import match_token
 
 class VPNGroupPolicy(models.Model):
     """그룹별 VPN 2FA 정책"""
@@ -37,42 +41,28 @@ class VPNGroupPolicy(models.Model):
     def __str__(self):
         return f"{self.group.name} - {'2FA Required' if self.require_2fa else '2FA Optional'}"
     
-    def is_access_allowed_now(self):
+    def compiled(self):
+        """컴파일된 시간 제한 정책 (요일 비트마스크, 초 단위 허용 구간, 캐시된 시간대)"""
+        return compile_policy(self)
+    
+    def is_access_allowed_now(self, now=None):
         """현재 시간에 접속이 허용되는지 확인"""
         if not self.enable_time_restriction:
             return True, "시간 제한 없음"
         
-        # 설정된 시간대로 현재 시간 가져오기
-        try:
-            tz = pytz.timezone(self.timezone)
-            now = datetime.now(tz)
-        except:
-            # 잘못된 시간대인 경우 서울 시간 사용
-            tz = pytz.timezone('Asia/Seoul')
-            now = datetime.now(tz)
-        
-        current_weekday = now.isoweekday()  # 월=1, 일=7
-        current_time = now.time()
-        
-        # 허용 요일 체크
-        allowed_days = [int(d.strip()) for d in self.allowed_weekdays.split(',') if d.strip()]
-        if current_weekday not in allowed_days:
-            weekday_names = {1: '월', 2: '화', 3: '수', 4: '목', 5: '금', 6: '토', 7: '일'}
-            current_day_name = weekday_names.get(current_weekday, str(current_weekday))
-            return False, f"허용되지 않은 요일입니다 (현재: {current_day_name}요일)"
+        return self.compiled().evaluate(now)
+    
+    def seconds_until_change(self, now=None):
+        """접속 허용 여부가 바뀌기까지 남은 시간(초)
         
-        # 허용 시간 체크
-        if self.allowed_start_time and self.allowed_end_time:
-            if self.allowed_start_time <= self.allowed_end_time:
-                # 같은 날 내의 시간 범위 (예: 09:00 ~ 18:00)
-                if not (self.allowed_start_time <= current_time <= self.allowed_end_time):
-                    return False, f"허용된 시간이 아닙니다 (허용시간: {self.allowed_start_time} ~ {self.allowed_end_time})"
-            else:
-                # 날짜를 넘나드는 시간 범위 (예: 22:00 ~ 06:00)
-                if not (current_time >= self.allowed_start_time or current_time <= self.allowed_end_time):
-                    return False, f"허용된 시간이 아닙니다 (허용시간: {self.allowed_start_time} ~ {self.allowed_end_time})"
+        시간 제한이 없거나 가까운 시일 안에 판정이 바뀌지 않으면 None.
+        """
+        if not self.enable_time_restriction:
+            return None
         
-        return True, f"접속 허용 (현재: {current_time.strftime('%H:%M')})"
+        now = now or timezone.now()
+        _, _, changes_at = evaluate_policies([self.compiled()], now)
+        return (changes_at - now).total_seconds() if changes_at else None
     
     def get_allowed_weekdays_display(self):
         """허용 요일을 한글로 표시"""
@@ -87,7 +77,8 @@ class UserTwoFactorAuth(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='two_factor_auth')
     secret_key = models.CharField(max_length=32)
     is_enabled = models.BooleanField(default=False)
-    backup_tokens = models.JSONField(default=list, blank=True)
+    # 마지막으로 받아들인 TOTP 시간 단계 (같은 코드 재사용 방지)
+    last_totp_step = models.BigIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -97,48 +88,325 @@ class UserTwoFactorAuth(models.Model):
     def generate_secret_key(self):
         """2FA 비밀 키 생성"""
         self.secret_key = pyotp.random_base32()
+        self.last_totp_step = None
         self.save()
         return self.secret_key
     
-    def get_qr_code(self):
-        """QR 코드 생성"""
+    def provisioning_uri(self):
+        return provisioning_uri(self.secret_key, self.user.username)
+    
+    def get_qr_code(self, image_format='png'):
+        """QR 코드 생성 (PNG 는 base64 문자열, SVG 는 마크업 문자열)
+        
+        렌더링 결과는 QR 내용 해시 기준으로 캐시되므로 같은 비밀 키는 한 번만 그린다.
+        """
         if not self.secret_key:
             self.generate_secret_key()
         
-        totp_uri = pyotp.totp.TOTP(self.secret_key).provisioning_uri(
-            name=self.user.username,
-            issuer_name="AWS VPN 2FA"
+        data, _ = qr_cache.render(self.provisioning_uri(), image_format)
+        if image_format == 'svg':
+            return data.decode()
+        return base64.b64encode(data).decode()
+    
+    def _match_step(self, token, consume):
+        """일치하는 시간 단계 (일치하지 않거나 이미 사용한 단계면 None)"""
+        step = match_token(self.secret_key, token)
+        if step is None or not consume:
+            return step
+        if self.last_totp_step is not None and step <= self.last_totp_step:
+            return None
+        return step
+    
+    def _unused_step_queryset(self, step):
+        # 동시 요청에서도 한 단계는 한 번만 받아들이도록 기본 키 기준 조건부 UPDATE로 기록
+        return UserTwoFactorAuth.objects.filter(pk=self.pk).filter(
+            models.Q(last_totp_step__isnull=True) | models.Q(last_totp_step__lt=step)
         )
+    
+    def verify_token(self, token, consume=True):
+        """TOTP 토큰 검증
         
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(totp_uri)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
+        consume이면 받아들인 시간 단계를 기록하여 같은 코드(또는 그 이전 코드)의 재사용을 거부한다.
+        """
+        step = self._match_step(token, consume)
+        if step is None:
+            return False
+        if not consume:
+            return True
+        accepted = self._unused_step_queryset(step).update(last_totp_step=step)
+        if accepted:
+            self.last_totp_step = step
+        return bool(accepted)
+    
+    async def averify_token(self, token, consume=True):
+        """verify_token 의 비동기 버전 (async ORM)"""
+        step = self._match_step(token, consume)
+        if step is None:
+            return False
+        if not consume:
+            return True
+        accepted = await self._unused_step_queryset(step).aupdate(last_totp_step=step)
+        if accepted:
+            self.last_totp_step = step
+        return bool(accepted)
+    
+    def regenerate_backup_codes(self, count=None):
+        """백업 코드를 새로 발급 (기존 코드는 모두 폐기), 평문 코드 목록은 이때 한 번만 반환"""
+        codes = generate_codes(count) if count else generate_codes()
+        with transaction.atomic():
+            self.backup_codes.all().delete()
+            TwoFactorBackupCode.objects.bulk_create([
+                TwoFactorBackupCode(two_factor_auth=self, prefix=prefix, salt=salt, code_hash=code_hash)
+                for _, prefix, salt, code_hash in codes
+            ])
+        return [code for code, _, _, _ in codes]
+    
+    def _backup_code_candidate(self, code):
+        return TwoFactorBackupCode.objects.filter(
+            two_factor_auth_id=self.pk, prefix=code[:BACKUP_CODE_PREFIX_LENGTH], used_at__isnull=True
+        ).values_list('id', 'salt', 'code_hash')
+    
+    def verify_backup_code(self, code):
+        """백업 코드 검증 및 소비 (일회용)
         
-        return base64.b64encode(buffer.getvalue()).decode()
+        접두사로 코드 한 개만 조회하여 해시 한 번만 계산하고, 사용 처리는 조건부 UPDATE로
+        하여 같은 코드로 동시에 요청해도 한 요청만 성공한다.
+        """
+        code = normalize_code(code)
+        if code is None:
+            return False
+        candidate = self._backup_code_candidate(code).first()
+        if candidate is None or not check_code(code, candidate[1], candidate[2]):
+            return False
+        return bool(TwoFactorBackupCode.objects.filter(
+            pk=candidate[0], used_at__isnull=True
+        ).update(used_at=timezone.now()))
     
-    def verify_token(self, token):
-        """TOTP 토큰 검증"""
-        if not self.secret_key:
+    async def averify_backup_code(self, code):
+        """verify_backup_code 의 비동기 버전 (async ORM)"""
+        code = normalize_code(code)
+        if code is None:
             return False
+        candidate = await self._backup_code_candidate(code).afirst()
+        if candidate is None or not check_code(code, candidate[1], candidate[2]):
+            return False
+        return bool(await TwoFactorBackupCode.objects.filter(
+            pk=candidate[0], used_at__isnull=True
+        ).aupdate(used_at=timezone.now()))
+
+
+class TwoFactorBackupCode(models.Model):
+    """일회용 2FA 백업 코드 (솔트 해시로 저장, 앞 네 글자 접두사로 조회)"""
+    two_factor_auth = models.ForeignKey(UserTwoFactorAuth, on_delete=models.CASCADE, related_name='backup_codes')
+    prefix = models.CharField(max_length=8)
+    salt = models.CharField(max_length=32)
+    code_hash = models.CharField(max_length=64)
+    used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['two_factor_auth', 'prefix'], name='backupcode_prefix_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.two_factor_auth.user.username} - {self.prefix}*** ({'used' if self.used_at else 'unused'})"
+
+def month_bucket(value):
+    """접근 로그 월 단위 버킷 번호 (UTC 기준 YYYYMM)"""
+    value = value.astimezone(dt_timezone.utc) if timezone.is_aware(value) else value
+    return value.year * 100 + value.month
+
+
+def month_bucket_value(value):
+    """UPDATE 에 쓸 월 버킷 값 (datetime 이면 계산한 값, F() 등 식이면 DB에서 계산하는 식)"""
+    if isinstance(value, datetime):
+        return month_bucket(value)
+    utc = dt_timezone.utc
+    return ExtractYear(value, tzinfo=utc) * 100 + ExtractMonth(value, tzinfo=utc)
+
+
+def month_bucket_range(start=None, end=None):
+    """기간에 해당하는 버킷 범위 (양 끝이 열려 있으면 None)"""
+    return (
+        month_bucket(start) if start is not None else None,
+        month_bucket(end) if end is not None else None,
+    )
+
+
+class MonthBucketField(models.PositiveIntegerField):
+    """access_time으로부터 저장 시 자동으로 채워지는 월 버킷 (bulk_create 포함)
+    
+    save(update_fields=...), QuerySet.update(), bulk_update() 는 VPNAccessLog/VPNAccessLogQuerySet
+    에서 access_time 과 함께 다시 계산한다. raw SQL 로 access_time 을 바꾸면 access_month 도
+    직접 갱신해야 in_time_range 가 해당 행을 놓치지 않는다.
+    """
+    
+    def __init__(self, *args, source_field='access_time', **kwargs):
+        self.source_field = source_field
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('default', 0)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source_field != 'access_time':
+            kwargs['source_field'] = self.source_field
+        kwargs.pop('editable', None)
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        source = getattr(model_instance, self.source_field)
+        if source is None:
+            return super().pre_save(model_instance, add)
+        value = month_bucket(source)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class VPNAccessLogQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """access_time 을 바꾸면 월 버킷도 같은 UPDATE 에서 다시 계산"""
+        if 'access_time' in kwargs and 'access_month' not in kwargs:
+            kwargs['access_month'] = month_bucket_value(kwargs['access_time'])
+        return super().update(**kwargs)
+    
+    update.alters_data = True
+    
+    def bulk_update(self, objs, fields, batch_size=None):
+        fields = list(fields)
+        if 'access_time' in fields and 'access_month' not in fields:
+            objs = list(objs)
+            for obj in objs:
+                obj.access_month = month_bucket(obj.access_time)
+            fields.append('access_month')
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+    
+    bulk_update.alters_data = True
+    
+    def in_time_range(self, start=None, end=None):
+        """기간 조회 (access_time 기준, 양 끝 포함)
+        
+        ACCESS_LOG_PARTITIONING이 켜져 있으면 해당 기간의 월 버킷만 조회하도록
+        access_month 조건을 함께 붙여 (access_month, access_time) 인덱스의 범위만 읽는다.
+        """
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(access_time__gte=start)
+        if end is not None:
+            queryset = queryset.filter(access_time__lte=end)
         
-        totp = pyotp.TOTP(self.secret_key)
-        return totp.verify(token, valid_window=1)
+        if getattr(settings, 'ACCESS_LOG_PARTITIONING', False):
+            start_bucket, end_bucket = month_bucket_range(start, end)
+            if start_bucket is not None:
+                queryset = queryset.filter(access_month__gte=start_bucket)
+            if end_bucket is not None:
+                queryset = queryset.filter(access_month__lte=end_bucket)
+        return queryset
+
 
 class VPNAccessLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     username = models.CharField(max_length=150)
+    # 클라이언트 공인 IP, 공인 IP 를 알 수 없는 연결 로그 (sync_vpn_connections, public_ip 없는 연결 이벤트) 는 vpn_ip 와 같은 값
     client_ip = models.GenericIPAddressField()
-    access_time = models.DateTimeField(auto_now_add=True)
+    # 버퍼 기록기로 나중에 저장되더라도 이벤트 발생 시각을 유지하도록 기본값으로 설정
+    access_time = models.DateTimeField(default=timezone.now)
+    # 월 단위 파티션 버킷 (UTC YYYYMM)
+    access_month = MonthBucketField()
     two_factor_verified = models.BooleanField(default=False)
     access_granted = models.BooleanField(default=False)
+    # AWS Client VPN 연결 ID (sync_vpn_connections 중복 방지 키, 연결 외 로그는 빈 값)
+    connection_id = models.CharField(max_length=64, blank=True, default='')
+    # 연결을 조회한 Client VPN 엔드포인트 (sync_vpn_connections 기록분만, 데몬의 종료 정리 범위)
+    endpoint_id = models.CharField(max_length=64, blank=True, default='')
+    # 연결 이벤트 (log-vpn-connection) 로 받은 VPN 할당 IP 와 연결 상태
+    vpn_ip = models.GenericIPAddressField(null=True, blank=True)
+    connection_status = models.CharField(max_length=20, blank=True, default='')
+    # 연결 종료 감지 시각 (sync_vpn_connections --daemon, 연결 중이거나 알 수 없으면 빈 값)
+    disconnected_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = VPNAccessLogQuerySet.as_manager()
     
     class Meta:
         ordering = ['-access_time']
+        indexes = [
+            # 최신순 정렬, admin date_hierarchy, (access_time, id) 커서 페이지네이션
+            models.Index(fields=['-access_time', '-id'], name='accesslog_time_idx'),
+            # 사용자별 / IP별 조회 (id 까지 포함해야 커서 정렬에 임시 정렬이 필요 없음)
+            models.Index(fields=['username', '-access_time', '-id'], name='accesslog_user_time_idx'),
+            models.Index(fields=['client_ip', '-access_time', '-id'], name='accesslog_ip_time_idx'),
+            # 월 버킷 범위 조회 (ACCESS_LOG_PARTITIONING)
+            models.Index(fields=['access_month', '-access_time'], name='accesslog_month_time_idx'),
+        ]
+        constraints = [
+            # 같은 VPN 연결은 한 번만 기록 (빈 connection_id는 제외)
+            models.UniqueConstraint(
+                fields=['connection_id'],
+                condition=~models.Q(connection_id=''),
+                name='accesslog_connection_id_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.username} - {self.client_ip} - {'Granted' if self.access_granted else 'Denied'}"
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'access_time' in update_fields and 'access_month' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'access_month']
+        super().save(*args, **kwargs)
+
+
+class DecisionCacheVersion(models.Model):
+    """접근 판정 캐시 버전 카운터
+    
+    pk=1 행 (username 없음) 은 그룹 정책처럼 여러 사용자에게 영향을 주는 변경 때마다,
+    username 이 있는 행은 그 사용자의 2FA/계정/그룹 소속이 바뀔 때마다 증가한다. 모든
+    gunicorn 워커와 EC2 노드가 두 값을 비교하여 프로세스 내 판정 캐시를 무효화한다.
+    """
+    username = models.CharField(max_length=150, null=True, blank=True, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        if self.username:
+            return f"Decision cache version {self.username} {self.version}"
+        return f"Decision cache version {self.version}"
+
+
+class SlackNotification(models.Model):
+    """슬랙 알림 아웃박스 (요청 경로에서는 저장만 하고, 발송은 별도 워커가 담당)"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '발송 대기'),
+        (STATUS_SENDING, '발송 중'),
+        (STATUS_SENT, '발송 완료'),
+        (STATUS_FAILED, '발송 실패'),
+    ]
+    
+    KIND_2FA_SETUP = '2fa_setup'
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    username = models.CharField(max_length=150)
+    kind = models.CharField(max_length=50, default=KIND_2FA_SETUP)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='slack_outbox_due_idx'),
+            models.Index(fields=['username', 'kind', 'created_at'], name='slack_outbox_dedupe_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.username} - {self.kind} - {self.status}"
@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_slack_send
+from .models import SlackNotification
+
+# 발송 중 상태로 이 시간 이상 남아 있으면 워커가 중단된 것으로 보고 다시 대기 상태로 돌림
+SENDING_LEASE_SECONDS = 300
+RECENT_ENQUEUES_MAX_ENTRIES = 10000
+
+# 같은 프로세스에서 최근 적재한 알림 (username, kind) -> monotonic 시각, DB 중복 조회 생략용
+_recent_enqueues = {}
+_recent_enqueues_lock = threading.Lock()
+
+
+def build_2fa_setup_message(username):
+    """2FA 설정 필요 슬랙 메시지 본문"""
+    alb_domain = os.getenv('ALB_DOMAIN', 'localhost')
+    setup_url = f'http://{alb_domain}?username={username}&action=setup_2fa'
+
+    return {
+        "text": f"🚨 VPN 2FA 설정 필요 알림",
+        "blocks": [
+            {
+                "type": "header",
+                "text": {
+                    "type": "plain_text",
+                    "text": "🔐 AWS VPN 2차 인증 설정 필요"
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*사용자:* `{username}`\n*상태:* VPN 연결 시도 감지, 2FA 미설정으로 접속 차단"
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"VPN 접속을 위해 아래 링크에서 2FA를 설정해주세요:"
+                }
+            },
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "2FA 설정하기"
+                        },
+                        "url": setup_url,
+                        "style": "primary"
+                    }
+                ]
+            },
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": f"⏰ {timezone.now().strftime('%Y-%m-%d %H:%M:%S')} UTC"
+                    }
+                ]
+            }
+        ]
+    }
+
+
+def enqueue_2fa_setup_slack(user):
+    """2FA 설정 필요 알림을 아웃박스에 적재 (중복 알림 창 안에서는 사용자당 1건)
+
+    실제 발송은 send_slack_notifications 워커가 담당하므로 요청 경로에서 슬랙을 기다리지 않는다.
+    웹훅이 설정되지 않았으면 발송할 수 없는 알림이 쌓이지 않도록 적재하지 않는다.
+    """
+    if not _slack_configured():
+        return False
+    key = (user.username, SlackNotification.KIND_2FA_SETUP)
+    if _recently_enqueued(key):
+        return False
+
+    # 창 안의 기존 알림이 있으면 그 적재 시각부터 창을 세어, 창이 끝나기 전에 다시 적재되지 않게 함
+    created_at = _notification_times(key).first()
+    duplicated = created_at is not None
+    if not duplicated:
+        SlackNotification.objects.create(**_2fa_setup_fields(user))
+
+    _remember_enqueue(key, created_at)
+    return not duplicated
+
+
+async def aenqueue_2fa_setup_slack(user):
+    """enqueue_2fa_setup_slack 의 비동기 버전 (async ORM)"""
+    if not _slack_configured():
+        return False
+    key = (user.username, SlackNotification.KIND_2FA_SETUP)
+    if _recently_enqueued(key):
+        return False
+
+    created_at = await _notification_times(key).afirst()
+    duplicated = created_at is not None
+    if not duplicated:
+        await SlackNotification.objects.acreate(**_2fa_setup_fields(user))
+
+    _remember_enqueue(key, created_at)
+    return not duplicated
+
+
+def _slack_configured():
+    if getattr(settings, 'SLACK_WEBHOOK_URL', ''):
+        return True
+    print("SLACK_WEBHOOK_URL not configured")
+    return False
+
+
+def _dedupe_window():
+    return getattr(settings, 'SLACK_DEDUPE_WINDOW_SECONDS', 3600)
+
+
+def _recently_enqueued(key):
+    with _recent_enqueues_lock:
+        last = _recent_enqueues.get(key)
+        return last is not None and time.monotonic() - last < _dedupe_window()
+
+
+def _remember_enqueue(key, created_at=None):
+    """적재 시각 기록 (created_at 이 있으면 기존 알림의 적재 시각을 monotonic 기준으로 환산)"""
+    enqueued = time.monotonic()
+    if created_at is not None:
+        enqueued -= max((timezone.now() - created_at).total_seconds(), 0.0)
+    with _recent_enqueues_lock:
+        if len(_recent_enqueues) >= RECENT_ENQUEUES_MAX_ENTRIES:
+            _recent_enqueues.clear()
+        _recent_enqueues[key] = enqueued
+
+
+def _recent_notifications(key):
+    username, kind = key
+    since = timezone.now() - timedelta(seconds=_dedupe_window())
+    return SlackNotification.objects.filter(username=username, kind=kind, created_at__gte=since)
+
+
+def _notification_times(key):
+    """창 안의 알림 적재 시각 (최신순)"""
+    return _recent_notifications(key).order_by('-created_at').values_list('created_at', flat=True)
+
+
+def _2fa_setup_fields(user):
+    return {
+        'user_id': user.pk,
+        'username': user.username,
+        'kind': SlackNotification.KIND_2FA_SETUP,
+        'payload': build_2fa_setup_message(user.username),
+    }
+
+
+def parse_retry_after(value, default=1.0):
+    """Retry-After 헤더 (초) 해석"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class SlackSender:
+    """커넥션 풀을 재사용하는 슬랙 웹훅 발송기"""
+
+    def __init__(self, webhook_url=None, timeout=None, pool_size=4):
+        self.webhook_url = webhook_url if webhook_url is not None else getattr(settings, 'SLACK_WEBHOOK_URL', '')
+        self.timeout = timeout if timeout is not None else getattr(settings, 'SLACK_SEND_TIMEOUT', 5)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send(self, payload):
+        """발송 결과 (성공 여부, Retry-After 초 또는 None, 오류 메시지), 발송 시간과 결과는 메트릭으로 기록"""
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+        except Exception as e:
+            record_slack_send(time.perf_counter() - started, 'error')
+            return False, None, str(e)
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            record_slack_send(elapsed, 'sent')
+            return True, None, ''
+        if response.status_code == 429:
+            record_slack_send(elapsed, 'rate_limited')
+            return False, parse_retry_after(response.headers.get('Retry-After')), 'rate limited'
+        record_slack_send(elapsed, 'failed')
+        return False, None, f"{response.status_code}, {response.text}"
+
+    def close(self):
+        self.session.close()
+
+
+def deliver_pending(sender, batch_size=50, max_attempts=None):
+    """발송 시각이 된 알림을 발송, 처리 결과 요약 반환
+
+    슬랙이 429를 반환하면 Retry-After 만큼 남은 알림 전체를 미루고 이번 배치를 중단한다.
+    """
+    max_attempts = max_attempts or getattr(settings, 'SLACK_MAX_ATTEMPTS', 5)
+    summary = {'sent': 0, 'failed': 0, 'retried': 0, 'rate_limited': False, 'retry_after': None}
+
+    now = timezone.now()
+    SlackNotification.objects.filter(
+        status=SlackNotification.STATUS_SENDING, next_attempt_at__lt=now
+    ).update(status=SlackNotification.STATUS_PENDING)
+
+    due_ids = list(
+        SlackNotification.objects.filter(status=SlackNotification.STATUS_PENDING, next_attempt_at__lte=now)
+        .values_list('id', flat=True)[:batch_size]
+    )
+
+    for notification_id in due_ids:
+        # 여러 워커가 동시에 돌아도 한 건은 한 워커만 발송하도록 상태 변경으로 선점
+        claimed = SlackNotification.objects.filter(
+            id=notification_id, status=SlackNotification.STATUS_PENDING
+        ).update(
+            status=SlackNotification.STATUS_SENDING,
+            next_attempt_at=timezone.now() + timedelta(seconds=SENDING_LEASE_SECONDS),
+        )
+        if not claimed:
+            continue
+
+        notification = SlackNotification.objects.get(id=notification_id)
+        ok, retry_after, error = sender.send(notification.payload)
+
+        if ok:
+            notification.status = SlackNotification.STATUS_SENT
+            notification.sent_at = timezone.now()
+            notification.attempts += 1
+            notification.last_error = ''
+            notification.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            print(f"Slack message sent for user: {notification.username}")
+            summary['sent'] += 1
+            continue
+
+        if retry_after is not None:
+            # 429는 시도 횟수에 포함하지 않고, 대기 중인 알림 전체를 Retry-After 이후로 미룸
+            resume_at = timezone.now() + timedelta(seconds=retry_after)
+            notification.status = SlackNotification.STATUS_PENDING
+            notification.next_attempt_at = resume_at
+            notification.last_error = error
+            notification.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+            SlackNotification.objects.filter(
+                status=SlackNotification.STATUS_PENDING, next_attempt_at__lt=resume_at
+            ).update(next_attempt_at=resume_at)
+            print(f"Slack rate limited, retrying after {retry_after}s")
+            summary['rate_limited'] = True
+            summary['retry_after'] = retry_after
+            break
+
+        notification.attempts += 1
+        notification.last_error = error
+        if notification.attempts >= max_attempts:
+            notification.status = SlackNotification.STATUS_FAILED
+            summary['failed'] += 1
+        else:
+            notification.status = SlackNotification.STATUS_PENDING
+            notification.next_attempt_at = timezone.now() + timedelta(seconds=2 ** notification.attempts)
+            summary['retried'] += 1
+        notification.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+        print(f"Slack send failed for {notification.username}: {error}")
+
+    return summary
+
+
+def outbox_metrics():
+    """메트릭 collector: 아웃박스의 미발송 알림 수 (발송 완료 건은 제외하여 상태 인덱스만 사용)"""
+    statuses = (SlackNotification.STATUS_PENDING, SlackNotification.STATUS_SENDING, SlackNotification.STATUS_FAILED)
+    counts = dict(
+        SlackNotification.objects.filter(status__in=statuses).order_by()
+        .values_list('status').annotate(count=Count('id'))
+    )
+    return [(
+        'vpn_slack_outbox_notifications', 'gauge', '슬랙 아웃박스 미발송 알림 수 (상태별)',
+        [({'status': status}, counts.get(status, 0)) for status in statuses],
+    )]
@@ -0,0 +1,187 @@
+import threading
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+import pytz
+from django.utils import timezone
+
+WEEKDAY_NAMES = {1: '월', 2: '화', 3: '수', 4: '목', 5: '금', 6: '토', 7: '일'}
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# 판정 변경 시각 탐색 상한 (정책별 변경 시각을 이 횟수만큼만 따라감)
+MAX_BOUNDARY_STEPS = 64
+COMPILED_CACHE_MAX_ENTRIES = 1024
+
+
+@lru_cache(maxsize=64)
+def get_tzinfo(name):
+    """시간대 객체 캐시 (잘못된 시간대인 경우 서울 시간 사용)"""
+    try:
+        return pytz.timezone(name)
+    except Exception:
+        return pytz.timezone('Asia/Seoul')
+
+
+def parse_weekday_mask(value):
+    """'1,2,3,4,5' 형식의 허용 요일을 비트마스크로 변환 (월=bit0 ... 일=bit6)"""
+    mask = 0
+    for day in (value or '').split(','):
+        day = day.strip()
+        if day:
+            day = int(day)
+            if 1 <= day <= 7:
+                mask |= 1 << (day - 1)
+    return mask
+
+
+def _second_of_day(value, round_up=False):
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    if round_up and value.microsecond:
+        seconds += 1
+    return seconds
+
+
+class CompiledPolicy:
+    """한 번 컴파일된 그룹 시간 제한 정책
+
+    - weekday_mask: 허용 요일 비트마스크
+    - ranges: 하루 안의 허용 구간 [시작초, 종료초) 목록 (자정을 넘는 구간은 둘로 나눔)
+    - tzinfo: 캐시된 시간대 객체
+
+    기존 판정과 같이 종료 시각을 포함한다 (09:00 ~ 18:00 이면 18:00:00 까지 허용, 초 단위 판정).
+    시작과 종료가 같으면 그 1초만 허용되고, 자정을 넘는 구간의 요일은 현재 날짜 기준으로 본다.
+    """
+
+    __slots__ = ('weekday_mask', 'ranges', 'boundaries', 'tzinfo', 'time_window_message')
+
+    def __init__(self, policy):
+        self.weekday_mask = parse_weekday_mask(policy.allowed_weekdays)
+        self.tzinfo = get_tzinfo(policy.timezone)
+
+        start, end = policy.allowed_start_time, policy.allowed_end_time
+        if start and end:
+            # 경계에 1초 미만 값이 있으면 허용 구간을 안쪽으로 맞춤, 종료 초는 포함
+            start_second = _second_of_day(start, round_up=True)
+            end_second = _second_of_day(end) + 1
+            if start <= end:
+                # 같은 날 내의 시간 범위 (예: 09:00 ~ 18:00)
+                self.ranges = ((start_second, end_second),)
+            else:
+                # 날짜를 넘나드는 시간 범위 (예: 22:00 ~ 06:00)
+                self.ranges = ((0, end_second), (start_second, SECONDS_PER_DAY))
+            self.time_window_message = f"허용된 시간이 아닙니다 (허용시간: {start} ~ {end})"
+        else:
+            self.ranges = ((0, SECONDS_PER_DAY),)
+            self.time_window_message = None
+
+        # 하루 안에서 판정이 바뀔 수 있는 초 단위 경계 (자정 포함)
+        self.boundaries = tuple(sorted(
+            {second for window in self.ranges for second in window if second < SECONDS_PER_DAY} | {0}
+        ))
+
+    def _allowed_at(self, weekday, second):
+        if not self.weekday_mask & (1 << (weekday - 1)):
+            return False
+        for start, end in self.ranges:
+            if start <= second < end:
+                return True
+        return False
+
+    def allows(self, local_now):
+        return self._allowed_at(local_now.isoweekday(), _second_of_day(local_now))
+
+    def deny_message(self, local_now):
+        """거부 사유 메시지 (거부된 경우에만 생성)"""
+        current_weekday = local_now.isoweekday()
+        if not self.weekday_mask & (1 << (current_weekday - 1)):
+            current_day_name = WEEKDAY_NAMES.get(current_weekday, str(current_weekday))
+            return f"허용되지 않은 요일입니다 (현재: {current_day_name}요일)"
+        return self.time_window_message
+
+    def next_change(self, local_now):
+        """local_now 이후 이 정책의 판정이 처음으로 바뀌는 시각 (8일 안에 없으면 None)
+
+        초 단위 정수 연산으로 경계를 훑고, 시간대 변환은 찾은 시각에 한 번만 수행한다.
+        """
+        weekday = local_now.isoweekday()
+        second = _second_of_day(local_now)
+        current = self._allowed_at(weekday, second)
+        for offset in range(8):
+            day_weekday = (weekday - 1 + offset) % 7 + 1
+            for boundary in self.boundaries:
+                if offset == 0 and boundary <= second:
+                    continue
+                if self._allowed_at(day_weekday, boundary) != current:
+                    day = local_now.date() + timedelta(days=offset)
+                    naive = datetime.combine(day, time(boundary // 3600, boundary % 3600 // 60, boundary % 60))
+                    return self.tzinfo.normalize(self.tzinfo.localize(naive))
+        return None
+
+    def evaluate(self, now=None):
+        """단일 정책 판정 (허용 여부, 메시지)"""
+        local_now = (now or timezone.now()).astimezone(self.tzinfo)
+        if self.allows(local_now):
+            return True, f"접속 허용 (현재: {local_now.strftime('%H:%M')})"
+        return False, self.deny_message(local_now)
+
+
+_compiled_cache = {}
+_compiled_cache_lock = threading.Lock()
+
+
+def compile_policy(policy):
+    """정책을 컴파일 (저장된 정책은 (pk, updated_at) 기준으로 재사용)"""
+    if policy.pk is None:
+        return CompiledPolicy(policy)
+
+    key = (policy.pk, policy.updated_at, policy.allowed_weekdays, policy.allowed_start_time,
+           policy.allowed_end_time, policy.timezone)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = CompiledPolicy(policy)
+        with _compiled_cache_lock:
+            if len(_compiled_cache) >= COMPILED_CACHE_MAX_ENTRIES:
+                _compiled_cache.clear()
+            _compiled_cache[key] = compiled
+    return compiled
+
+
+def _decide(compiled_policies, now):
+    """모든 정책을 한 번에 판정, 거부된 경우 첫 번째 거부 정책과 지역 시각 반환"""
+    local_times = {}
+    for compiled in compiled_policies:
+        local_now = local_times.get(compiled.tzinfo)
+        if local_now is None:
+            local_now = local_times[compiled.tzinfo] = now.astimezone(compiled.tzinfo)
+        if not compiled.allows(local_now):
+            return False, compiled, local_now
+    return True, None, local_times
+
+
+def evaluate_policies(compiled_policies, now=None):
+    """사용자의 모든 시간 제한 정책을 한 번에 판정
+
+    반환값: (허용 여부, 메시지, 판정이 바뀌는 시각 또는 None)
+    """
+    now = now or timezone.now()
+    if not compiled_policies:
+        return True, "시간 제한 없음", None
+
+    allowed, denied_by, local = _decide(compiled_policies, now)
+    if allowed:
+        first_local = local[compiled_policies[0].tzinfo]
+        message = f"접속 허용 (현재: {first_local.strftime('%H:%M')})"
+    else:
+        message = denied_by.deny_message(local)
+
+    # 각 정책의 다음 변경 시각 중 가장 이른 시각부터 따라가며 전체 판정이 실제로 바뀌는 시각을 찾음
+    cursor = now
+    for _ in range(MAX_BOUNDARY_STEPS):
+        candidates = [compiled.next_change(cursor.astimezone(compiled.tzinfo)) for compiled in compiled_policies]
+        candidates = [candidate for candidate in candidates if candidate is not None]
+        if not candidates:
+            break
+        cursor = min(candidates)
+        if _decide(compiled_policies, cursor)[0] != allowed:
+            return allowed, message, cursor
+    return allowed, message, None
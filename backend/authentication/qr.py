@@ -0,0 +1,117 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pyotp
+import qrcode
+
+QR_ISSUER_NAME = 'AWS VPN 2FA'
+QR_FORMATS = ('png', 'svg')
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+QR_CACHE_MAX_ENTRIES = 2048
+
+
+def provisioning_uri(secret_key, username):
+    return pyotp.totp.TOTP(secret_key).provisioning_uri(name=username, issuer_name=QR_ISSUER_NAME)
+
+
+def qr_fingerprint(uri):
+    """QR 내용 (비밀 키 포함) 의 SHA-256 해시, 캐시 키와 ETag 로 사용 (비밀 키 자체는 키로 쓰지 않음)"""
+    return hashlib.sha256(uri.encode()).hexdigest()
+
+
+def _make_qr(uri):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(uri)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(uri):
+    img = _make_qr(uri).make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_svg(uri):
+    """모듈 행마다 연속된 검은 칸을 한 경로로 합친 SVG (Pillow 없이 문자열만 생성)"""
+    matrix = _make_qr(uri).get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            path.append(f'M{start} {y}h{x - start}v1h-{x - start}z')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{size * 10}" '
+        f'height="{size * 10}" shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode()
+
+
+RENDERERS = {
+    'png': render_png,
+    'svg': render_svg,
+}
+
+
+class QRCodeCache:
+    """렌더링한 QR 이미지 LRU 캐시 ((QR 내용 해시, 형식) -> 바이트)"""
+
+    def __init__(self, max_entries=QR_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, uri, image_format='png'):
+        """QR 이미지와 ETag 반환 (같은 내용/형식은 한 번만 렌더링)"""
+        if image_format not in RENDERERS:
+            raise ValueError(f'format 값은 {", ".join(QR_FORMATS)} 중 하나여야 합니다.')
+        fingerprint = qr_fingerprint(uri)
+        key = (fingerprint, image_format)
+        etag = f'"{fingerprint[:32]}-{image_format}"'
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data, etag
+            self.misses += 1
+
+        # 렌더링은 잠금 밖에서 (동시에 같은 QR 을 요청하면 중복 렌더링될 수 있으나 결과는 같음)
+        data = RENDERERS[image_format](uri)
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data, etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+qr_cache = QRCodeCache()
@@ -0,0 +1,300 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def client_address(request):
+    """시도 제한 키로 쓰는 클라이언트 주소 (요청 본문의 client_ip 는 호출자가 바꿀 수 있으므로 쓰지 않음)
+
+    TRUSTED_PROXY_COUNT 개의 프록시 (ALB 등) 뒤에 있으면 X-Forwarded-For 의 뒤에서 그 순번의
+    값, 즉 신뢰하는 첫 프록시가 기록한 주소를 쓰고, 아니면 REMOTE_ADDR 을 쓴다.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    if proxies > 0:
+        forwarded = [value.strip() for value in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if value.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class MemoryStore:
+    """프로세스 내 만료 키-값 저장소 (최대 키 수를 넘으면 가장 오래 갱신되지 않은 키부터 제거)"""
+
+    # 네트워크 I/O 가 없으므로 비동기 뷰에서도 이벤트 루프에서 바로 호출
+    blocking = False
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        return value
+
+    def _set(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return {key: value for key in keys if (value := self._get(key, now)) is not None}
+
+    def incr(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            value = (self._get(key, now) or 0) + 1
+            self._set(key, value, now + ttl)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._set(key, value, time.monotonic() + ttl)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class CacheStore:
+    """Django 캐시 백엔드 저장소 (Redis/Memcached 등으로 여러 워커/노드가 카운터를 공유)"""
+
+    blocking = True
+
+    def __init__(self, alias, key_prefix='verify-rl'):
+        self.cache = caches[alias]
+        self.key_prefix = key_prefix
+
+    def _key(self, key):
+        return f'{self.key_prefix}:{key}'
+
+    def get_many(self, keys):
+        values = self.cache.get_many([self._key(key) for key in keys])
+        return {key: values[self._key(key)] for key in keys if self._key(key) in values}
+
+    def incr(self, key, ttl):
+        cache_key = self._key(key)
+        # add 는 키가 없을 때만 만료 시간과 함께 생성, incr 는 백엔드에서 원자적으로 증가
+        self.cache.add(cache_key, 0, ttl)
+        try:
+            return self.cache.incr(cache_key)
+        except ValueError:
+            # add 와 incr 사이에 만료된 경우
+            self.cache.set(cache_key, 1, ttl)
+            return 1
+
+    def set(self, key, value, ttl):
+        self.cache.set(self._key(key), value, ttl)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self._key(key) for key in keys])
+
+    def clear(self):
+        # 공유 캐시의 다른 키를 지우지 않도록 전체 삭제는 하지 않음
+        pass
+
+    def size(self):
+        return None
+
+
+class SlidingWindowLimiter:
+    """실패 횟수 슬라이딩 윈도우 제한 (키당 카운터 두 개, O(1))
+
+    현재 고정 윈도우 카운터와 직전 윈도우 카운터를 경과 비율로 가중합하여 슬라이딩 윈도우를
+    근사한다. 추정치가 limit 에 도달하면 lockout 초 동안 잠그고, 잠긴 동안의 시도는 세지 않는다.
+    시각은 벽시계 (time.time) 기준이어야 여러 프로세스가 공유 캐시에서 같은 윈도우를 쓴다.
+    """
+
+    def __init__(self, name, limit, window, lockout, store):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.lockout = lockout
+        self.store = store
+
+    def _keys(self, key, now):
+        index = int(now // self.window)
+        return (
+            f'{self.name}:{key}:{index}',
+            f'{self.name}:{key}:{index - 1}',
+            f'{self.name}:lock:{key}',
+            (now % self.window) / self.window,
+        )
+
+    def _estimate(self, current, previous, elapsed):
+        return previous * (1 - elapsed) + current
+
+    def hit(self, key, now=None):
+        """실패 한 번 기록, 이번 실패로 잠기면 잠금 시간 (초) 반환"""
+        now = time.time() if now is None else now
+        current_key, previous_key, lock_key, elapsed = self._keys(key, now)
+        current = self.store.incr(current_key, self.window * 2)
+        previous = self.store.get_many([previous_key]).get(previous_key, 0)
+        if self._estimate(current, previous, elapsed) >= self.limit:
+            self.store.set(lock_key, now + self.lockout, self.lockout)
+            return self.lockout
+        return 0
+
+    def throttle(self, key, now=None):
+        """요청 한 번 기록 (요청 수 제한용), 제한 중이면 재시도까지 남은 초, 아니면 0"""
+        now = time.time() if now is None else now
+        lock_key = self._keys(key, now)[2]
+        locked_until = self.store.get_many([lock_key]).get(lock_key)
+        if locked_until and locked_until > now:
+            return max(math.ceil(locked_until - now), 1)
+        self.hit(key, now)
+        return 0
+
+    def reset(self, key, now=None):
+        now = time.time() if now is None else now
+        current_key, previous_key, lock_key, _ = self._keys(key, now)
+        self.store.delete_many([current_key, previous_key, lock_key])
+
+    def state(self, key, now=None):
+        now = time.time() if now is None else now
+        current_key, previous_key, lock_key, elapsed = self._keys(key, now)
+        values = self.store.get_many([current_key, previous_key, lock_key])
+        locked_until = values.get(lock_key)
+        locked = bool(locked_until and locked_until > now)
+        return {
+            'failures': round(self._estimate(values.get(current_key, 0), values.get(previous_key, 0), elapsed), 2),
+            'limit': self.limit,
+            'window_seconds': self.window,
+            'locked': locked,
+            'retry_after': max(math.ceil(locked_until - now), 1) if locked else 0,
+        }
+
+
+class VerifyAttemptLimiter:
+    """verify-2fa 시도 제한 (사용자명 기준 + 클라이언트 IP 기준)
+
+    요청 처리 전 check() 로 잠긴 사용자/IP 를 DB 조회 없이 거부하고, 실패하면 record_failure(),
+    성공하면 record_success() 로 사용자 카운터를 초기화한다.
+    """
+
+    def __init__(self, store, user_limit, ip_limit, window, lockout):
+        self.store = store
+        self.limiters = {
+            'user': SlidingWindowLimiter('user', user_limit, window, lockout, store),
+            'ip': SlidingWindowLimiter('ip', ip_limit, window, lockout, store),
+        }
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.failures = 0
+        self.lockouts = 0
+
+    def _targets(self, username, client_ip):
+        return [(scope, value) for scope, value in (('user', username), ('ip', client_ip)) if value]
+
+    def check(self, username, client_ip, now=None):
+        """잠겨 있으면 재시도까지 남은 초, 아니면 0 (저장소 조회만, DB 조회 없음)"""
+        now = time.time() if now is None else now
+        targets = self._targets(username, client_ip)
+        lock_keys = {f'{scope}:lock:{value}': scope for scope, value in targets}
+        locks = self.store.get_many(list(lock_keys))
+        retry_after = max((math.ceil(until - now) for until in locks.values() if until > now), default=0)
+        if retry_after:
+            with self._lock:
+                self.rejected += 1
+            return max(retry_after, 1)
+        return 0
+
+    def record_failure(self, username, client_ip, now=None):
+        """실패 기록, 이번 실패로 잠긴 경우 잠금 시간 (초) 반환"""
+        locked_for = 0
+        for scope, value in self._targets(username, client_ip):
+            locked_for = max(locked_for, self.limiters[scope].hit(value, now))
+        with self._lock:
+            self.failures += 1
+            if locked_for:
+                self.lockouts += 1
+        return locked_for
+
+    def record_success(self, username, client_ip=None, now=None):
+        if username:
+            self.limiters['user'].reset(username, now)
+
+    def reset(self, username=None, client_ip=None, now=None):
+        for scope, value in self._targets(username, client_ip):
+            self.limiters[scope].reset(value, now)
+
+    def state(self, username=None, client_ip=None, now=None):
+        return {
+            scope: self.limiters[scope].state(value, now)
+            for scope, value in self._targets(username, client_ip)
+        }
+
+    def clear(self):
+        self.store.clear()
+        with self._lock:
+            self.rejected = self.failures = self.lockouts = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': type(self.store).__name__,
+                'tracked_keys': self.store.size(),
+                'user_limit': self.limiters['user'].limit,
+                'ip_limit': self.limiters['ip'].limit,
+                'window_seconds': self.limiters['user'].window,
+                'lockout_seconds': self.limiters['user'].lockout,
+                'rejected': self.rejected,
+                'failures': self.failures,
+                'lockouts': self.lockouts,
+            }
+
+
+def build_verify_limiter():
+    cache_alias = getattr(settings, 'VERIFY_RATE_LIMIT_CACHE', '')
+    if cache_alias:
+        store = CacheStore(cache_alias)
+    else:
+        store = MemoryStore(max_entries=getattr(settings, 'VERIFY_RATE_LIMIT_MAX_KEYS', 100000))
+    return VerifyAttemptLimiter(
+        store,
+        user_limit=getattr(settings, 'VERIFY_RATE_LIMIT_USER_FAILURES', 5),
+        ip_limit=getattr(settings, 'VERIFY_RATE_LIMIT_IP_FAILURES', 20),
+        window=getattr(settings, 'VERIFY_RATE_LIMIT_WINDOW', 300),
+        lockout=getattr(settings, 'VERIFY_RATE_LIMIT_LOCKOUT', 900),
+    )
+
+
+verify_limiter = build_verify_limiter()
+
+
+def build_qr_limiter():
+    """qr-code 요청 수 제한 (클라이언트 IP 기준, 한도에 도달하면 윈도우 길이만큼 거부)"""
+    cache_alias = getattr(settings, 'VERIFY_RATE_LIMIT_CACHE', '')
+    if cache_alias:
+        store = CacheStore(cache_alias, key_prefix='qr-rl')
+    else:
+        store = MemoryStore(max_entries=getattr(settings, 'VERIFY_RATE_LIMIT_MAX_KEYS', 100000))
+    window = getattr(settings, 'QR_RATE_LIMIT_WINDOW', 300)
+    return SlidingWindowLimiter('qr', getattr(settings, 'QR_RATE_LIMIT_REQUESTS', 30), window, window, store)
+
+
+qr_limiter = build_qr_limiter()
@@ -0,0 +1,302 @@
+import importlib.util
+import itertools
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db.backends.signals import connection_created
+
+from .loadgen import summarize
+
+PRE_AUTH = 'pre-auth'
+CONNECTION = 'connection'
+EVENT_TYPES = (PRE_AUTH, CONNECTION)
+# 재생 중인 Lambda 호출의 제한 시간 (Client VPN 핸들러 기본 제한 시간과 같게)
+LAMBDA_TIMEOUT_SECONDS = 30.0
+
+
+def parse_event_line(line, line_number):
+    """JSONL 한 줄을 (시각 또는 None, 종류, Lambda 이벤트) 로 변환
+
+    Lambda 가 받는 이벤트를 그대로 쓰거나, {"type", "at", "event"} 로 감싸서 종류와 발생 시각
+    (epoch 초 또는 첫 이벤트 기준 초) 을 지정할 수 있다. 종류가 없으면 vpn-ip 가 있는 이벤트를
+    연결 이벤트로 본다.
+    """
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        raise ValueError(f'{line_number}번째 줄: JSON 형식이 아닙니다.')
+    if not isinstance(raw, dict):
+        raise ValueError(f'{line_number}번째 줄: 이벤트는 JSON 객체여야 합니다.')
+
+    event = raw.get('event', raw)
+    event_type = raw.get('type') or (CONNECTION if event.get('vpn-ip') else PRE_AUTH)
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f'{line_number}번째 줄: type 값은 {", ".join(EVENT_TYPES)} 중 하나여야 합니다.')
+    at = raw.get('at')
+    return (float(at) if at is not None else None), event_type, event
+
+
+def load_events(path):
+    """이벤트 파일을 읽어 발생 시각 순으로 정렬 (시각이 없는 이벤트는 파일 순서대로 바로 재생)"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                events.append(parse_event_line(line, line_number))
+    if not events:
+        return []
+    start = min((at for at, _, _ in events if at is not None), default=0.0)
+    timed = [((at - start) if at is not None else 0.0, event_type, event) for at, event_type, event in events]
+    return sorted(timed, key=lambda item: item[0])
+
+
+def generate_storm(usernames, count, duration, connect_ratio=0.9, seed=None):
+    """월요일 아침 접속 폭주 형태의 이벤트 생성 (시작 직후에 몰리는 분포)
+
+    사용자마다 사전 인증 이벤트를 만들고, connect_ratio 비율은 뒤이어 연결 이벤트를 만든다.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for index in range(count):
+        username = usernames[index % len(usernames)]
+        at = round(duration * rng.betavariate(1.5, 4), 3)
+        public_ip = f'203.0.{(index >> 8) & 255}.{index & 255}'
+        connection_id = f'cvpn-connection-replay-{index:08d}'
+        lines.append({'type': PRE_AUTH, 'at': at, 'event': {
+            'username': username, 'public-ip': public_ip, 'connection-id': connection_id,
+        }})
+        if rng.random() < connect_ratio:
+            lines.append({'type': CONNECTION, 'at': round(at + rng.uniform(0.5, 3.0), 3), 'event': {
+                'username': username, 'public-ip': public_ip, 'connection-id': connection_id,
+                'vpn-ip': f'172.16.{(index >> 8) & 255}.{index & 255}',
+            }})
+    return sorted(lines, key=lambda line: line['at'])
+
+
+class LambdaContext:
+    """Lambda context 대역 (남은 실행 시간만 제공)"""
+
+    def __init__(self, timeout=LAMBDA_TIMEOUT_SECONDS):
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(int((self.deadline - time.monotonic()) * 1000), 0)
+
+
+def _load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LambdaContainer:
+    """warm Lambda 컨테이너 하나 (핸들러 모듈을 따로 불러와 커넥션 풀, 판정 캐시, 보관 파일을 독립적으로 가짐)"""
+
+    _ids = itertools.count()
+
+    def __init__(self, lambda_dir, backend_url, spool_dir, ingest_token=''):
+        container_id = next(self._ids)
+        lambda_dir = Path(lambda_dir)
+        self.pre_auth = _load_module(lambda_dir / 'lambda_function.py', f'replay_pre_auth_{container_id}')
+        self.connection = _load_module(lambda_dir / 'connection_handler.py', f'replay_connection_{container_id}')
+        for module in (self.pre_auth, self.connection):
+            module.BACKEND_API_URL = backend_url
+        if ingest_token:
+            self.connection.CONNECTION_INGEST_TOKEN = ingest_token
+        self.connection.SPOOL_PATH = os.path.join(spool_dir, f'spool-{container_id}.jsonl')
+
+        # 연결 핸들러는 항상 allow 를 반환하므로 백엔드 응답 코드를 따로 기록
+        post_events = self.connection._post_events
+        self.last_post_status = None
+
+        def recording_post_events(events, budget):
+            self.last_post_status = post_events(events, budget)
+            return self.last_post_status
+
+        self.connection._post_events = recording_post_events
+
+    def invoke(self, event_type, event):
+        """핸들러 호출, (결과 코드 목록, Lambda 판정 캐시 적중 여부) 반환"""
+        context = LambdaContext()
+        if event_type == PRE_AUTH:
+            result = self.pre_auth.lambda_handler(dict(event), context)
+            codes = ['allowed'] if result.get('allow') else result.get('posture-compliance-statuses') or ['denied']
+            return codes, bool(self.pre_auth._timings.get('cache_hit'))
+
+        self.last_post_status = None
+        self.connection.lambda_handler(dict(event), context)
+        status = self.last_post_status
+        if status is None:
+            return ['send-failed'], False
+        return (['logged'] if status < 300 else [f'http-{status}']), False
+
+
+class QueryLoad:
+    """백엔드 쿼리 수를 요청 경로별로 집계 (스레드마다 처리 중인 경로를 기록)"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def _endpoint(self, path):
+        return self.endpoints.setdefault(path, {'requests': 0, 'queries': 0, 'statuses': {}})
+
+    def __call__(self, execute, sql, params, many, context):
+        path = getattr(self._local, 'path', None) or 'background'
+        with self._lock:
+            self._endpoint(path)['queries'] += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def wrap(self, application):
+        """WSGI 앱을 감싸 요청 경로와 응답 코드 기록"""
+
+        def counted(environ, start_response):
+            path = environ.get('PATH_INFO', '')
+            self._local.path = path
+
+            def recording_start_response(status, headers, exc_info=None):
+                with self._lock:
+                    statuses = self._endpoint(path)['statuses']
+                    statuses[status[:3]] = statuses.get(status[:3], 0) + 1
+                return start_response(status, headers, exc_info)
+
+            try:
+                with self._lock:
+                    self._endpoint(path)['requests'] += 1
+                return application(environ, recording_start_response)
+            finally:
+                self._local.path = None
+
+        return counted
+
+    def summary(self, events):
+        requests = sum(endpoint['requests'] for endpoint in self.endpoints.values())
+        queries = sum(endpoint['queries'] for endpoint in self.endpoints.values())
+        endpoints = {}
+        for path, endpoint in sorted(self.endpoints.items()):
+            endpoints[path] = dict(endpoint)
+            if endpoint['requests']:
+                endpoints[path]['queries_per_request'] = round(endpoint['queries'] / endpoint['requests'], 2)
+        return {
+            'requests': requests,
+            'queries': queries,
+            'queries_per_event': round(queries / events, 2) if events else 0.0,
+            'endpoints': endpoints,
+        }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalBackend:
+    """프로세스 안에서 Django 를 띄우는 HTTP 서버 (요청마다 스레드, 쿼리 수 집계 가능)"""
+
+    def __init__(self, application, query_load):
+        self.query_load = query_load
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietRequestHandler, allow_reuse_address=False)
+        self.server.set_app(query_load.wrap(application))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/api/auth'
+
+    def __enter__(self):
+        connection_created.connect(self.query_load.install, weak=False)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        connection_created.disconnect(self.query_load.install)
+
+
+class Replayer:
+    """이벤트를 기록된 시각 간격대로 (speed 배 빠르게) concurrency 개 컨테이너에 나눠 재생
+
+    컨테이너마다 작업 스레드 하나가 이벤트를 하나씩 처리한다 (warm Lambda 컨테이너와 같음).
+    지연 시간은 핸들러 호출 시간, lag 는 예정 시각보다 늦게 시작된 시간 (컨테이너가 모두
+    바쁘면 늘어남) 이다.
+    """
+
+    def __init__(self, lambda_dir, backend_url, concurrency=10, speed=1.0, ingest_token=''):
+        self.concurrency = max(concurrency, 1)
+        self.speed = speed
+        self._spool_dir = tempfile.TemporaryDirectory(prefix='vpn-replay-')
+        self.containers = [
+            LambdaContainer(lambda_dir, backend_url, self._spool_dir.name, ingest_token) for _ in range(self.concurrency)
+        ]
+
+    def run(self, events):
+        pending = queue.Queue()
+        results = {event_type: [] for event_type in EVENT_TYPES}
+        lags = []
+        lock = threading.Lock()
+
+        def work(container):
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                scheduled, event_type, event = item
+                began = time.perf_counter()
+                try:
+                    codes, cache_hit = container.invoke(event_type, event)
+                except Exception as e:
+                    codes, cache_hit = [f'exception:{type(e).__name__}'], False
+                latency = time.perf_counter() - began
+                with lock:
+                    results[event_type].append((latency, codes, cache_hit))
+                    lags.append(max(began - scheduled, 0.0))
+
+        workers = [threading.Thread(target=work, args=(container,), daemon=True) for container in self.containers]
+        for worker in workers:
+            worker.start()
+
+        started = time.perf_counter()
+        for offset, event_type, event in events:
+            scheduled = started + (offset / self.speed if self.speed > 0 else 0.0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pending.put((scheduled, event_type, event))
+        for _ in workers:
+            pending.put(None)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        self._spool_dir.cleanup()
+
+        report = {'events': len(events), 'elapsed_s': round(elapsed, 3), 'speed': self.speed,
+                  'concurrency': self.concurrency, 'types': {}}
+        for event_type, entries in results.items():
+            if not entries:
+                continue
+            summary = summarize(
+                [latency for latency, _, _ in entries],
+                [code for _, codes, _ in entries for code in codes],
+                elapsed,
+            )
+            summary['outcomes'] = summary.pop('statuses')
+            if event_type == PRE_AUTH:
+                summary['lambda_cache_hits'] = sum(1 for _, _, cache_hit in entries if cache_hit)
+            report['types'][event_type] = summary
+        report['lag'] = {key: value for key, value in summarize(lags, [], elapsed).items() if key.endswith('_ms')}
+        return report
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import async_views, views
+
+# benchmark_serving 전용 URLconf: 같은 프로세스에서 동기/비동기 뷰를 나란히 비교
+urlpatterns = [
+    path('sync/check-status/', views.check_2fa_status),
+    path('sync/verify-2fa/', views.verify_2fa),
+    path('sync/log-vpn-connection/', views.log_vpn_connection),
+    path('async/check-status/', async_views.check_2fa_status),
+    path('async/verify-2fa/', async_views.verify_2fa),
+    path('async/log-vpn-connection/', async_views.log_vpn_connection),
+]
@@ -0,0 +1,62 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .decision_cache import bump_cache_version, bump_user_cache_version, decision_cache
+from .models import UserTwoFactorAuth, VPNGroupPolicy
+
+
+def invalidate_users(*usernames):
+    """사용자별 판정 무효화 (이 프로세스의 항목 삭제 + 다른 워커/노드용 사용자 버전 증가)"""
+    usernames = [username for username in usernames if username]
+    for username in usernames:
+        decision_cache.invalidate(username)
+    bump_user_cache_version(*usernames)
+
+
+@receiver(post_save, sender=UserTwoFactorAuth)
+@receiver(post_delete, sender=UserTwoFactorAuth)
+def invalidate_two_factor_auth(sender, instance, **kwargs):
+    """2FA 상태 변경 시 해당 사용자 판정 무효화"""
+    invalidate_users(instance.user.username)
+
+
+@receiver(post_save, sender=VPNGroupPolicy)
+@receiver(post_delete, sender=VPNGroupPolicy)
+def invalidate_group_policy(sender, instance, **kwargs):
+    """그룹 정책 변경 시 전체 판정 무효화 (그룹 소속 사용자 전체에 영향)"""
+    decision_cache.clear()
+    bump_cache_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """그룹 소속 변경 시 판정 무효화"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_users(instance.username)
+    elif pk_set:
+        # group.user_set 쪽에서 변경된 경우 pk_set 이 바뀐 사용자 목록
+        invalidate_users(*User.objects.filter(pk__in=pk_set).values_list('username', flat=True))
+    else:
+        # group.user_set.clear() 는 영향받은 사용자를 알려주지 않으므로 전체 무효화
+        decision_cache.clear()
+        bump_cache_version()
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, update_fields=None, **kwargs):
+    """사용자명 변경 시 이전 사용자명의 판정도 무효화할 수 있도록 저장 전 값 기록"""
+    instance._previous_username = None
+    if instance.pk and (update_fields is None or 'username' in update_fields):
+        instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    """사용자 생성/삭제/변경 시 해당 사용자 판정 무효화 (로그인 시각 갱신은 제외)"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_users(instance.username, getattr(instance, '_previous_username', None))
@@ -1,3 +1,1831 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from io import StringIO
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import pyotp
+import pytz
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.throttling import AnonRateThrottle
+
+from . import async_views, metrics, notifications, policy_engine, views
+from .access_log import (
+    ACCESS_LOG_FIELDS, AccessLogWriter, encode_cursor, filter_access_logs, paginate_access_logs,
+)
+from .backup_codes import BACKUP_CODE_COUNT
+from .decision_cache import bump_user_cache_version, decision_cache, get_cache_version
+from .decisions import get_access_decision
+from .directory import import_users_chunk, parse_directory_ldif
+from .ingest import connection_event_writer
+from .ec2_stub import StubEC2Client, make_connection, terminate_connection
+from .management.commands.sync_vpn_connections import Command as SyncCommand
+from .models import DecisionCacheVersion, SlackNotification, UserTwoFactorAuth, VPNAccessLog, VPNGroupPolicy
+from .policy_engine import evaluate_policies
+from .qr import qr_cache
+from .rate_limit import CacheStore, MemoryStore, SlidingWindowLimiter, qr_limiter, verify_limiter
+from .replay import load_events
+from .totp import current_step, match_token
+from .vpn_sync import (
+    ConnectionTracker, fetch_all_endpoints, fetch_connections, parse_endpoint_targets, plan_connection_logs,
+    write_connection_logs,
+)
+
+
+class QueryBudgetMixin:
+    """엔드포인트별 쿼리 예산 검사 (N+1 회귀 방지)"""
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.fail(f"쿼리 예산 초과: {executed} > {budget}\n{queries}")
+
+
+@override_settings(ACCESS_LOG_SYNC=True)
+class AuthTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        # 프로세스 전역 캐시는 테스트 간 롤백되지 않으므로 매번 비움
+        decision_cache.clear()
+        cache.clear()
+        verify_limiter.clear()
+        qr_limiter.store.clear()
+        connection_event_writer._held.clear()
+
+    def create_vpn_user(self, username='alice', groups=0, restricted=True, enabled=True):
+        user = User.objects.create(username=username)
+        for index in range(groups):
+            group = Group.objects.create(name=f'{username}-group-{index}')
+            VPNGroupPolicy.objects.create(
+                group=group,
+                enable_time_restriction=restricted,
+                allowed_weekdays='1,2,3,4,5,6,7',
+            )
+            user.groups.add(group)
+        two_factor_auth = UserTwoFactorAuth.objects.create(
+            user=user, secret_key=pyotp.random_base32(), is_enabled=enabled
+        )
+        return user, two_factor_auth
+
+
+class CheckStatusQueryBudgetTests(AuthTestCase):
+    # 버전 카운터 1 + 사용자/2FA 1 + 그룹/정책 1
+    MISS_BUDGET = 3
+    # 버전 카운터 1
+    HIT_BUDGET = 1
+
+    def check_status(self, username, **params):
+        params.setdefault('source', 'lambda_vpn_check')
+        params.setdefault('send_email', 'false')
+        return self.client.get('/api/auth/check-status/', {'username': username, **params})
+
+    def test_budget_is_independent_of_group_count(self):
+        for group_count in (0, 1, 5, 20):
+            username = f'user{group_count}'
+            self.create_vpn_user(username, groups=group_count)
+            decision_cache.clear()
+            with self.assertQueryBudget(self.MISS_BUDGET):
+                response = self.check_status(username)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['is_enabled'])
+
+    def test_cache_hit_budget(self):
+        self.create_vpn_user(groups=3)
+        self.check_status('alice')
+        with self.assertQueryBudget(self.HIT_BUDGET):
+            response = self.check_status('alice')
+        self.assertTrue(response.json()['is_enabled'])
+
+    def test_unknown_user_budget(self):
+        with self.assertQueryBudget(2):
+            response = self.check_status('nobody')
+        self.assertTrue(response.json()['requires_setup'])
+
+    def test_missing_2fa_budget(self):
+        User.objects.create(username='bob')
+        with self.assertQueryBudget(self.MISS_BUDGET):
+            response = self.check_status('bob')
+        self.assertFalse(response.json()['has_2fa'])
+        # 등록하고 바로 다시 접속할 수 있도록 Lambda 가 거부 판정을 캐시하지 않게 함
+        self.assertEqual(response.json()['cache_ttl'], 0)
+
+    def test_not_enrolled_deny_is_not_cached(self):
+        user = User.objects.create(username='bob')
+        UserTwoFactorAuth.objects.create(user=user, secret_key='')
+        response = self.check_status('bob')
+        self.assertTrue(response.json()['requires_setup'])
+        self.assertEqual(response.json()['cache_ttl'], 0)
+
+    def test_time_restriction_denied(self):
+        user, _ = self.create_vpn_user(groups=2)
+        policy = user.groups.first().vpn_policy
+        policy.allowed_weekdays = ''
+        policy.save()
+        with self.assertQueryBudget(self.MISS_BUDGET):
+            response = self.check_status('alice')
+        self.assertEqual(response.json()['error_code'], 'TIME_RESTRICTION')
+
+    def test_inactive_user_is_denied(self):
+        user, _ = self.create_vpn_user(groups=1)
+        self.assertTrue(self.check_status('alice').json()['is_enabled'])
+
+        user.is_active = False
+        user.save()
+        inactive_before = metrics.access_decisions.value('inactive_user')
+        with self.assertQueryBudget(self.MISS_BUDGET):
+            response = self.check_status('alice', source='web', client_ip='10.0.0.1')
+        body = response.json()
+        self.assertFalse(body['success'])
+        self.assertFalse(body['is_enabled'])
+        self.assertEqual(body['error_code'], 'USER_INACTIVE')
+        self.assertEqual(VPNAccessLog.objects.count(), 0)
+        self.assertEqual(metrics.access_decisions.value('inactive_user'), inactive_before + 1)
+
+    def test_access_log_written_outside_lambda(self):
+        self.create_vpn_user(groups=2)
+        with self.assertQueryBudget(self.MISS_BUDGET + 1):
+            self.check_status('alice', source='web', client_ip='10.0.0.1')
+        self.assertEqual(VPNAccessLog.objects.count(), 1)
+
+
+class DecisionCacheInvalidationTests(AuthTestCase):
+    def cached(self, username):
+        return decision_cache.get(username, get_cache_version(username))
+
+    def test_two_factor_change_invalidates_only_that_user(self):
+        _, alice_auth = self.create_vpn_user('alice')
+        self.create_vpn_user('bob')
+        get_access_decision('alice')
+        get_access_decision('bob')
+        global_version = get_cache_version()
+
+        alice_auth.is_enabled = False
+        alice_auth.save()
+
+        self.assertIsNone(self.cached('alice'))
+        self.assertIsNotNone(self.cached('bob'))
+        self.assertEqual(get_cache_version(), global_version)
+        self.assertFalse(get_access_decision('alice')['is_enabled'])
+
+    def test_user_save_bumps_user_version_except_last_login(self):
+        user, _ = self.create_vpn_user('alice')
+        get_access_decision('alice')
+        user_version = get_cache_version('alice')[1]
+
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        self.assertEqual(get_cache_version('alice')[1], user_version)
+        self.assertIsNotNone(self.cached('alice'))
+
+        user.is_active = False
+        user.save()
+        self.assertEqual(get_cache_version('alice')[1], user_version + 1)
+        self.assertIsNone(self.cached('alice'))
+
+    def test_rename_invalidates_previous_username(self):
+        user, _ = self.create_vpn_user('alice')
+        self.assertTrue(get_access_decision('alice')['is_enabled'])
+        user.username = 'alicia'
+        user.save()
+        self.assertIsNone(self.cached('alice'))
+        self.assertIsNone(get_access_decision('alice')['user_id'])
+
+    def test_policy_change_bumps_global_version(self):
+        user, _ = self.create_vpn_user('alice', groups=1)
+        self.create_vpn_user('bob')
+        get_access_decision('alice')
+        get_access_decision('bob')
+        global_version = get_cache_version()
+
+        policy = user.groups.first().vpn_policy
+        policy.allowed_weekdays = ''
+        policy.save()
+
+        self.assertEqual(get_cache_version(), global_version + 1)
+        self.assertIsNone(self.cached('bob'))
+        self.assertIsNotNone(get_access_decision('alice')['time_restriction_error'])
+
+    def test_group_membership_changes_from_either_side(self):
+        alice, _ = self.create_vpn_user('alice')
+        self.create_vpn_user('bob')
+        group = Group.objects.create(name='developers')
+        VPNGroupPolicy.objects.create(group=group, enable_time_restriction=True, allowed_weekdays='')
+        for username in ('alice', 'bob'):
+            get_access_decision(username)
+        global_version = get_cache_version()
+
+        alice.groups.add(group)
+        self.assertIsNone(self.cached('alice'))
+        self.assertIsNotNone(self.cached('bob'))
+        self.assertIsNotNone(get_access_decision('alice')['time_restriction_error'])
+
+        group.user_set.add(User.objects.get(username='bob'))
+        self.assertIsNone(self.cached('bob'))
+        self.assertIsNotNone(self.cached('alice'))
+        self.assertEqual(get_cache_version(), global_version)
+
+        get_access_decision('bob')
+        group.user_set.clear()
+        self.assertEqual(get_cache_version(), global_version + 1)
+        self.assertIsNone(get_access_decision('bob')['time_restriction_error'])
+
+    def test_stale_entry_rejected_after_bump_from_another_process(self):
+        self.create_vpn_user('alice')
+        self.assertTrue(get_access_decision('alice')['is_enabled'])
+
+        # 다른 워커/노드의 변경: 이 프로세스의 캐시는 건드리지 않고 DB 만 바뀜
+        UserTwoFactorAuth.objects.filter(user__username='alice').update(is_enabled=False)
+        self.assertTrue(get_access_decision('alice')['is_enabled'])
+        bump_user_cache_version('alice')
+        self.assertFalse(get_access_decision('alice')['is_enabled'])
+
+        UserTwoFactorAuth.objects.filter(user__username='alice').update(is_enabled=True)
+        DecisionCacheVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertTrue(get_access_decision('alice')['is_enabled'])
+
+
+class VerifyQueryBudgetTests(AuthTestCase):
+    def verify(self, username, token):
+        return self.client.post(
+            '/api/auth/verify-2fa/', {'username': username, 'token': token}, content_type='application/json'
+        )
+
+    def test_valid_token_budget(self):
+        _, two_factor_auth = self.create_vpn_user(groups=5)
+        token = pyotp.TOTP(two_factor_auth.secret_key).now()
+        # 사용자/2FA 1 + 재사용 방지 단계 갱신 1 + 로그 1
+        with self.assertQueryBudget(3):
+            response = self.verify('alice', token)
+        self.assertTrue(response.json()['success'])
+
+    def test_first_verification_enables_2fa(self):
+        _, two_factor_auth = self.create_vpn_user(enabled=False)
+        token = pyotp.TOTP(two_factor_auth.secret_key).now()
+        # 사용자/2FA 1 + 재사용 방지 단계 갱신 1 + 활성화 저장 1 + 캐시 버전 증가 1 + 로그 1
+        with self.assertQueryBudget(5):
+            response = self.verify('alice', token)
+        self.assertTrue(response.json()['success'])
+        two_factor_auth.refresh_from_db()
+        self.assertTrue(two_factor_auth.is_enabled)
+
+    def test_invalid_token_budget(self):
+        self.create_vpn_user(groups=5)
+        with self.assertQueryBudget(2):
+            response = self.verify('alice', '000000')
+        self.assertFalse(response.json()['success'])
+
+    def test_unknown_user_budget(self):
+        with self.assertQueryBudget(1):
+            response = self.verify('nobody', '123456')
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_cannot_be_replayed(self):
+        _, two_factor_auth = self.create_vpn_user(groups=1)
+        token = pyotp.TOTP(two_factor_auth.secret_key).now()
+        self.assertTrue(self.verify('alice', token).json()['success'])
+        self.assertFalse(self.verify('alice', token).json()['success'])
+
+    def test_older_step_rejected_after_newer_step(self):
+        _, two_factor_auth = self.create_vpn_user(groups=1)
+        totp = pyotp.TOTP(two_factor_auth.secret_key)
+        self.assertTrue(two_factor_auth.verify_token(totp.now()))
+        self.assertFalse(two_factor_auth.verify_token(totp.at(time.time() - 30)))
+
+    def test_enable_after_verify_reuses_token(self):
+        _, two_factor_auth = self.create_vpn_user(enabled=False)
+        token = pyotp.TOTP(two_factor_auth.secret_key).now()
+        self.assertTrue(self.verify('alice', token).json()['success'])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post(
+            '/api/auth/enable-2fa/', {'username': 'alice', 'token': token}, content_type='application/json'
+        )
+        self.assertTrue(response.json()['success'])
+
+
+class BackupCodeTests(AuthTestCase):
+    def verify(self, username, token):
+        return self.client.post(
+            '/api/auth/verify-2fa/', {'username': username, 'token': token}, content_type='application/json'
+        )
+
+    def test_codes_stored_as_salted_hashes(self):
+        _, two_factor_auth = self.create_vpn_user()
+        codes = two_factor_auth.regenerate_backup_codes()
+        self.assertEqual(len(codes), BACKUP_CODE_COUNT)
+        stored = list(two_factor_auth.backup_codes.values_list('prefix', 'salt', 'code_hash'))
+        self.assertEqual(len({prefix for prefix, _, _ in stored}), BACKUP_CODE_COUNT)
+        self.assertEqual(len({salt for _, salt, _ in stored}), BACKUP_CODE_COUNT)
+        for code in codes:
+            self.assertNotIn(code.replace('-', ''), {code_hash for _, _, code_hash in stored})
+
+    def test_backup_code_fallback_budget(self):
+        _, two_factor_auth = self.create_vpn_user(groups=5)
+        code = two_factor_auth.regenerate_backup_codes()[0]
+        # 사용자/2FA 1 + 접두사 조회 1 + 사용 처리 1 + 로그 1
+        with self.assertQueryBudget(4):
+            response = self.verify('alice', code.lower())
+        self.assertTrue(response.json()['backup_code_used'])
+        # 일회용
+        self.assertFalse(self.verify('alice', code).json()['success'])
+
+    def test_wrong_code_with_valid_prefix_rejected(self):
+        _, two_factor_auth = self.create_vpn_user()
+        code = two_factor_auth.regenerate_backup_codes()[0].replace('-', '')
+        wrong = code[:-1] + ('2' if code[-1] != '2' else '3')
+        self.assertFalse(two_factor_auth.verify_backup_code(wrong))
+        self.assertTrue(two_factor_auth.verify_backup_code(code))
+
+    def test_regenerate_invalidates_old_codes(self):
+        _, two_factor_auth = self.create_vpn_user()
+        old = two_factor_auth.regenerate_backup_codes()
+        two_factor_auth.regenerate_backup_codes()
+        self.assertFalse(two_factor_auth.verify_backup_code(old[0]))
+
+    def generate(self, username, token):
+        return self.client.post(
+            '/api/auth/backup-codes/', {'username': username, 'token': token}, content_type='application/json'
+        )
+
+    def test_generate_endpoint_requires_token(self):
+        _, two_factor_auth = self.create_vpn_user()
+        # VPN 사용자는 로그인 세션 없이 현재 TOTP 코드로 발급
+        self.assertEqual(self.generate('alice', '000000').status_code, 400)
+        response = self.generate('alice', pyotp.TOTP(two_factor_auth.secret_key).now())
+        self.assertEqual(len(response.json()['backup_codes']), BACKUP_CODE_COUNT)
+
+    def test_generate_endpoint_requires_enabled_2fa(self):
+        _, two_factor_auth = self.create_vpn_user(enabled=False)
+        response = self.generate('alice', pyotp.TOTP(two_factor_auth.secret_key).now())
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(two_factor_auth.backup_codes.exists())
+
+    def test_generate_endpoint_shares_verify_rate_limit(self):
+        _, two_factor_auth = self.create_vpn_user()
+        for _ in range(verify_limiter.limiters['user'].limit):
+            self.assertEqual(self.generate('alice', '000000').status_code, 400)
+        response = self.generate('alice', pyotp.TOTP(two_factor_auth.secret_key).now())
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(two_factor_auth.backup_codes.exists())
+        # 같은 사용자의 verify-2fa 도 잠김
+        self.assertEqual(self.verify('alice', '000000').status_code, 429)
+
+
+class BackupCodeConcurrencyTests(TransactionTestCase):
+    def test_code_consumed_once_under_concurrency(self):
+        user = User.objects.create(username='alice')
+        two_factor_auth = UserTwoFactorAuth.objects.create(user=user, secret_key=pyotp.random_base32(), is_enabled=True)
+        code = two_factor_auth.regenerate_backup_codes()[0]
+        results = []
+        barrier = threading.Barrier(4)
+
+        def consume():
+            barrier.wait()
+            try:
+                results.append(UserTwoFactorAuth.objects.get(pk=two_factor_auth.pk).verify_backup_code(code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+class VerifyRateLimitTests(AuthTestCase):
+    def verify(self, username, token, client_ip='10.0.0.1', **extra):
+        return self.client.post(
+            '/api/auth/verify-2fa/', {'username': username, 'token': token, 'client_ip': client_ip},
+            content_type='application/json', **extra,
+        )
+
+    def test_locked_user_rejected_without_queries(self):
+        self.create_vpn_user()
+        for _ in range(verify_limiter.limiters['user'].limit):
+            self.assertEqual(self.verify('alice', '000000').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.verify('alice', '000000')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), verify_limiter.limiters['user'].lockout)
+
+    def test_lockout_per_username_not_other_users(self):
+        self.create_vpn_user()
+        _, bob_auth = self.create_vpn_user('bob')
+        for _ in range(verify_limiter.limiters['user'].limit):
+            self.verify('alice', '000000')
+        self.assertEqual(self.verify('alice', '000000', client_ip='10.0.0.2').status_code, 429)
+        response = self.verify('bob', pyotp.TOTP(bob_auth.secret_key).now())
+        self.assertTrue(response.json()['success'])
+
+    def test_ip_limit_across_usernames(self):
+        for index in range(verify_limiter.limiters['ip'].limit):
+            self.verify(f'nobody{index}', '000000')
+        self.assertEqual(self.verify('alice', '000000').status_code, 429)
+        self.assertEqual(self.verify('alice', '000000', REMOTE_ADDR='10.0.0.2').status_code, 404)
+
+    def test_rotating_body_client_ip_does_not_reset_ip_limit(self):
+        for index in range(verify_limiter.limiters['ip'].limit):
+            self.verify(f'nobody{index}', '000000', client_ip=f'198.51.100.{index}')
+        self.assertEqual(self.verify('alice', '000000', client_ip='198.51.100.250').status_code, 429)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_ip_limit_uses_address_added_by_trusted_proxy(self):
+        for index in range(verify_limiter.limiters['ip'].limit):
+            # 클라이언트가 보낸 X-Forwarded-For 값 (앞쪽) 은 바꿔도 프록시가 붙인 주소로 셈
+            self.verify(f'nobody{index}', '000000', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}, 203.0.113.7')
+        self.assertEqual(self.verify('alice', '000000', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code, 429)
+        self.assertEqual(self.verify('alice', '000000', HTTP_X_FORWARDED_FOR='203.0.113.8').status_code, 404)
+
+    def test_success_resets_user_counter(self):
+        _, two_factor_auth = self.create_vpn_user()
+        for _ in range(verify_limiter.limiters['user'].limit - 1):
+            self.verify('alice', '000000')
+        self.assertTrue(self.verify('alice', pyotp.TOTP(two_factor_auth.secret_key).now()).json()['success'])
+        self.assertEqual(verify_limiter.state('alice')['user']['failures'], 0)
+
+    def test_state_endpoint_and_unlock(self):
+        self.create_vpn_user()
+        for _ in range(verify_limiter.limiters['user'].limit):
+            self.verify('alice', '000000')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        data = self.client.get('/api/auth/verify-rate-limit/', {'username': 'alice', 'client_ip': '10.0.0.1'}).json()
+        self.assertTrue(data['state']['user']['locked'])
+        self.assertFalse(data['state']['ip']['locked'])
+        self.assertEqual(data['stats']['lockouts'], 1)
+
+        response = self.client.delete('/api/auth/verify-rate-limit/?username=alice')
+        self.assertFalse(response.json()['state']['user']['locked'])
+        self.assertEqual(self.verify('alice', '000000').status_code, 200)
+
+    @override_settings(VERIFY_RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        self.create_vpn_user()
+        for _ in range(verify_limiter.limiters['user'].limit + 1):
+            self.assertEqual(self.verify('alice', '000000').status_code, 200)
+
+
+class SlidingWindowLimiterTests(TestCase):
+    def test_previous_window_weighted(self):
+        limiter = SlidingWindowLimiter('user', limit=4, window=100, lockout=50, store=MemoryStore())
+        for _ in range(3):
+            self.assertEqual(limiter.hit('alice', now=1090), 0)
+        # 직전 윈도우 3회 * (1 - 0.5) + 현재 1회 = 2.5
+        self.assertEqual(limiter.hit('alice', now=1150), 0)
+        self.assertEqual(limiter.state('alice', now=1150)['failures'], 2.5)
+        # 윈도우가 완전히 지나면 직전 실패는 잊힘
+        self.assertEqual(limiter.state('alice', now=1300)['failures'], 0)
+
+    def test_lock_expires(self):
+        limiter = SlidingWindowLimiter('user', limit=2, window=100, lockout=50, store=MemoryStore())
+        limiter.hit('alice', now=1000)
+        self.assertEqual(limiter.hit('alice', now=1001), 50)
+        self.assertTrue(limiter.state('alice', now=1030)['locked'])
+        self.assertFalse(limiter.state('alice', now=1052)['locked'])
+
+    def test_memory_store_bounded(self):
+        store = MemoryStore(max_entries=3)
+        for index in range(5):
+            store.incr(f'key{index}', 60)
+        self.assertEqual(store.size(), 3)
+        self.assertEqual(store.evictions, 2)
+
+    def test_cache_store(self):
+        limiter = SlidingWindowLimiter('user', limit=2, window=100, lockout=50, store=CacheStore('default'))
+        cache.clear()
+        now = time.time()
+        limiter.hit('alice', now=now)
+        self.assertEqual(limiter.hit('alice', now=now), 50)
+        self.assertTrue(limiter.state('alice', now=now)['locked'])
+        limiter.reset('alice', now=now)
+        self.assertFalse(limiter.state('alice', now=now)['locked'])
+
+class AsyncViewTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    async def check_status(self, view, username, **params):
+        request = self.factory.get('/api/auth/check-status/', {'username': username, 'send_email': 'false', **params})
+        response = await view(request)
+        if hasattr(response, 'render'):
+            # DRF 동기 뷰 응답
+            response = await sync_to_async(response.render)()
+        return json.loads(response.content)
+
+    async def test_check_status_matches_sync_view(self):
+        await sync_to_async(self.create_vpn_user)(groups=2)
+        await sync_to_async(self.create_vpn_user)('bob', enabled=False)
+        for username in ('alice', 'bob', 'nobody'):
+            expected = await self.check_status(sync_to_async(views.check_2fa_status), username)
+            await sync_to_async(decision_cache.clear)()
+            actual = await self.check_status(async_views.check_2fa_status, username)
+            expected.pop('cache_ttl', None)
+            actual.pop('cache_ttl', None)
+            self.assertEqual(actual, expected)
+
+    def test_check_status_budget(self):
+        self.create_vpn_user(groups=2)
+        check_status = async_to_sync(self.check_status)
+        # 동기 뷰와 같은 예산: 버전 카운터 1 + 사용자/2FA 1 + 그룹/정책 1, 캐시 적중 시 버전 카운터 1
+        with self.assertQueryBudget(CheckStatusQueryBudgetTests.MISS_BUDGET):
+            check_status(async_views.check_2fa_status, 'alice', source='lambda_vpn_check')
+        with self.assertQueryBudget(CheckStatusQueryBudgetTests.HIT_BUDGET):
+            data = check_status(async_views.check_2fa_status, 'alice', source='lambda_vpn_check')
+        self.assertTrue(data['is_enabled'])
+
+    def test_check_status_shares_drf_throttle_with_sync_view(self):
+        self.create_vpn_user()
+        check_status = async_to_sync(async_views.check_2fa_status)
+        request = lambda: self.factory.get('/api/auth/check-status/', {'username': 'alice', 'send_email': 'false'})
+        with mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/hour', 'user': '1000/hour'}):
+            self.assertEqual(self.client.get('/api/auth/check-status/', {'username': 'alice'}).status_code, 200)
+            self.assertEqual(check_status(request()).status_code, 200)
+            response = check_status(request())
+            self.assertEqual(response.status_code, 429)
+            self.assertGreater(int(response['Retry-After']), 0)
+            self.assertEqual(self.client.get('/api/auth/check-status/', {'username': 'alice'}).status_code, 429)
+
+    async def verify(self, username, token, client_ip='10.0.0.1'):
+        request = self.factory.post(
+            '/api/auth/verify-2fa/', {'username': username, 'token': token, 'client_ip': client_ip},
+            content_type='application/json',
+        )
+        return await async_views.verify_2fa(request)
+
+    async def test_rotating_body_client_ip_does_not_reset_ip_limit(self):
+        for index in range(verify_limiter.limiters['ip'].limit):
+            await self.verify(f'nobody{index}', '000000', client_ip=f'198.51.100.{index}')
+        self.assertEqual((await self.verify('alice', '000000', client_ip='198.51.100.250')).status_code, 429)
+
+    async def test_verify_consumes_token_and_logs(self):
+        _, two_factor_auth = await sync_to_async(self.create_vpn_user)(enabled=False)
+        token = pyotp.TOTP(two_factor_auth.secret_key).now()
+        self.assertTrue(json.loads((await self.verify('alice', token)).content)['success'])
+        self.assertFalse(json.loads((await self.verify('alice', token)).content)['success'])
+        self.assertTrue((await UserTwoFactorAuth.objects.aget(pk=two_factor_auth.pk)).is_enabled)
+        self.assertEqual(await VPNAccessLog.objects.acount(), 2)
+        self.assertEqual((await self.verify('nobody', '123456')).status_code, 404)
+
+    async def test_verify_backup_code_and_lockout(self):
+        _, two_factor_auth = await sync_to_async(self.create_vpn_user)()
+        code = (await sync_to_async(two_factor_auth.regenerate_backup_codes)())[0]
+        self.assertTrue(json.loads((await self.verify('alice', code)).content)['backup_code_used'])
+        for _ in range(verify_limiter.limiters['user'].limit):
+            await self.verify('alice', '000000')
+        self.assertEqual((await self.verify('alice', '000000')).status_code, 429)
+
+    @override_settings(CONNECTION_INGEST_TOKEN='ingest-secret')
+    async def test_ingest(self):
+        await sync_to_async(self.create_vpn_user)()
+        auth = {'headers': {'Authorization': 'Bearer ingest-secret'}}
+        request = self.factory.post('/api/auth/log-vpn-connection/', {'events': [
+            {'username': 'alice', 'vpn-ip': '172.16.0.5', 'connection-id': 'cvpn-connection-1'},
+            {'username': 'alice'},
+        ]}, content_type='application/json', **auth)
+        response = await async_views.log_vpn_connection(request)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.content)['accepted'], 1)
+        self.assertTrue(await VPNAccessLog.objects.filter(connection_id='cvpn-connection-1').aexists())
+
+        request = self.factory.post('/api/auth/log-vpn-connection/', 'not json', content_type='application/json', **auth)
+        self.assertEqual((await async_views.log_vpn_connection(request)).status_code, 400)
+        request = self.factory.post('/api/auth/log-vpn-connection/', {'events': []}, content_type='application/json')
+        self.assertEqual((await async_views.log_vpn_connection(request)).status_code, 401)
+
+class BenchmarkServingTests(TransactionTestCase):
+    def test_compares_wsgi_and_asgi(self):
+        user = User.objects.create(username='alice')
+        UserTwoFactorAuth.objects.create(user=user, secret_key=pyotp.random_base32(), is_enabled=True)
+        out = StringIO()
+        call_command('benchmark_serving', requests=20, concurrency=4, workers=2, db_latency=0, json=True, stdout=out)
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(results['wsgi']['statuses'], {'200': 20})
+        self.assertEqual(results['asgi']['statuses'], {'200': 20})
+
+class BenchmarkSuiteTests(TestCase):
+    def run_suite(self, **options):
+        out = StringIO()
+        call_command(
+            'benchmark_suite', users='3', groups='0,2', logs='5', iterations=3, warmup=1,
+            in_place=True, json=True, stdout=out, **options
+        )
+        return json.loads(out.getvalue())
+
+    def test_reports_query_counts_per_data_size(self):
+        report = self.run_suite()
+        self.assertEqual([(d['users'], d['groups'], d['logs']) for d in report['datasets']], [(3, 0, 5), (3, 2, 5)])
+        results = {(r['case'], r['groups']): r for r in report['results']}
+        self.assertNotIn(('is_access_allowed_now', 0), results)
+        self.assertEqual(results[('check_2fa_status.miss', 2)]['queries_per_op'], CheckStatusQueryBudgetTests.MISS_BUDGET)
+        self.assertEqual(results[('check_2fa_status.hit', 2)]['queries_per_op'], CheckStatusQueryBudgetTests.HIT_BUDGET)
+        self.assertEqual(results[('verify_2fa.valid', 2)]['queries_per_op'], 3)
+        self.assertEqual(results[('verify_token.valid', 2)]['queries_per_op'], 0)
+        self.assertTrue(all(result['errors'] == 0 for result in report['results']))
+        # 측정용 데이터는 롤백됨
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+
+    def test_baseline_query_regression_fails(self):
+        report = self.run_suite(case=['check_2fa_status.hit'])
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            for result in report['results']:
+                result['queries_per_op'] = 0
+                result['p50_us'] = 1e9
+            json.dump(report, file)
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaisesMessage(CommandError, '쿼리 0 -> 1.0'):
+            self.run_suite(case=['check_2fa_status.hit'], baseline=file.name)
+
+class ReplayLambdaEventsTests(TransactionTestCase):
+    def write_events(self, lines):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            for line in lines:
+                file.write(json.dumps(line) + '\n')
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_load_events_orders_by_time_and_infers_type(self):
+        path = self.write_events([
+            {'type': 'pre-auth', 'at': 1700000005, 'event': {'username': 'bob'}},
+            {'username': 'alice', 'vpn-ip': '172.16.0.2'},
+            {'at': 1700000001, 'event': {'username': 'alice', 'public-ip': '203.0.113.1'}},
+        ])
+        events = load_events(path)
+        self.assertEqual([(offset, event_type) for offset, event_type, _ in events], [
+            (0.0, 'connection'), (0.0, 'pre-auth'), (4.0, 'pre-auth'),
+        ])
+
+    def test_replays_through_lambda_handlers(self):
+        user = User.objects.create(username='alice')
+        UserTwoFactorAuth.objects.create(user=user, secret_key=pyotp.random_base32(), is_enabled=True)
+        path = self.write_events([
+            {'type': 'pre-auth', 'at': 0, 'event': {'username': 'alice', 'public-ip': '203.0.113.1'}},
+            {'type': 'pre-auth', 'at': 0, 'event': {'username': 'nobody', 'public-ip': '203.0.113.2'}},
+            {'type': 'connection', 'at': 0, 'event': {
+                'username': 'alice', 'public-ip': '203.0.113.1', 'vpn-ip': '172.16.0.2',
+                'connection-id': 'cvpn-connection-replay-1',
+            }},
+        ])
+        out = StringIO()
+        call_command('replay_lambda_events', path, speed=0, concurrency=2, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['types']['pre-auth']['outcomes'], {'allowed': 1, 'requires-2fa-setup': 1})
+        self.assertEqual(report['types']['connection']['outcomes'], {'logged': 1})
+        endpoints = report['backend']['endpoints']
+        self.assertEqual(endpoints['/api/auth/check-status/']['requests'], 2)
+        self.assertEqual(endpoints['/api/auth/log-vpn-connection/']['statuses'], {'202': 1})
+        self.assertGreater(report['backend']['queries'], 0)
+        self.assertTrue(VPNAccessLog.objects.filter(connection_id='cvpn-connection-replay-1').exists())
+
+@override_settings(METRICS_TOKEN='metrics-secret')
+class MetricsTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+
+    def check_status(self, username):
+        return self.client.get(
+            '/api/auth/check-status/', {'username': username, 'source': 'lambda_vpn_check', 'send_email': 'false'}
+        )
+
+    def scrape(self, **headers):
+        headers.setdefault('HTTP_AUTHORIZATION', 'Bearer metrics-secret')
+        response = self.client.get('/metrics', **headers)
+        return response, response.content.decode()
+
+    def test_records_latency_queries_and_decisions_per_view(self):
+        self.create_vpn_user('alice', groups=2)
+        self.create_vpn_user('bob', enabled=False)
+        user, _ = self.create_vpn_user('carol', groups=1)
+        policy = user.groups.first().vpn_policy
+        policy.allowed_weekdays = ''
+        policy.save()
+        user, _ = self.create_vpn_user('dave')
+        user.is_active = False
+        user.save()
+        for username in ('alice', 'bob', 'carol', 'dave', 'nobody'):
+            self.check_status(username)
+
+        response, body = self.scrape()
+        self.assertEqual(response['Content-Type'], metrics.PROMETHEUS_CONTENT_TYPE)
+        for outcome in metrics.DECISION_OUTCOMES:
+            self.assertIn(f'vpn_access_decisions_total{{outcome="{outcome}"}} 1', body)
+        self.assertIn('vpn_http_requests_total{view="check_2fa_status",method="GET",status="200"} 5', body)
+        self.assertIn('vpn_http_request_duration_seconds_bucket{view="check_2fa_status",le="+Inf"} 5', body)
+        # 판정 캐시 미스 4건 (사용자 있음) + 없는 사용자 2건
+        self.assertIn(
+            f'vpn_http_request_db_queries_sum{{view="check_2fa_status"}} {4 * CheckStatusQueryBudgetTests.MISS_BUDGET + 2}',
+            body,
+        )
+        self.assertIn('vpn_slack_outbox_notifications{status="pending"} 0', body)
+        self.assertIn('vpn_decision_cache_entries 5', body)
+
+    def test_unmatched_paths_share_one_label(self):
+        self.client.get('/no-such-page/1')
+        self.client.get('/no-such-page/2')
+        self.assertEqual(metrics.http_requests.value('<unmatched>', 'GET', '404'), 2)
+
+    def test_async_view_records_decision(self):
+        self.create_vpn_user('alice')
+        request = AsyncRequestFactory().get(
+            '/api/auth/check-status/', {'username': 'alice', 'source': 'lambda_vpn_check', 'send_email': 'false'}
+        )
+        async_to_sync(async_views.check_2fa_status)(request)
+        self.assertEqual(metrics.access_decisions.value('granted'), 1)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong')[0].status_code, 401)
+        self.assertEqual(self.scrape()[0].status_code, 200)
+
+    def test_not_exposed_without_token_unless_debug(self):
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.scrape()[0].status_code, 404)
+
+    def test_worker_metrics_server_requires_token(self):
+        server = metrics.serve_metrics(0, host='127.0.0.1')
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(url, timeout=5)
+        self.assertEqual(raised.exception.code, 401)
+        request = urllib.request.Request(url, headers={'Authorization': 'Bearer metrics-secret'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            self.assertEqual(response.status, 200)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'test', ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value, 'a')
+        self.assertEqual(list(histogram.samples()), [
+            'test_seconds_bucket{view="a",le="0.1"} 2',
+            'test_seconds_bucket{view="a",le="1.0"} 3',
+            'test_seconds_bucket{view="a",le="+Inf"} 4',
+            'test_seconds_sum{view="a"} 5.65',
+            'test_seconds_count{view="a"} 4',
+        ])
+
+    def test_slack_send_failure_is_counted(self):
+        sender = notifications.SlackSender(webhook_url='http://127.0.0.1:9/', timeout=1)
+        ok, _, _ = sender.send({'text': 'test'})
+        sender.close()
+        self.assertFalse(ok)
+        self.assertEqual(metrics.slack_sends.value('error'), 1)
+
+class PolicyEngineTests(TestCase):
+    TZ = pytz.timezone('Asia/Seoul')
+
+    def policy(self, start=None, end=None, weekdays='1,2,3,4,5,6,7'):
+        return VPNGroupPolicy(
+            enable_time_restriction=True, allowed_start_time=start, allowed_end_time=end,
+            allowed_weekdays=weekdays, timezone='Asia/Seoul',
+        ).compiled()
+
+    def at(self, day, hour, minute=0, second=0, microsecond=0):
+        # 2026-10-19 은 월요일
+        return self.TZ.localize(datetime(2026, 10, day, hour, minute, second, microsecond))
+
+    def test_end_time_is_inclusive(self):
+        compiled = self.policy(dt_time(9, 0), dt_time(18, 0))
+        self.assertFalse(compiled.allows(self.at(19, 8, 59, 59)))
+        self.assertTrue(compiled.allows(self.at(19, 9, 0)))
+        self.assertTrue(compiled.allows(self.at(19, 18, 0)))
+        self.assertTrue(compiled.allows(self.at(19, 18, 0, 0, 500000)))
+        self.assertFalse(compiled.allows(self.at(19, 18, 0, 1)))
+
+    def test_start_equal_to_end_allows_that_second(self):
+        compiled = self.policy(dt_time(12, 0), dt_time(12, 0))
+        self.assertTrue(compiled.allows(self.at(19, 12, 0)))
+        self.assertFalse(compiled.allows(self.at(19, 12, 0, 1)))
+        self.assertFalse(compiled.allows(self.at(19, 11, 59, 59)))
+
+    def test_midnight_wrap(self):
+        # 월~금 22:00 ~ 06:00 (요일은 현재 날짜 기준)
+        compiled = self.policy(dt_time(22, 0), dt_time(6, 0), weekdays='1,2,3,4,5')
+        self.assertTrue(compiled.allows(self.at(19, 23, 30)))
+        self.assertTrue(compiled.allows(self.at(20, 0, 0)))
+        self.assertTrue(compiled.allows(self.at(20, 6, 0)))
+        self.assertFalse(compiled.allows(self.at(20, 6, 0, 1)))
+        self.assertFalse(compiled.allows(self.at(20, 12, 0)))
+        # 토요일 새벽은 금요일 밤 구간이 이어지더라도 토요일이 허용 요일이 아니므로 거부
+        self.assertFalse(compiled.allows(self.at(24, 1, 0)))
+
+    def test_next_change(self):
+        compiled = self.policy(dt_time(9, 0), dt_time(18, 0), weekdays='1,2,3,4,5')
+        self.assertEqual(compiled.next_change(self.at(19, 10, 0)), self.at(19, 18, 0, 1))
+        self.assertEqual(compiled.next_change(self.at(19, 18, 0, 1)), self.at(20, 9, 0))
+        # 금요일 저녁 이후 다음 허용은 월요일 09:00
+        self.assertEqual(compiled.next_change(self.at(23, 19, 0)), self.at(26, 9, 0))
+
+        wrapped = self.policy(dt_time(22, 0), dt_time(6, 0))
+        self.assertEqual(wrapped.next_change(self.at(19, 23, 0)), self.at(20, 6, 0, 1))
+        self.assertEqual(wrapped.next_change(self.at(19, 12, 0)), self.at(19, 22, 0))
+
+        self.assertIsNone(self.policy(weekdays='1,2,3,4,5,6,7').next_change(self.at(19, 12, 0)))
+        self.assertIsNone(self.policy(weekdays='').next_change(self.at(19, 12, 0)))
+
+    def test_boundary_walk_across_policies(self):
+        # 월요일만 허용하는 정책과 매일 09:00 ~ 18:00 정책: 화요일에는 매일의 경계를 지나도 판정이 그대로
+        monday_only = self.policy(weekdays='1')
+        office_hours = self.policy(dt_time(9, 0), dt_time(18, 0))
+        allowed, _, changes_at = evaluate_policies([monday_only, office_hours], self.at(20, 10, 0))
+        self.assertFalse(allowed)
+        self.assertEqual(changes_at, self.at(26, 9, 0))
+
+        allowed, _, changes_at = evaluate_policies([monday_only, office_hours], self.at(19, 10, 0))
+        self.assertTrue(allowed)
+        self.assertEqual(changes_at, self.at(19, 18, 0, 1))
+
+    def test_boundary_walk_gives_up_after_max_steps(self):
+        monday_only = self.policy(weekdays='1')
+        office_hours = self.policy(dt_time(9, 0), dt_time(18, 0))
+        with mock.patch.object(policy_engine, 'MAX_BOUNDARY_STEPS', 3):
+            allowed, _, changes_at = evaluate_policies([monday_only, office_hours], self.at(20, 10, 0))
+        self.assertFalse(allowed)
+        self.assertIsNone(changes_at)
+
+    def test_seconds_until_change_feeds_cache_ttl(self):
+        policy = VPNGroupPolicy(
+            enable_time_restriction=True, allowed_start_time=dt_time(9, 0), allowed_end_time=dt_time(18, 0),
+            allowed_weekdays='1,2,3,4,5', timezone='Asia/Seoul',
+        )
+        self.assertEqual(policy.seconds_until_change(self.at(19, 17, 0)), 3601)
+        policy.enable_time_restriction = False
+        self.assertIsNone(policy.seconds_until_change(self.at(19, 17, 0)))
+
+
+class TOTPTests(TestCase):
+    def test_match_token_agrees_with_pyotp(self):
+        secret = pyotp.random_base32()
+        totp = pyotp.TOTP(secret)
+        now = time.time()
+        step = current_step(now)
+        for offset in (-1, 0, 1):
+            self.assertEqual(match_token(secret, totp.at(now + offset * 30), now=now), step + offset)
+        self.assertIsNone(match_token(secret, totp.at(now + 90), now=now))
+
+    def test_match_token_rejects_malformed(self):
+        secret = pyotp.random_base32()
+        for token in (None, '', '12345', '1234567', 'abcdef'):
+            self.assertIsNone(match_token(secret, token))
+        self.assertIsNone(match_token('', '123456'))
+
+
+class SetupQueryBudgetTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        qr_cache.clear()
+
+    def setup(self, username, **extra):
+        return self.client.post(
+            '/api/auth/setup-2fa/', {'username': username, **extra}, content_type='application/json'
+        )
+
+    def test_existing_2fa_budget(self):
+        self.create_vpn_user(groups=5)
+        with self.assertQueryBudget(1):
+            response = self.setup('alice')
+        self.assertTrue(response.json()['success'])
+
+    def test_new_2fa_budget(self):
+        User.objects.create(username='bob')
+        # 사용자/2FA 1 + 생성 1 + 캐시 버전 증가 1 + SAVEPOINT/RELEASE 2 (get_or_create 와 비밀 키 재저장 없음)
+        with self.assertQueryBudget(5):
+            response = self.setup('bob')
+        self.assertTrue(response.json()['secret_key'])
+        self.assertEqual(UserTwoFactorAuth.objects.get(user__username='bob').secret_key, response.json()['secret_key'])
+
+    def test_qr_rendered_once_per_secret(self):
+        self.create_vpn_user()
+        before = qr_cache.stats()
+        first = self.setup('alice').json()['qr_code']
+        second = self.setup('alice').json()['qr_code']
+        after = qr_cache.stats()
+        self.assertEqual(first, second)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_svg_and_url_only_formats(self):
+        self.create_vpn_user()
+        self.assertTrue(self.setup('alice', qr_format='svg').json()['qr_code'].startswith('<svg'))
+        data = self.setup('alice', qr_format='none').json()
+        self.assertNotIn('qr_code', data)
+        self.assertEqual(data['qr_code_url'], '/api/auth/qr-code/?username=alice')
+        self.assertEqual(self.setup('alice', qr_format='gif').status_code, 400)
+
+
+class QRCodeImageTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        qr_cache.clear()
+
+    def test_image_with_etag_and_revalidation(self):
+        self.create_vpn_user(enabled=False)
+        response = self.client.get('/api/auth/qr-code/', {'username': 'alice'})
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/api/auth/qr-code/', {'username': 'alice'}, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_secret(self):
+        _, two_factor_auth = self.create_vpn_user(enabled=False)
+        etag = self.client.get('/api/auth/qr-code/', {'username': 'alice', 'output': 'svg'})['ETag']
+        two_factor_auth.generate_secret_key()
+        response = self.client.get('/api/auth/qr-code/', {'username': 'alice', 'output': 'svg'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+
+    def test_unknown_user_and_format(self):
+        self.assertEqual(self.client.get('/api/auth/qr-code/', {'username': 'nobody'}).status_code, 404)
+        self.create_vpn_user(enabled=False)
+        self.assertEqual(self.client.get('/api/auth/qr-code/', {'username': 'alice', 'output': 'gif'}).status_code, 400)
+
+    def test_enrolled_user_secret_is_not_served(self):
+        self.create_vpn_user()
+        response = self.client.get('/api/auth/qr-code/', {'username': 'alice'})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('image', response['Content-Type'])
+
+    def test_requests_are_throttled_per_client_ip(self):
+        self.create_vpn_user(enabled=False)
+        for _ in range(qr_limiter.limit):
+            self.assertEqual(self.client.get('/api/auth/qr-code/', {'username': 'alice'}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/qr-code/', {'username': 'alice'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        # 다른 클라이언트 IP 는 영향 없음
+        response = self.client.get('/api/auth/qr-code/', {'username': 'alice'}, REMOTE_ADDR='10.9.9.9')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ACCESS_LOG_PARTITIONING=True)
+class AccessMonthBucketTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='alice')
+        self.january = datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+        self.march = datetime(2026, 3, 15, 12, 0, tzinfo=dt_timezone.utc)
+
+    def log(self, access_time):
+        return VPNAccessLog.objects.create(
+            user=self.user, username='alice', client_ip='10.0.0.1', access_time=access_time
+        )
+
+    def march_ids(self):
+        march_end = datetime(2026, 3, 31, 23, 59, 59, tzinfo=dt_timezone.utc)
+        return set(VPNAccessLog.objects.in_time_range(datetime(2026, 3, 1, tzinfo=dt_timezone.utc), march_end)
+                   .values_list('id', flat=True))
+
+    def test_save_and_bulk_create_fill_bucket(self):
+        created = self.log(self.march)
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=self.user, username='alice', client_ip='10.0.0.2', access_time=self.march)
+        ])
+        self.assertEqual(set(VPNAccessLog.objects.values_list('access_month', flat=True)), {202603})
+        self.assertIn(created.id, self.march_ids())
+
+    def test_queryset_update_recomputes_bucket(self):
+        moved = self.log(self.january)
+        VPNAccessLog.objects.filter(pk=moved.pk).update(access_time=self.march)
+        self.assertIn(moved.pk, self.march_ids())
+
+        shifted = self.log(self.january)
+        VPNAccessLog.objects.filter(pk=shifted.pk).update(access_time=F('access_time') + timedelta(days=59))
+        shifted.refresh_from_db()
+        self.assertEqual(shifted.access_month, 202603)
+        self.assertIn(shifted.pk, self.march_ids())
+
+    def test_bulk_update_and_save_update_fields_recompute_bucket(self):
+        first, second = self.log(self.january), self.log(self.january)
+        first.access_time = self.march
+        VPNAccessLog.objects.bulk_update([first], ['access_time'])
+        second.access_time = self.march
+        second.save(update_fields=['access_time'])
+        self.assertEqual(self.march_ids(), {first.pk, second.pk})
+
+
+class AccessLogsQueryBudgetTests(AuthTestCase):
+    def test_access_logs_budget(self):
+        user, _ = self.create_vpn_user()
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.1', access_granted=True)
+            for _ in range(60)
+        ])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        # 세션 1 + 사용자 1 + 로그 1
+        with self.assertQueryBudget(3):
+            response = self.client.get('/api/auth/access-logs/')
+        self.assertEqual(len(response.json()['logs']), 50)
+
+    def test_keyset_pages_cover_all_rows_once(self):
+        user, _ = self.create_vpn_user()
+        # 같은 시각의 로그가 여러 건이어도 (access_time, id)로 순서가 결정됨
+        same_time = timezone.now()
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.1', access_granted=True, access_time=same_time)
+            for _ in range(25)
+        ])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 10}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertQueryBudget(3):
+                data = self.client.get('/api/auth/access-logs/', params).json()
+            seen.extend(data['logs'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 25)
+
+    def test_deep_page_seeks_index_instead_of_scanning(self):
+        user, _ = self.create_vpn_user()
+        now = timezone.now()
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.1', access_granted=True,
+                         access_time=now - timedelta(seconds=index // 2))
+            for index in range(500)
+        ])
+        deep = VPNAccessLog.objects.order_by('-access_time', '-id')[450]
+        cursor = encode_cursor(deep.access_time, deep.id)
+
+        for params in ({}, {'username': 'alice'}, {'client_ip': '10.0.0.1'}):
+            with self.assertQueryBudget(1) as context:
+                rows, _ = paginate_access_logs(filter_access_logs(params), cursor, limit=10)
+            self.assertEqual(len(rows), 10)
+            self.assertTrue(all((row['access_time'], row['id']) < (deep.access_time, deep.id) for row in rows))
+
+            if connection.vendor == 'sqlite':
+                # 커서 위치부터 인덱스를 탐색해야 하고 (SCAN 이면 깊이에 비례), 정렬도 인덱스 순서여야 함
+                with connection.cursor() as cursor_:
+                    cursor_.execute('EXPLAIN QUERY PLAN ' + context.captured_queries[0]['sql'])
+                    plan = ' | '.join(row[-1] for row in cursor_.fetchall())
+                self.assertIn('SEARCH', plan, plan)
+                self.assertIn('access_time<', plan, plan)
+                self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_filters(self):
+        user, _ = self.create_vpn_user()
+        now = timezone.now()
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.1', access_granted=True, access_time=now),
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.2', access_granted=False, access_time=now),
+            VPNAccessLog(user=user, username='bob', client_ip='10.0.0.1', access_granted=True,
+                         access_time=now - timedelta(days=40)),
+        ])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+        def count(**params):
+            return len(self.client.get('/api/auth/access-logs/', params).json()['logs'])
+
+        self.assertEqual(count(username='alice'), 2)
+        self.assertEqual(count(client_ip='10.0.0.1'), 2)
+        self.assertEqual(count(granted='false'), 1)
+        self.assertEqual(count(start=(now - timedelta(days=1)).date().isoformat()), 2)
+        self.assertEqual(count(end=(now - timedelta(days=30)).isoformat()), 1)
+        self.assertEqual(self.client.get('/api/auth/access-logs/', {'cursor': 'broken'}).status_code, 400)
+
+    def test_health_check_budget(self):
+        with self.assertQueryBudget(0):
+            response = self.client.get('/api/auth/health/')
+        self.assertEqual(response.status_code, 200)
+
+
+class AccessLogExportTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        user, _ = self.create_vpn_user()
+        VPNAccessLog.objects.bulk_create([
+            VPNAccessLog(user=user, username='alice', client_ip='10.0.0.1', access_granted=index % 2 == 0)
+            for index in range(30)
+        ])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def export(self, **params):
+        response = self.client.get('/api/auth/access-logs/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    @override_settings(ACCESS_LOG_EXPORT_CHUNK_SIZE=7)
+    def test_ndjson_export(self):
+        lines = self.export().decode().splitlines()
+        self.assertEqual(len(lines), 30)
+        self.assertEqual(json.loads(lines[0])['username'], 'alice')
+
+    def test_csv_export_with_filter(self):
+        lines = self.export(output='csv', granted='true').decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(ACCESS_LOG_FIELDS))
+        self.assertEqual(len(lines), 16)
+
+    @override_settings(ACCESS_LOG_EXPORT_CHUNK_SIZE=7)
+    def test_gzip_export(self):
+        lines = gzip.decompress(self.export(gzip='true')).decode().splitlines()
+        self.assertEqual(len(lines), 30)
+
+    def test_invalid_output(self):
+        response = self.client.get('/api/auth/access-logs/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SyncVPNConnectionsTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_vpn_user('alice')
+        self.create_vpn_user('bob', enabled=False)
+        User.objects.create(username='carol')  # 2FA 미설정
+
+    def test_follows_next_token(self):
+        client = StubEC2Client.generate(2500, ['alice'], endpoint_id='cvpn-endpoint-test')
+        connections, pages = fetch_connections(client, 'cvpn-endpoint-test', page_size=1000)
+        self.assertEqual(len(connections), 2500)
+        self.assertEqual(pages, 3)
+
+    def test_bulk_sync_is_set_based_and_idempotent(self):
+        client = StubEC2Client.generate(
+            3000, ['alice', 'bob', 'carol', 'nobody'], endpoint_id='cvpn-endpoint-test', terminated_every=10
+        )
+        connections, _ = fetch_connections(client, 'cvpn-endpoint-test')
+        # 사용자 1 + connection_id 확인 (500개 단위) 6 + 저장 (DB 파라미터 한도 단위) + 세이브포인트 2
+        # -> 연결마다 실행되는 조회 없이 일괄 처리
+        fields = [field for field in VPNAccessLog._meta.concrete_fields if not field.primary_key]
+        insert_batches = math.ceil(1350 / connection.ops.bulk_batch_size(fields, [None] * 1350))
+        with self.assertQueryBudget(1 + 6 + insert_batches + 2):
+            entries, skipped = plan_connection_logs(connections)
+            write_connection_logs(entries)
+        self.assertEqual(skipped['inactive'], 300)
+        self.assertEqual(skipped['unknown_user'], 600)
+        self.assertEqual(skipped['no_2fa'], 750)
+        self.assertEqual(VPNAccessLog.objects.exclude(connection_id='').count(), 1350)
+        self.assertFalse(VPNAccessLog.objects.filter(username='bob', two_factor_verified=True).exists())
+
+        entries, skipped = plan_connection_logs(connections)
+        self.assertEqual(entries, [])
+        self.assertEqual(skipped['duplicate'], 1350)
+
+    def test_reports_only_inserted_rows(self):
+        client = StubEC2Client.generate(10, ['alice'], endpoint_id='cvpn-endpoint-test')
+        connections, _ = fetch_connections(client, 'cvpn-endpoint-test')
+        entries, _ = plan_connection_logs(connections)
+        # 계획과 저장 사이에 다른 동기화가 같은 연결 3건을 먼저 기록한 경우
+        self.assertEqual(write_connection_logs(plan_connection_logs(connections[:3])[0]), 3)
+        self.assertEqual(write_connection_logs(entries), 7)
+        self.assertEqual(VPNAccessLog.objects.count(), 10)
+
+    def test_command_with_stub(self):
+        out = StringIO()
+        call_command('sync_vpn_connections', stub_connections=50, stdout=out)
+        self.assertIn('동기화 완료', out.getvalue())
+        self.assertEqual(VPNAccessLog.objects.count(), 34)
+
+
+class SyncDaemonTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, _ = self.create_vpn_user('alice')
+        self.client_stub = StubEC2Client.generate(10, ['alice'], endpoint_id='cvpn-endpoint-test')
+        self.out = StringIO()
+        self.command = SyncCommand(stdout=self.out)
+        self.tracker = ConnectionTracker()
+        self.options = {'page_size': 1000, 'max_workers': 1, 'dry_run': False, 'daemon': True, 'verbosity': 1}
+
+    def poll(self):
+        target = ('test-region', 'cvpn-endpoint-test')
+        return self.command.poll_once(
+            [target], lambda region, endpoint_id: self.client_stub, {target: self.tracker}, self.options
+        )
+
+    def test_only_diffs_are_written(self):
+        self.assertTrue(self.poll())
+        self.assertEqual(VPNAccessLog.objects.count(), 10)
+
+        # 변경이 없으면 쿼리 없이 종료
+        with self.assertQueryBudget(0):
+            self.assertFalse(self.poll())
+
+        terminate_connection(self.client_stub.connections[0])
+        removed = self.client_stub.connections.pop()
+        self.client_stub.connections.append(make_connection('cvpn-endpoint-test', 100, 'alice'))
+        self.assertTrue(self.poll())
+
+        self.assertEqual(VPNAccessLog.objects.count(), 11)
+        closed = VPNAccessLog.objects.filter(disconnected_at__isnull=False)
+        self.assertEqual(set(closed.values_list('connection_id', flat=True)),
+                         {self.client_stub.connections[0]['ConnectionId'], removed['ConnectionId']})
+        self.assertIn('연결 종료', self.out.getvalue())
+        self.assertEqual(len(self.tracker.active), 9)
+
+    def test_failed_write_is_retried_on_next_poll(self):
+        target = 'authentication.management.commands.sync_vpn_connections.write_connection_logs'
+        with mock.patch(target, side_effect=DatabaseError('database is locked')):
+            with self.assertRaises(DatabaseError):
+                self.poll()
+        self.assertIsNone(self.tracker.active)
+        self.assertEqual(VPNAccessLog.objects.count(), 0)
+
+        self.assertTrue(self.poll())
+        self.assertEqual(VPNAccessLog.objects.count(), 10)
+        self.assertEqual(len(self.tracker.active), 10)
+
+    def test_first_poll_closes_connections_ended_while_stopped(self):
+        past = timezone.now() - timedelta(hours=1)
+        still_active = self.client_stub.connections[0]['ConnectionId']
+        ended = make_connection('cvpn-endpoint-test', 50, 'alice')
+        terminate_connection(ended)
+        ended['ConnectionEndTime'] = '2024-01-01 00:30:00'
+        self.client_stub.connections.append(ended)
+        for connection_id in (still_active, ended['ConnectionId'], 'cvpn-endpoint-test-gone'):
+            VPNAccessLog.objects.create(
+                user=self.user, username='alice', client_ip='10.0.0.1', access_time=past,
+                connection_id=connection_id, endpoint_id='cvpn-endpoint-test', connection_status='connected',
+            )
+
+        self.assertTrue(self.poll())
+        rows = {row.connection_id: row for row in VPNAccessLog.objects.filter(access_time=past)}
+        self.assertIsNone(rows[still_active].disconnected_at)
+        self.assertEqual(rows[ended['ConnectionId']].disconnected_at,
+                         datetime(2024, 1, 1, 0, 30, tzinfo=dt_timezone.utc))
+        self.assertIsNotNone(rows['cvpn-endpoint-test-gone'].disconnected_at)
+        self.assertEqual(rows['cvpn-endpoint-test-gone'].connection_status, 'disconnected')
+        self.assertIn('종료 처리', self.out.getvalue())
+
+        # 정리는 첫 폴링에서 한 번만
+        with self.assertQueryBudget(0):
+            self.assertFalse(self.poll())
+
+    def test_first_poll_leaves_other_endpoints_open(self):
+        past = timezone.now() - timedelta(hours=1)
+        # 다른 데몬이 맡은 엔드포인트의 연결, 엔드포인트를 알 수 없는 연결 이벤트 수신분, 이 데몬의 종료된 연결
+        for connection_id, endpoint_id in (('cvpn-other-1', 'cvpn-endpoint-other'), ('cvpn-ingested-1', ''),
+                                           ('cvpn-gone-1', 'cvpn-endpoint-test')):
+            VPNAccessLog.objects.create(
+                user=self.user, username='alice', client_ip='10.0.0.1', access_time=past,
+                connection_id=connection_id, endpoint_id=endpoint_id, connection_status='connected',
+            )
+
+        self.assertTrue(self.poll())
+        self.assertEqual(VPNAccessLog.objects.get(connection_id='cvpn-gone-1').connection_status, 'disconnected')
+        self.assertEqual(
+            set(VPNAccessLog.objects.filter(disconnected_at__isnull=True, access_time=past)
+                .values_list('connection_id', flat=True)),
+            {'cvpn-other-1', 'cvpn-ingested-1'},
+        )
+        self.assertEqual(
+            set(VPNAccessLog.objects.exclude(access_time=past).values_list('endpoint_id', flat=True)),
+            {'cvpn-endpoint-test'},
+        )
+
+    def test_daemon_stops_after_max_polls(self):
+        out = StringIO()
+        call_command('sync_vpn_connections', daemon=True, stub_connections=5, interval=0, max_interval=0,
+                     max_polls=3, stdout=out)
+        self.assertIn('3회 폴링', out.getvalue())
+        self.assertEqual(VPNAccessLog.objects.count(), 5)
+
+
+class MultiEndpointSyncTests(AuthTestCase):
+    def test_parse_targets(self):
+        targets = parse_endpoint_targets(['cvpn-a,us-east-1:cvpn-b', 'cvpn-a'], 'ap-northeast-2')
+        self.assertEqual(targets, [('ap-northeast-2', 'cvpn-a'), ('us-east-1', 'cvpn-b')])
+
+    def test_endpoints_are_polled_concurrently_and_isolated(self):
+        clients = {
+            endpoint_id: StubEC2Client.generate(100, ['alice'], endpoint_id=endpoint_id, latency=0.2, start=index * 100)
+            for index, endpoint_id in enumerate(['cvpn-a', 'cvpn-b', 'cvpn-c'])
+        }
+
+        def client_factory(region, endpoint_id):
+            if endpoint_id == 'cvpn-broken':
+                raise RuntimeError('AccessDenied')
+            return clients[endpoint_id]
+
+        targets = [('r1', 'cvpn-a'), ('r2', 'cvpn-b'), ('r3', 'cvpn-c'), ('r1', 'cvpn-broken')]
+        started = time.perf_counter()
+        results = fetch_all_endpoints(targets, client_factory)
+        elapsed = time.perf_counter() - started
+
+        # 순차 조회라면 0.6초 이상, 동시 조회이므로 가장 느린 엔드포인트 (0.2초) 수준
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual([result['endpoint_id'] for result in results], [target[1] for target in targets])
+        self.assertEqual([len(result['connections']) for result in results], [100, 100, 100, 0])
+        self.assertEqual(results[3]['error'], 'AccessDenied')
+        self.assertTrue(all(result['elapsed_ms'] >= 200 for result in results[:3]))
+
+    def test_client_factory_creates_one_client_per_endpoint_across_threads(self):
+        self.create_vpn_user('alice')
+        options = {'stub_connections': 1, 'stub_latency': 0.0}
+        created = []
+
+        def slow_generate(*args, **kwargs):
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+
+        with mock.patch.object(StubEC2Client, 'generate', side_effect=slow_generate):
+            client_factory = SyncCommand().get_client_factory(options)
+            barrier = threading.Barrier(4)
+            clients = []
+
+            def worker():
+                barrier.wait()
+                clients.append(client_factory('r1', 'cvpn-a'))
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(client is created[0] for client in clients))
+
+    def test_command_merges_endpoints(self):
+        self.create_vpn_user('alice')
+        out = StringIO()
+        call_command('sync_vpn_connections', endpoint_id=['cvpn-a', 'us-east-1:cvpn-b'], stub_connections=20, stdout=out)
+        self.assertEqual(VPNAccessLog.objects.count(), 40)
+        self.assertIn('us-east-1/cvpn-b', out.getvalue())
+
+
+@override_settings(CONNECTION_INGEST_TOKEN='ingest-secret')
+class ConnectionIngestTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_vpn_user('alice')
+
+    def post(self, payload, token='ingest-secret'):
+        return self.client.post(
+            '/api/auth/log-vpn-connection/', payload, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def event(self, index, **fields):
+        return {
+            'username': 'alice',
+            'vpn_ip': f'172.16.0.{index}',
+            'public_ip': f'203.0.113.{index}',
+            'connection_id': f'cvpn-connection-{index:04d}',
+            'connection_status': 'connected',
+            **fields,
+        }
+
+    def test_single_event(self):
+        response = self.post(self.event(1))
+        self.assertEqual(response.status_code, 202)
+        log = VPNAccessLog.objects.get()
+        self.assertEqual((log.client_ip, log.vpn_ip, log.connection_status), ('203.0.113.1', '172.16.0.1', 'connected'))
+        self.assertTrue(log.two_factor_verified)
+
+    def test_batch_is_idempotent_and_set_based(self):
+        batch = [self.event(index) for index in range(100)]
+        # 사용자 1 + connection_id 확인 1 + 저장 (SQLite 파라미터 한도로 2회) + 세이브포인트 2
+        with self.assertQueryBudget(6):
+            response = self.post({'events': batch + batch[:10]})
+        self.assertEqual(response.json()['accepted'], 110)
+        self.post(batch)
+        self.assertEqual(VPNAccessLog.objects.count(), 100)
+
+    def test_disconnect_and_invalid_events(self):
+        self.post([self.event(1), self.event(2)])
+        response = self.post([
+            {'username': 'alice', 'connection_id': 'cvpn-connection-0001', 'connection_status': 'disconnected'},
+            {'username': 'alice', 'vpn_ip': 'not-an-ip'},
+            {'vpn_ip': '172.16.0.9'},
+        ])
+        self.assertEqual(response.json()['accepted'], 1)
+        self.assertEqual([error['index'] for error in response.json()['rejected']], [1, 2])
+        log = VPNAccessLog.objects.get(connection_id='cvpn-connection-0001')
+        self.assertEqual(log.connection_status, 'disconnected')
+        self.assertIsNotNone(log.disconnected_at)
+
+    def test_disconnect_before_connect_is_held_until_logged(self):
+        connected_at = int(time.time()) - 600
+        disconnect = self.event(1, connection_status='disconnected', event_time=connected_at + 300)
+        self.assertEqual(self.post(disconnect).status_code, 202)
+        self.assertFalse(VPNAccessLog.objects.exists())
+
+        self.post(self.event(1, event_time=connected_at))
+        log = VPNAccessLog.objects.get()
+        self.assertEqual(log.connection_status, 'disconnected')
+        self.assertEqual(log.disconnected_at, datetime.fromtimestamp(connected_at + 300, tz=dt_timezone.utc))
+        self.assertEqual(connection_event_writer._held, [])
+
+        # 같은 배치 안에서 순서가 뒤바뀐 경우
+        self.post([self.event(2, connection_status='disconnected'), self.event(2)])
+        self.assertEqual(VPNAccessLog.objects.get(connection_id='cvpn-connection-0002').connection_status, 'disconnected')
+
+    def test_held_disconnect_expires(self):
+        dropped = connection_event_writer.dropped
+        stale = (timezone.now() - timedelta(hours=2)).timestamp()
+        self.post(self.event(1, connection_status='disconnected', event_time=stale))
+        self.post(self.event(1))
+        self.assertEqual(VPNAccessLog.objects.get().connection_status, 'connected')
+        self.assertEqual(connection_event_writer.dropped, dropped + 1)
+
+    def test_events_without_connection_id_are_idempotent(self):
+        event = self.event(1, connection_id='', event_time=1700000000)
+        self.post([event, event])
+        self.post(event)
+        self.post(self.event(1, connection_id='', event_time=1700000060))
+        self.assertEqual(VPNAccessLog.objects.count(), 2)
+
+    def test_out_of_range_event_time_rejects_only_that_event(self):
+        response = self.post([
+            self.event(1, event_time=1e20),
+            self.event(2, event_time='9999-99-99'),
+            self.event(3, event_time=-1e20),
+            self.event(4, event_time=1700000000),
+        ])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([error['index'] for error in response.json()['rejected']], [0, 1, 2])
+        self.assertEqual(list(VPNAccessLog.objects.values_list('connection_id', flat=True)), ['cvpn-connection-0004'])
+
+    def test_requires_ingest_token(self):
+        self.assertEqual(self.post(self.event(1), token='wrong').status_code, 401)
+        response = self.client.post('/api/auth/log-vpn-connection/', self.event(1), content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        with override_settings(CONNECTION_INGEST_TOKEN=''):
+            self.assertEqual(self.post(self.event(1)).status_code, 503)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.post(self.event(1)).status_code, 202)
+        self.assertEqual(VPNAccessLog.objects.count(), 1)
+
+    def test_lambda_event_keys_and_unknown_user(self):
+        self.post({'username': 'nobody', 'vpn-ip': '172.16.0.5', 'connection-id': 'cvpn-connection-x'})
+        response = self.post({'username': 'alice', 'vpn-ip': '172.16.0.5', 'connection-id': 'cvpn-connection-y'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(list(VPNAccessLog.objects.values_list('connection_id', flat=True)), ['cvpn-connection-y'])
+
+
+class CreateVPNUsersTests(AuthTestCase):
+    def write_csv(self, usernames):
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        with file:
+            file.write('username\n' + '\n'.join(usernames) + '\n')
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_chunk_queries_do_not_depend_on_chunk_size(self):
+        group = Group.objects.create(name='vpn')
+        User.objects.create(username='existing')
+        # 기존 사용자 1 + 생성 1 + 새 ID 1 + 소속 확인 1 + 소속 추가 1 + 캐시 버전 1 + 세이브포인트 2
+        with self.assertQueryBudget(8):
+            created, added = import_users_chunk(['existing'] + [f'user{index}' for index in range(80)], group)
+        self.assertEqual((created, added), (80, 81))
+        self.assertFalse(User.objects.get(username='user1').has_usable_password())
+
+    def test_csv_import_is_chunked_and_rerun_is_cheap(self):
+        path = self.write_csv([f'user{index}' for index in range(250)] + ['user1'])
+        out = StringIO()
+        call_command('create_vpn_users', group='vpn', csv_file=path, chunk_size=100, stdout=out)
+        self.assertIn('생성된 사용자: 250명, 그룹 추가: 250명', out.getvalue())
+        self.assertEqual(Group.objects.get(name='vpn').user_set.count(), 250)
+
+        out = StringIO()
+        # 변경이 없으면 묶음마다 조회 2회 + 세이브포인트 2만 실행
+        with self.assertQueryBudget(1 + 3 * 4):
+            call_command('create_vpn_users', group='vpn', csv_file=path, chunk_size=100, stdout=out)
+        self.assertIn('생성된 사용자: 0명, 그룹 추가: 0명', out.getvalue())
+
+    def test_new_membership_invalidates_decisions(self):
+        user, _ = self.create_vpn_user('alice')
+        group = Group.objects.create(name='night')
+        VPNGroupPolicy.objects.create(group=group, enable_time_restriction=True, allowed_weekdays='')
+        check = lambda: self.client.get('/api/auth/check-status/', {'username': 'alice', 'source': 'lambda_vpn_check'})
+        self.assertTrue(check().json()['is_enabled'])
+        import_users_chunk(['alice'], group)
+        self.assertEqual(check().json()['error_code'], 'TIME_RESTRICTION')
+
+
+class ReconcileDirectoryTests(AuthTestCase):
+    def write_file(self, suffix, content):
+        file = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def reconcile(self, path, **options):
+        out = StringIO()
+        call_command('reconcile_directory', path, stdout=out, **options)
+        return out.getvalue()
+
+    def groups_of(self, username):
+        return set(User.objects.get(username=username).groups.values_list('name', flat=True))
+
+    def test_csv_reconcile_applies_minimal_diff(self):
+        staff = Group.objects.create(name='staff')
+        alice, _ = self.create_vpn_user('alice')
+        alice.groups.add(staff)
+        gone, _ = self.create_vpn_user('gone')
+        gone.groups.add(Group.objects.create(name='dev'))
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+        path = self.write_file('.csv', 'username,groups,enabled\nalice,dev;ops,true\nbob,dev,true\ncarol,ops,false\n')
+        output = self.reconcile(path)
+        self.assertIn('사용자 생성 2', output)
+
+        self.assertEqual(self.groups_of('alice'), {'dev', 'ops', 'staff'})
+        self.assertEqual(self.groups_of('bob'), {'dev'})
+        self.assertEqual(self.groups_of('gone'), set())
+        self.assertFalse(User.objects.get(username='gone').is_active)
+        self.assertFalse(User.objects.get(username='carol').is_active)
+        admin.refresh_from_db()
+        self.assertTrue(admin.is_active)
+
+        # 두 번째 실행은 조회만 수행
+        with self.assertQueryBudget(3):
+            self.assertIn('변경 사항 없음', self.reconcile(path))
+
+    def test_mass_deactivation_is_refused_without_override(self):
+        for index in range(20):
+            self.create_vpn_user(f'user{index}')
+        truncated = self.write_file('.csv', 'username,groups,enabled\nuser0,dev,true\n')
+        empty = self.write_file('.csv', 'username,groups,enabled\n')
+
+        with self.assertRaisesMessage(CommandError, '스냅샷에 사용자가 없습니다'):
+            self.reconcile(empty)
+        with self.assertRaisesMessage(CommandError, '비활성화 대상 19명이 한도 2명'):
+            self.reconcile(truncated)
+        self.assertIn('비활성화 대상 19명', self.reconcile(truncated, dry_run=True))
+        with self.assertRaisesMessage(CommandError, '--max-deactivate 값이 올바르지 않습니다'):
+            self.reconcile(truncated, max_deactivate='many')
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+
+        self.reconcile(truncated, max_deactivate='19')
+        self.assertEqual(User.objects.filter(is_active=False).count(), 19)
+        self.reconcile(empty, force=True)
+        self.assertEqual(User.objects.filter(is_active=True).count(), 0)
+
+    def test_ldif_member_of_and_group_members(self):
+        content = (
+            "dn: CN=Alice,OU=Users,DC=corp,DC=example\n"
+            "sAMAccountName: alice\n"
+            "memberOf: CN=VPN-Dev,OU=Groups,DC=corp,DC=example\n"
+            "userAccountControl: 512\n"
+            "\n"
+            "dn: CN=Bob,OU=Users,DC=corp,DC=example\n"
+            "sAMAccountName: bob\n"
+            "userAccountControl: 514\n"
+            "\n"
+            "# 그룹 항목\n"
+            "dn: CN=VPN-Ops,OU=Groups,DC=corp,DC=example\n"
+            "cn: VPN-Ops\n"
+            "member: CN=Alice,OU=Users,\n"
+            " DC=corp,DC=example\n"
+            "member: CN=Bob,OU=Users,DC=corp,DC=example\n"
+        )
+        self.reconcile(self.write_file('.ldif', content))
+        self.assertEqual(self.groups_of('alice'), {'VPN-Dev', 'VPN-Ops'})
+        self.assertEqual(self.groups_of('bob'), {'VPN-Ops'})
+        self.assertFalse(User.objects.get(username='bob').is_active)
+
+    def test_ldif_ad_group_objects_are_not_users(self):
+        content = (
+            "dn: CN=Alice,OU=Users,DC=corp,DC=example\n"
+            "objectClass: top\n"
+            "objectClass: person\n"
+            "objectClass: organizationalPerson\n"
+            "objectClass: user\n"
+            "sAMAccountName: alice\n"
+            "userAccountControl: 512\n"
+            "\n"
+            "dn: CN=VPN-Ops,OU=Groups,DC=corp,DC=example\n"
+            "objectClass: top\n"
+            "objectClass: group\n"
+            "cn: VPN-Ops\n"
+            "sAMAccountName: VPN-Ops\n"
+            "member: CN=Alice,OU=Users,DC=corp,DC=example\n"
+            "\n"
+            "dn: CN=LAPTOP01,OU=Computers,DC=corp,DC=example\n"
+            "objectClass: top\n"
+            "objectClass: person\n"
+            "objectClass: organizationalPerson\n"
+            "objectClass: user\n"
+            "objectClass: computer\n"
+            "sAMAccountName: LAPTOP01$\n"
+        )
+        path = self.write_file('.ldif', content)
+        self.assertEqual(parse_directory_ldif(path), {'alice': {'groups': {'VPN-Ops'}, 'active': True}})
+        self.reconcile(path)
+        self.assertEqual(self.groups_of('alice'), {'VPN-Ops'})
+        self.assertFalse(User.objects.filter(username__in=['VPN-Ops', 'LAPTOP01$']).exists())
+
+    def test_ldif_binary_attributes_are_skipped(self):
+        binary = base64.b64encode(bytes(range(0xF0, 0x100))).decode()
+        content = (
+            "dn:: " + base64.b64encode('CN=김철수,OU=Users,DC=corp,DC=example'.encode()).decode() + "\n"
+            "objectGUID:: " + binary + "\n"
+            "objectSid:: AQUAAAAAAAUVAAAA/w==\n"
+            "sAMAccountName: chulsoo\n"
+            "memberOf:: " + base64.b64encode('CN=개발팀,OU=Groups,DC=corp,DC=example'.encode()).decode() + "\n"
+            "userAccountControl: 512\n"
+        )
+        self.reconcile(self.write_file('.ldif', content))
+        self.assertEqual(self.groups_of('chulsoo'), {'개발팀'})
+        self.assertTrue(User.objects.get(username='chulsoo').is_active)
+
+
+class StubSlackWebhook:
+    """테스트용 로컬 슬랙 웹훅 (수신한 메시지를 기록하고, 지정한 응답을 차례로 반환)"""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        # (status, headers) 목록, 비면 200 응답
+        self.responses = list(responses or [])
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.requests.append(json.loads(body))
+                status, headers = stub.responses.pop(0) if stub.responses else (200, {})
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/services/T000/B000/XXXX'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(SLACK_DEDUPE_WINDOW_SECONDS=3600)
+@override_settings(SLACK_WEBHOOK_URL='http://slack.invalid/webhook')
+class SlackOutboxTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        notifications._recent_enqueues.clear()
+
+    def check_status(self, username):
+        return self.client.get('/api/auth/check-status/', {'username': username, 'source': 'lambda_vpn_check'})
+
+    def test_check_status_enqueues_once_per_window(self):
+        self.create_vpn_user(enabled=False)
+        for _ in range(3):
+            decision_cache.clear()
+            notifications._recent_enqueues.clear()
+            self.check_status('alice')
+        self.assertEqual(SlackNotification.objects.filter(username='alice').count(), 1)
+
+    def test_duplicate_keeps_existing_notification_window(self):
+        user, _ = self.create_vpn_user(enabled=False)
+        self.assertTrue(notifications.enqueue_2fa_setup_slack(user))
+        SlackNotification.objects.update(created_at=timezone.now() - timedelta(minutes=50))
+        # 다른 워커 프로세스 (메모리 기록 없음) 가 같은 사용자를 다시 적재하려는 경우
+        notifications._recent_enqueues.clear()
+        self.assertFalse(notifications.enqueue_2fa_setup_slack(user))
+
+        key = ('alice', SlackNotification.KIND_2FA_SETUP)
+        self.assertTrue(notifications._recently_enqueued(key))
+        # 기존 알림 기준 창 (60분) 이 끝나면 메모리 기록도 만료
+        with mock.patch.object(notifications.time, 'monotonic', return_value=time.monotonic() + 11 * 60):
+            self.assertFalse(notifications._recently_enqueued(key))
+
+    def test_nothing_enqueued_without_webhook(self):
+        self.create_vpn_user(enabled=False)
+        with override_settings(SLACK_WEBHOOK_URL=''):
+            response = self.check_status('alice')
+            self.assertFalse(async_to_sync(notifications.aenqueue_2fa_setup_slack)(User.objects.get(username='alice')))
+        self.assertFalse(response.json()['is_enabled'])
+        self.assertFalse(SlackNotification.objects.exists())
+
+    def test_worker_delivers_through_pooled_session(self):
+        metrics.registry.reset()
+        self.create_vpn_user('alice', enabled=False)
+        self.create_vpn_user('bob', enabled=False)
+        self.check_status('alice')
+        self.check_status('bob')
+
+        with StubSlackWebhook() as webhook:
+            sender = notifications.SlackSender(webhook_url=webhook.url)
+            summary = notifications.deliver_pending(sender)
+            sender.close()
+
+        self.assertEqual(summary['sent'], 2)
+        self.assertEqual(len(webhook.requests), 2)
+        self.assertIn('alice', webhook.requests[0]['blocks'][1]['text']['text'])
+        self.assertFalse(SlackNotification.objects.exclude(status=SlackNotification.STATUS_SENT).exists())
+        self.assertEqual(metrics.slack_sends.value('sent'), 2)
+        self.assertEqual(metrics.slack_send_duration.count(), 2)
+
+    def test_worker_honours_retry_after(self):
+        self.create_vpn_user('alice', enabled=False)
+        self.create_vpn_user('bob', enabled=False)
+        self.check_status('alice')
+        self.check_status('bob')
+
+        with StubSlackWebhook(responses=[(429, {'Retry-After': '30'})]) as webhook:
+            sender = notifications.SlackSender(webhook_url=webhook.url)
+            summary = notifications.deliver_pending(sender)
+            # Retry-After 동안에는 다시 발송하지 않음
+            again = notifications.deliver_pending(sender)
+            sender.close()
+
+        self.assertTrue(summary['rate_limited'])
+        self.assertEqual(summary['retry_after'], 30)
+        self.assertEqual(again['sent'], 0)
+        self.assertEqual(len(webhook.requests), 1)
+        pending = SlackNotification.objects.filter(status=SlackNotification.STATUS_PENDING)
+        self.assertEqual(pending.count(), 2)
+        self.assertTrue(all(n.attempts == 0 and n.next_attempt_at > timezone.now() for n in pending))
+
+    def test_worker_gives_up_after_max_attempts(self):
+        self.create_vpn_user(enabled=False)
+        self.check_status('alice')
+
+        with StubSlackWebhook(responses=[(500, {})] * 2) as webhook:
+            sender = notifications.SlackSender(webhook_url=webhook.url)
+            notifications.deliver_pending(sender, max_attempts=2)
+            SlackNotification.objects.update(next_attempt_at=timezone.now())
+            summary = notifications.deliver_pending(sender, max_attempts=2)
+            sender.close()
+
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(SlackNotification.objects.get().status, SlackNotification.STATUS_FAILED)
+
+
+@override_settings(ACCESS_LOG_SYNC=False)
+class AccessLogWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+
+    def wait_for_rows(self, count, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if VPNAccessLog.objects.count() >= count:
+                return True
+            time.sleep(0.02)
+        return False
+
+    def log_event(self, writer):
+        writer.log(user=self.user, username='alice', client_ip='10.0.0.1', access_granted=True)
+
+    def test_flushes_when_batch_is_full(self):
+        writer = AccessLogWriter(batch_size=5, flush_interval=60)
+        for _ in range(5):
+            self.log_event(writer)
+        self.assertTrue(self.wait_for_rows(5))
+        writer.close()
+
+    def test_flushes_after_interval(self):
+        writer = AccessLogWriter(batch_size=100, flush_interval=0.1)
+        self.log_event(writer)
+        self.assertTrue(self.wait_for_rows(1))
+        writer.close()
+
+    def test_close_flushes_buffer_and_keeps_event_time(self):
+        writer = AccessLogWriter(batch_size=100, flush_interval=60)
+        logged_at = timezone.now()
+        self.log_event(writer)
+        time.sleep(0.05)
+        writer.close()
+        log = VPNAccessLog.objects.get()
+        self.assertLess(abs((log.access_time - logged_at).total_seconds()), 0.05)
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from functools import lru_cache
+
+TOTP_INTERVAL = 30
+TOTP_DIGITS = 6
+# 앞뒤 한 단계 (pyotp valid_window=1 과 같은 허용 범위)
+TOTP_VALID_WINDOW = 1
+SECRET_CACHE_MAX_ENTRIES = 4096
+_STEP = struct.Struct('>Q')
+_CODE = struct.Struct('>I')
+_MODULUS = 10 ** TOTP_DIGITS
+
+
+def decode_secret(secret):
+    """base32 비밀 키를 바이트로 변환"""
+    secret = secret.strip().replace(' ', '').upper()
+    return base64.b32decode(secret + '=' * (-len(secret) % 8))
+
+
+@lru_cache(maxsize=SECRET_CACHE_MAX_ENTRIES)
+def keyed_mac(secret):
+    """비밀 키로 초기화한 HMAC-SHA1 객체 (같은 비밀 키는 디코딩과 키 설정을 한 번만 수행)"""
+    return hmac.new(decode_secret(secret), digestmod=hashlib.sha1)
+
+
+def totp_code(mac, step):
+    """RFC 6238 TOTP 코드 (HMAC-SHA1, 6자리), mac 은 keyed_mac() 결과"""
+    mac = mac.copy()
+    mac.update(_STEP.pack(step))
+    digest = mac.digest()
+    offset = digest[-1] & 0x0F
+    code = (_CODE.unpack_from(digest, offset)[0] & 0x7FFFFFFF) % _MODULUS
+    return b'%06d' % code
+
+
+def current_step(now=None):
+    return int((time.time() if now is None else now) // TOTP_INTERVAL)
+
+
+def match_token(secret, token, now=None, window=TOTP_VALID_WINDOW):
+    """토큰이 일치하는 시간 단계 반환 (일치하지 않으면 None)
+
+    허용 범위의 단계만 계산하고, 어느 단계에서 일치했는지 응답 시간으로 드러나지 않도록
+    모든 단계를 constant-time 으로 비교한다.
+    """
+    if not secret or token is None:
+        return None
+    token = str(token).strip()
+    if len(token) != TOTP_DIGITS or not token.isdigit():
+        return None
+    try:
+        mac = keyed_mac(secret)
+    except (ValueError, TypeError):
+        return None
+
+    candidate = token.encode()
+    step = current_step(now)
+    matched = None
+    for offset in range(-window, window + 1):
+        if hmac.compare_digest(totp_code(mac, step + offset), candidate) and matched is None:
+            matched = step + offset
+    return matched
@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI 서버로 실행할 때 (ASYNC_VIEWS=True) Lambda 가 호출하는 경로는 비동기 뷰로 처리
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from . import async_views as lambda_views
+else:
+    lambda_views = views
+
 urlpatterns = [
     path('setup-2fa/', views.setup_2fa, name='setup_2fa'),
-    path('verify-2fa/', views.verify_2fa, name='verify_2fa'),
+    path('verify-2fa/', lambda_views.verify_2fa, name='verify_2fa'),
     path('enable-2fa/', views.enable_2fa, name='enable_2fa'),
-    path('check-status/', views.check_2fa_status, name='check_2fa_status'),
+    path('qr-code/', views.qr_code_image, name='qr_code_image'),
+    path('backup-codes/', views.generate_backup_codes, name='generate_backup_codes'),
+    path('check-status/', lambda_views.check_2fa_status, name='check_2fa_status'),
+    path('log-vpn-connection/', lambda_views.log_vpn_connection, name='log_vpn_connection'),
+    path('decision-cache-stats/', views.decision_cache_stats, name='decision_cache_stats'),
+    path('verify-rate-limit/', views.verify_rate_limit, name='verify_rate_limit'),
     path('access-logs/', views.access_logs, name='access_logs'),
+    path('access-logs/export/', views.export_access_logs, name='export_access_logs'),
     path('health/', views.health_check, name='health_check'),
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.contrib.auth.models import User
@@ -9,42 +9,141 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
-import requests
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from urllib.parse import urlencode
 from .models import UserTwoFactorAuth, VPNAccessLog
+from .access_log import (
+    EXPORT_CONTENT_TYPES, EXPORT_FORMATS, access_log_writer, filter_access_logs, paginate_access_logs,
+    stream_access_logs,
+)
+from .backup_codes import looks_like_backup_code
+from .decision_cache import decision_cache, get_cache_version
+from .decisions import get_access_decision
+from .ingest import connection_event_writer, normalize_connection_event
+from .metrics import PROMETHEUS_CONTENT_TYPE, metrics_access_error, record_decision, registry
+from .notifications import enqueue_2fa_setup_slack
+from .qr import QR_CONTENT_TYPES, QR_FORMATS, provisioning_uri, qr_cache
+from .rate_limit import client_address, qr_limiter, verify_limiter
+import hmac
 import json
 import os
+import pyotp
+import time
+
+ACCESS_LOGS_DEFAULT_LIMIT = 50
+ACCESS_LOGS_MAX_LIMIT = 500
+# QR 이미지 브라우저 캐시 시간 (초), 재검증은 ETag 로
+QR_IMAGE_MAX_AGE = 300
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @csrf_exempt
 def setup_2fa(request):
-    """2FA 설정 API"""
+    """2FA 설정 API
+    
+    qr_format: png (기본, base64), svg (마크업), none (이미지 생략, qr_code_url 로 따로 조회)
+    """
     try:
         # DRF에서는 request.data를 사용
         username = request.data.get('username')
+        qr_format = request.data.get('qr_format', 'png')
+        if qr_format not in QR_FORMATS + ('none',):
+            return Response({'success': False, 'error': f'qr_format 값은 {", ".join(QR_FORMATS)}, none 중 하나여야 합니다.'}, status=400)
         
-        user = User.objects.get(username=username)
-        two_factor_auth, created = UserTwoFactorAuth.objects.get_or_create(user=user)
+        user = User.objects.select_related('two_factor_auth').get(username=username)
+        try:
+            two_factor_auth = user.two_factor_auth
+        except UserTwoFactorAuth.DoesNotExist:
+            # get_or_create + 비밀 키 저장 (조회/INSERT/UPDATE) 대신 비밀 키를 채워 한 번에 생성
+            try:
+                with transaction.atomic():
+                    two_factor_auth = UserTwoFactorAuth.objects.create(user=user, secret_key=pyotp.random_base32())
+            except IntegrityError:
+                # 동시에 들어온 다른 요청이 먼저 생성함
+                two_factor_auth = UserTwoFactorAuth.objects.select_related('user').get(user=user)
         
         if not two_factor_auth.secret_key:
             two_factor_auth.generate_secret_key()
         
-        qr_code = two_factor_auth.get_qr_code()
-        
-        return Response({
+        response = {
             'success': True,
-            'qr_code': qr_code,
+            'qr_code_url': f"{reverse('qr_code_image')}?{urlencode({'username': username})}",
             'secret_key': two_factor_auth.secret_key,
             'is_enabled': two_factor_auth.is_enabled
-        })
+        }
+        if qr_format != 'none':
+            response['qr_code'] = two_factor_auth.get_qr_code(qr_format)
+            response['qr_format'] = qr_format
+        return Response(response)
         
     except User.DoesNotExist:
         return Response({'success': False, 'error': 'User not found'}, status=404)
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=500)
 
+def qr_code_image(request):
+    """2FA 등록 QR 이미지 (output=png|svg)
+    
+    ETag 는 QR 내용 해시이므로 비밀 키가 바뀌지 않는 한 If-None-Match 요청에 304 로 응답한다.
+    비밀 키가 담긴 이미지이므로 공유 캐시에는 저장되지 않도록 private 으로 표시하고,
+    등록이 끝난 (2FA 활성화) 사용자의 QR 은 내주지 않으며 클라이언트 IP 별 요청 수를 제한한다.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    
+    username = request.GET.get('username')
+    image_format = request.GET.get('output', 'png')
+    if image_format not in QR_FORMATS:
+        return JsonResponse({'success': False, 'error': f'output 값은 {", ".join(QR_FORMATS)} 중 하나여야 합니다.'}, status=400)
+    
+    retry_after = qr_limiter.throttle(client_address(request))
+    if retry_after:
+        response = JsonResponse({'success': False, 'error': '요청이 너무 많습니다. 잠시 후 다시 시도하세요.',
+                                 'retry_after': retry_after}, status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+    
+    row = UserTwoFactorAuth.objects.filter(user__username=username).values_list('secret_key', 'is_enabled').first()
+    if not row or not row[0]:
+        return JsonResponse({'success': False, 'error': 'User or 2FA not found'}, status=404)
+    secret_key, is_enabled = row
+    if is_enabled:
+        return JsonResponse({'success': False, 'error': '이미 2FA 등록이 완료된 사용자입니다.'}, status=403)
+    
+    data, etag = qr_cache.render(provisioning_uri(secret_key, username), image_format)
+    response = get_conditional_response(request, etag=etag) or HttpResponse(data, content_type=QR_CONTENT_TYPES[image_format])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=QR_IMAGE_MAX_AGE)
+    return response
+
+def _too_many_attempts(retry_after):
+    response = JsonResponse({
+        'success': False,
+        'access_granted': False,
+        'error': '인증 시도 횟수를 초과했습니다. 잠시 후 다시 시도하세요.',
+        'retry_after': retry_after
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+def _verify_result(is_valid, used_backup_code):
+    if is_valid:
+        return {
+            'success': True,
+            'access_granted': True,
+            'backup_code_used': used_backup_code,
+            'message': '백업 코드로 2FA 인증 성공' if used_backup_code else '2FA 인증 성공'
+        }
+    return {
+        'success': False,
+        'access_granted': False,
+        'message': '2FA 인증 실패'
+    }
+
 @csrf_exempt  
 def verify_2fa(request):
     """2FA 토큰 검증 API"""
@@ -56,19 +155,45 @@ def verify_2fa(request):
         username = data.get('username')
         token = data.get('token')
         client_ip = data.get('client_ip', request.META.get('REMOTE_ADDR'))
+        # IP 기준 시도 제한은 본문의 client_ip (접근 로그용) 가 아니라 실제 요청 주소로 셈
+        limit_ip = client_address(request)
         
-        user = User.objects.get(username=username)
-        two_factor_auth = UserTwoFactorAuth.objects.get(user=user)
+        # 잠긴 사용자/IP 는 DB 조회 전에 거부
+        rate_limited = getattr(settings, 'VERIFY_RATE_LIMIT_ENABLED', True)
+        if rate_limited:
+            retry_after = verify_limiter.check(username, limit_ip)
+            if retry_after:
+                return _too_many_attempts(retry_after)
+        
+        # 사용자와 2FA 레코드를 한 번의 쿼리로 조회
+        try:
+            two_factor_auth = UserTwoFactorAuth.objects.select_related('user').get(user__username=username)
+        except UserTwoFactorAuth.DoesNotExist:
+            if rate_limited:
+                verify_limiter.record_failure(username, limit_ip)
+            raise
+        user = two_factor_auth.user
         
         is_valid = two_factor_auth.verify_token(token)
         
+        # TOTP 가 아닌 백업 코드 형식이면 백업 코드로 검증 (숫자 6자리 코드는 추가 조회 없음)
+        used_backup_code = False
+        if not is_valid and two_factor_auth.is_enabled and looks_like_backup_code(token):
+            is_valid = used_backup_code = two_factor_auth.verify_backup_code(token)
+        
+        if rate_limited:
+            if is_valid:
+                verify_limiter.record_success(username, limit_ip)
+            else:
+                verify_limiter.record_failure(username, limit_ip)
+        
         # 첫 번째 인증 성공 시 2FA 활성화
         if is_valid and not two_factor_auth.is_enabled:
             two_factor_auth.is_enabled = True
             two_factor_auth.save()
         
-        # 접근 로그 기록
-        VPNAccessLog.objects.create(
+        # 접근 로그 기록 (버퍼에 추가 후 백그라운드에서 일괄 저장)
+        access_log_writer.log(
             user=user,
             username=username,
             client_ip=client_ip,
@@ -76,18 +201,7 @@ def verify_2fa(request):
             access_granted=is_valid
         )
         
-        if is_valid:
-            return JsonResponse({
-                'success': True,
-                'access_granted': True,
-                'message': '2FA 인증 성공'
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'access_granted': False,
-                'message': '2FA 인증 실패'
-            })
+        return JsonResponse(_verify_result(is_valid, used_backup_code))
             
     except (User.DoesNotExist, UserTwoFactorAuth.DoesNotExist):
         return JsonResponse({'success': False, 'error': 'User or 2FA not found'}, status=404)
@@ -103,10 +217,10 @@ def enable_2fa(request):
         username = data.get('username')
         token = data.get('token')
         
-        user = User.objects.get(username=username)
-        two_factor_auth = UserTwoFactorAuth.objects.get(user=user)
+        two_factor_auth = UserTwoFactorAuth.objects.select_related('user').get(user__username=username)
         
-        if two_factor_auth.verify_token(token):
+        # 설정 화면은 verify-2fa 직후 같은 코드로 활성화하므로 여기서는 코드를 소비하지 않음
+        if two_factor_auth.verify_token(token, consume=False):
             two_factor_auth.is_enabled = True
             two_factor_auth.save()
             
@@ -125,178 +239,305 @@ def enable_2fa(request):
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=500)
 
-def send_2fa_setup_slack(user):
-    """2FA 설정 필요 슬랙 메시지 발송"""
-    slack_webhook_url = getattr(settings, 'SLACK_WEBHOOK_URL', None)
-    if not slack_webhook_url:
-        print("SLACK_WEBHOOK_URL not configured")
-        return False
-    
-    alb_domain = os.getenv('ALB_DOMAIN', 'localhost')
-    setup_url = f'http://{alb_domain}?username={user.username}&action=setup_2fa'
-    
-    message = {
-        "text": f"🚨 VPN 2FA 설정 필요 알림",
-        "blocks": [
-            {
-                "type": "header",
-                "text": {
-                    "type": "plain_text",
-                    "text": "🔐 AWS VPN 2차 인증 설정 필요"
-                }
-            },
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f"*사용자:* `{user.username}`\n*상태:* VPN 연결 시도 감지, 2FA 미설정으로 접속 차단"
-                }
-            },
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f"VPN 접속을 위해 아래 링크에서 2FA를 설정해주세요:"
-                }
-            },
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text",
-                            "text": "2FA 설정하기"
-                        },
-                        "url": setup_url,
-                        "style": "primary"
-                    }
-                ]
-            },
-            {
-                "type": "context",
-                "elements": [
-                    {
-                        "type": "mrkdwn",
-                        "text": f"⏰ {timezone.now().strftime('%Y-%m-%d %H:%M:%S')} UTC"
-                    }
-                ]
-            }
-        ]
-    }
-    
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+def generate_backup_codes(request):
+    """2FA 백업 코드 발급 API (기존 코드는 폐기, 평문 코드는 이 응답에서만 확인 가능)
+
+    VPN 사용자는 로그인 세션이 없으므로 현재 TOTP 코드로 본인을 확인하며,
+    verify-2fa 와 같은 시도 제한을 공유해 코드 추측에 쓰이지 않게 한다.
+    """
     try:
-        response = requests.post(slack_webhook_url, json=message, timeout=10)
-        if response.status_code == 200:
-            print(f"Slack message sent for user: {user.username}")
-            return True
-        else:
-            print(f"Slack message failed: {response.status_code}, {response.text}")
-            return False
+        username = request.data.get('username')
+        token = request.data.get('token')
+        limit_ip = client_address(request)
+        
+        rate_limited = getattr(settings, 'VERIFY_RATE_LIMIT_ENABLED', True)
+        if rate_limited:
+            retry_after = verify_limiter.check(username, limit_ip)
+            if retry_after:
+                return _too_many_attempts(retry_after)
+        
+        try:
+            two_factor_auth = UserTwoFactorAuth.objects.select_related('user').get(user__username=username)
+        except UserTwoFactorAuth.DoesNotExist:
+            if rate_limited:
+                verify_limiter.record_failure(username, limit_ip)
+            raise
+        if not two_factor_auth.is_enabled:
+            return Response({
+                'success': False,
+                'message': '2FA를 먼저 활성화해야 합니다.'
+            }, status=400)
+        if not two_factor_auth.verify_token(token):
+            if rate_limited:
+                verify_limiter.record_failure(username, limit_ip)
+            return Response({
+                'success': False,
+                'message': '잘못된 토큰입니다.'
+            }, status=400)
+        if rate_limited:
+            verify_limiter.record_success(username, limit_ip)
+        
+        return Response({
+            'success': True,
+            'backup_codes': two_factor_auth.regenerate_backup_codes()
+        })
+        
+    except (User.DoesNotExist, UserTwoFactorAuth.DoesNotExist):
+        return Response({'success': False, 'error': 'User or 2FA not found'}, status=404)
     except Exception as e:
-        print(f"Slack send failed for {user.username}: {str(e)}")
-        return False
+        return Response({'success': False, 'error': str(e)}, status=500)
+
+def _cache_ttl_hint(seconds):
+    """Lambda 판정 캐시용 TTL 힌트 (초, 밀리초 단위 반올림)"""
+    if seconds is None:
+        return None
+    return round(max(seconds, 0), 3)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def check_2fa_status(request):
     """Lambda에서 호출하는 2FA 상태 확인 API"""
-    username = request.GET.get('username')
-    groups_param = request.GET.get('groups', '')
-    groups = [g.strip() for g in groups_param.split(',') if g.strip()] if groups_param else []
-    send_email = request.GET.get('send_email', 'true').lower() == 'true'  # 이메일 발송 여부
-    client_ip = request.GET.get('client_ip', request.META.get('REMOTE_ADDR', ''))
-    connection_id = request.GET.get('connection_id', '')
-    source = request.GET.get('source', 'unknown')
-    
-    if not username:
+    params = _status_params(request)
+    if not params['username']:
         return Response({'success': False, 'error': 'Username required'}, status=400)
     
     try:
-        user = User.objects.get(username=username)
+        decision = get_access_decision(params['username'])
+        record_decision(decision)
+        payload, log_fields, notify_user = _status_result(decision, params)
         
-        # 사용자 그룹별 시간 제한 체크
-        user_groups = user.groups.all()
-        for group in user_groups:
-            try:
-                policy = group.vpn_policy
-                if policy.enable_time_restriction:
-                    is_allowed, time_message = policy.is_access_allowed_now()
-                    if not is_allowed:
-                        print(f"Time restriction denied for {username}: {time_message}")
-                        return Response({
-                            'success': False,
-                            'username': username,
-                            'has_2fa': False,
-                            'is_enabled': False,
-                            'requires_setup': False,
-                            'error': f'시간 제한으로 접근 거부: {time_message}',
-                            'error_code': 'TIME_RESTRICTION'
-                        })
-                    else:
-                        print(f"Time check passed for {username}: {time_message}")
-            except Exception as e:
-                print(f"Error checking time restriction for group {group.name}: {e}")
-                continue
-        
-        two_factor_auth = UserTwoFactorAuth.objects.get(user=user)
-        
-        # Lambda에서 호출된 경우가 아닐 때만 VPN 접근 로그 기록
-        if source != 'lambda_vpn_check':
-            # VPN 접근 로그 기록
-            VPNAccessLog.objects.create(
-                user=user,
-                username=username,
-                client_ip=client_ip,
-                two_factor_verified=two_factor_auth.is_enabled,
-                access_granted=two_factor_auth.is_enabled
-            )
-            print(f"VPN access log recorded for {username} from {client_ip}")
-        
-        # 2FA가 비활성화된 경우 슬랙 메시지 발송
-        if send_email and not two_factor_auth.is_enabled:
-            slack_sent = send_2fa_setup_slack(user)
-            print(f"2FA setup Slack message sent to {username}: {slack_sent}")
+        if log_fields:
+            # VPN 접근 로그 기록 (버퍼에 추가 후 백그라운드에서 일괄 저장)
+            access_log_writer.log(**log_fields)
+            print(f"VPN access log recorded for {params['username']} from {params['client_ip']}")
         
-        return Response({
-            'success': True,
-            'username': username,
-            'has_2fa': True,
-            'is_enabled': two_factor_auth.is_enabled,
-            'requires_setup': not two_factor_auth.secret_key
-        })
+        if notify_user:
+            slack_queued = enqueue_2fa_setup_slack(notify_user)
+            print(f"2FA setup Slack message queued for {params['username']}: {slack_queued}")
         
-    except User.DoesNotExist:
+        return Response(payload)
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=500)
+
+def _status_params(request):
+    return {
+        'username': request.GET.get('username'),
+        'send_email': request.GET.get('send_email', 'true').lower() == 'true',  # 이메일 발송 여부
+        'client_ip': request.GET.get('client_ip', request.META.get('REMOTE_ADDR', '')),
+        'source': request.GET.get('source', 'unknown'),
+    }
+
+def _status_result(decision, params):
+    """판정으로 응답 본문과 후속 작업을 결정 (DB 조회 없음)
+    
+    반환값: (응답 본문, 기록할 접근 로그 필드 또는 None, 슬랙 알림 대상 사용자 또는 None)
+    """
+    username = params['username']
+    send_email = params['send_email']
+    
+    # cache_ttl: Lambda가 이 판정을 재사용해도 되는 최대 시간(초), None이면 Lambda 기본값 사용
+    cache_ttl = None
+    if decision['changes_at'] is not None:
+        cache_ttl = decision['changes_at'] - time.time()
+    
+    if decision['user_id'] is None:
         # 사용자가 없는 경우에도 이메일 발송 시도 (이메일이 있다면)
         if send_email:
             print(f"User {username} does not exist in Django, cannot send email")
         
-        return Response({
+        return {
             'success': True,
             'username': username,
             'has_2fa': False,
             'is_enabled': False,
             'requires_setup': True
-        })
-    except UserTwoFactorAuth.DoesNotExist:
-        try:
-            user = User.objects.get(username=username)
-            # 2FA 레코드가 없는 경우 슬랙 메시지 발송
-            if send_email:
-                slack_sent = send_2fa_setup_slack(user)
-                print(f"2FA setup Slack message sent to {username}: {slack_sent}")
-        except User.DoesNotExist:
-            pass
-        
-        return Response({
+        }, None, None
+    
+    if not decision['is_active']:
+        return {
+            'success': False,
+            'username': username,
+            'has_2fa': False,
+            'is_enabled': False,
+            'requires_setup': False,
+            'error': '비활성화된 사용자입니다.',
+            'error_code': 'USER_INACTIVE',
+            'cache_ttl': _cache_ttl_hint(cache_ttl)
+        }, None, None
+    
+    # 사용자 그룹별 시간 제한 체크
+    if decision['time_restriction_error']:
+        return {
+            'success': False,
+            'username': username,
+            'has_2fa': False,
+            'is_enabled': False,
+            'requires_setup': False,
+            'error': f"시간 제한으로 접근 거부: {decision['time_restriction_error']}",
+            'error_code': 'TIME_RESTRICTION',
+            'cache_ttl': _cache_ttl_hint(cache_ttl)
+        }, None, None
+    
+    # 슬랙 메시지에는 사용자명만 필요하므로 판정 정보로 사용자 객체 구성
+    user = User(pk=decision['user_id'], username=username)
+    
+    if not decision['has_2fa']:
+        # 2FA 레코드가 없는 경우 슬랙 메시지 발송 (알림을 받고 바로 등록 후 재시도할 수 있으므로 캐시하지 않음)
+        return {
             'success': True,
             'username': username,
             'has_2fa': False,
             'is_enabled': False,
-            'requires_setup': True
-        })
-    except Exception as e:
-        return Response({'success': False, 'error': str(e)}, status=500)
+            'requires_setup': True,
+            'cache_ttl': 0
+        }, None, user if send_email else None
+    
+    is_enabled = decision['is_enabled']
+    
+    # Lambda에서 호출된 경우가 아닐 때만 VPN 접근 로그 기록
+    log_fields = None
+    if params['source'] != 'lambda_vpn_check':
+        log_fields = {
+            'user_id': decision['user_id'],
+            'username': username,
+            'client_ip': params['client_ip'],
+            'two_factor_verified': is_enabled,
+            'access_granted': is_enabled
+        }
+    
+    # 2FA 미등록/설정 진행 중이면 곧 활성화될 수 있으므로 거부 판정을 캐시하지 않도록 함
+    if not is_enabled:
+        cache_ttl = 0
+    
+    return {
+        'success': True,
+        'username': username,
+        'has_2fa': True,
+        'is_enabled': is_enabled,
+        'requires_setup': not decision['has_secret'],
+        'cache_ttl': _cache_ttl_hint(cache_ttl)
+    }, log_fields, user if send_email and not is_enabled else None
+
+@api_view(['GET'])
+def export_access_logs(request):
+    """VPN 접근 로그 전체 내보내기 API (스트리밍)
+    
+    파라미터: output (ndjson | csv), gzip (true | false), access_logs와 같은 필터
+    """
+    output = request.GET.get('output', 'ndjson').lower()
+    if output not in EXPORT_FORMATS:
+        return Response({'success': False, 'error': 'output 값은 ndjson 또는 csv 이어야 합니다.'}, status=400)
+    compress = request.GET.get('gzip', 'false').lower() == 'true'
+    
+    try:
+        queryset = filter_access_logs(request.GET)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+    
+    filename = f"vpn_access_logs_{timezone.now().strftime('%Y%m%d%H%M%S')}.{output}"
+    if compress:
+        response = StreamingHttpResponse(stream_access_logs(queryset, output, compress=True),
+                                         content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(stream_access_logs(queryset, output),
+                                         content_type=EXPORT_CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # 프록시(nginx)가 응답을 모아서 보내지 않도록 버퍼링 비활성화
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([])
+@csrf_exempt
+def log_vpn_connection(request):
+    """VPN 연결 이벤트 수집 API (Connection Handler Lambda용)
+    
+    단일 이벤트 객체, 이벤트 배열, {"events": [...]} 형식을 모두 받는다.
+    검증만 하고 바로 202로 응답하며, 저장은 백그라운드 기록기가 모아서 처리한다.
+    (연결 폭주 시 Lambda가 한꺼번에 호출하므로 익명 요청 제한 대신 공유 비밀 토큰으로 인증)
+    """
+    rejected = _ingest_auth_error(request)
+    if rejected:
+        return Response(rejected[0], status=rejected[1])
+    events, body, status_code = _parse_connection_batch(request.data)
+    if events:
+        connection_event_writer.submit(events)
+    return Response(body, status=status_code)
+
+def _ingest_auth_error(request):
+    """연결 이벤트 수집 요청 인증 (CONNECTION_INGEST_TOKEN), 실패하면 (응답 본문, 응답 코드) 반환"""
+    token = getattr(settings, 'CONNECTION_INGEST_TOKEN', '')
+    if not token:
+        if settings.DEBUG:
+            return None
+        print("CONNECTION_INGEST_TOKEN not configured, rejecting VPN connection events")
+        return {'success': False, 'error': '연결 이벤트 수집 토큰이 설정되지 않았습니다.'}, 503
+    provided = request.META.get('HTTP_AUTHORIZATION', '')
+    if not hmac.compare_digest(provided.encode(), f'Bearer {token}'.encode()):
+        return {'success': False, 'error': 'Unauthorized'}, 401
+    return None
+
+def _parse_connection_batch(payload):
+    """연결 이벤트 요청 본문 검증, 반환값: (정규화된 이벤트 목록, 응답 본문, 응답 코드)"""
+    if isinstance(payload, dict) and 'events' in payload:
+        raw_events = payload['events']
+    elif isinstance(payload, list):
+        raw_events = payload
+    else:
+        raw_events = [payload]
+    
+    if not isinstance(raw_events, list):
+        return [], {'success': False, 'error': 'events 는 배열이어야 합니다.'}, 400
+    max_batch = getattr(settings, 'CONNECTION_INGEST_MAX_BATCH', 500)
+    if len(raw_events) > max_batch:
+        return [], {
+            'success': False,
+            'error': f'한 번에 최대 {max_batch}개 이벤트까지 보낼 수 있습니다.'
+        }, 413
+    
+    events = []
+    rejected = []
+    for index, raw in enumerate(raw_events):
+        try:
+            events.append(normalize_connection_event(raw))
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+    
+    return events, {
+        'success': bool(events),
+        'accepted': len(events),
+        'rejected': rejected
+    }, 202 if events else 400
+
+@api_view(['GET'])
+def decision_cache_stats(request):
+    """접근 판정 캐시 적중/미스 통계 API"""
+    return Response({
+        'success': True,
+        'stats': decision_cache.stats(),
+        'version': get_cache_version()
+    })
+
+@api_view(['GET', 'DELETE'])
+def verify_rate_limit(request):
+    """verify-2fa 시도 제한 상태 조회 (GET) 및 잠금 해제 (DELETE), username/client_ip 로 대상 지정"""
+    username = request.query_params.get('username')
+    client_ip = request.query_params.get('client_ip')
+    if request.method == 'DELETE':
+        if not username and not client_ip:
+            return Response({'success': False, 'error': 'username 또는 client_ip 가 필요합니다.'}, status=400)
+        verify_limiter.reset(username, client_ip)
+    return Response({
+        'success': True,
+        'stats': verify_limiter.stats(),
+        'state': verify_limiter.state(username, client_ip)
+    })
 
 @ensure_csrf_cookie
 def setup_2fa_web(request):
@@ -438,12 +679,12 @@ def setup_2fa_web(request):
                         'Content-Type': 'application/json',
                         'X-CSRFToken': csrftoken
                     }},
-                    body: JSON.stringify({{ username: '{username}' }})
+                    body: JSON.stringify({{ username: '{username}', qr_format: 'none' }})
                 }})
                 .then(response => response.json())
                 .then(data => {{
                     if (data.success) {{
-                        document.getElementById('qrcode').innerHTML = '<img src="data:image/png;base64,' + data.qr_code + '" alt="QR Code">';
+                        document.getElementById('qrcode').innerHTML = '<img src="' + data.qr_code_url + '&output=svg" alt="QR Code" width="300" height="300">';
                         document.getElementById('qr-step').style.display = 'block';
                         document.getElementById('verify-step').style.display = 'block';
                     }} else {{
@@ -493,6 +734,16 @@ def setup_2fa_web(request):
     
     return HttpResponse(html_content)
 
+def metrics(request):
+    """Prometheus 메트릭 (텍스트 형식, 워커 프로세스별 값)
+
+    Authorization: Bearer <METRICS_TOKEN> 헤더가 필요하며, DEBUG 가 아니면 토큰을 설정해야 노출된다.
+    """
+    error = metrics_access_error(request.META.get('HTTP_AUTHORIZATION'))
+    if error:
+        return HttpResponse(status=error)
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
@@ -506,23 +757,37 @@ def health_check(request):
 
 @api_view(['GET'])
 def access_logs(request):
-    """VPN 접근 로그 조회 API"""
+    """VPN 접근 로그 조회 API
+    
+    파라미터: username, client_ip, start, end, granted (필터), cursor, limit (키셋 페이지네이션)
+    """
     try:
-        logs = VPNAccessLog.objects.all()[:50]  # 최근 50개
+        try:
+            limit = min(max(int(request.GET.get('limit', ACCESS_LOGS_DEFAULT_LIMIT)), 1), ACCESS_LOGS_MAX_LIMIT)
+        except ValueError:
+            return Response({'success': False, 'error': 'limit 값은 정수여야 합니다.'}, status=400)
+        
+        try:
+            queryset = filter_access_logs(request.GET)
+            logs, next_cursor = paginate_access_logs(queryset, request.GET.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=400)
+        
         log_data = [
             {
-                'username': log.username,
-                'client_ip': log.client_ip,
-                'access_time': log.access_time.isoformat(),
-                'two_factor_verified': log.two_factor_verified,
-                'access_granted': log.access_granted
+                'username': log['username'],
+                'client_ip': log['client_ip'],
+                'access_time': log['access_time'].isoformat(),
+                'two_factor_verified': log['two_factor_verified'],
+                'access_granted': log['access_granted']
             }
             for log in logs
         ]
         
         return Response({
             'success': True,
-            'logs': log_data
+            'logs': log_data,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -0,0 +1,305 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import UserTwoFactorAuth, VPNAccessLog
+
+# describe_client_vpn_connections 한 번에 받는 최대 연결 수 (AWS 상한)
+DESCRIBE_PAGE_SIZE = 1000
+# IN 조회 한 번에 넣는 값 개수 (DB 파라미터 개수 제한 대비)
+LOOKUP_CHUNK_SIZE = 500
+# 동시에 조회하는 엔드포인트 수 상한
+MAX_FETCH_WORKERS = 8
+
+
+def fetch_connections(ec2_client, endpoint_id, page_size=DESCRIBE_PAGE_SIZE):
+    """NextToken 을 따라 엔드포인트의 모든 연결 조회, (연결 목록, 페이지 수) 반환"""
+    connections = []
+    pages = 0
+    params = {'ClientVpnEndpointId': endpoint_id, 'MaxResults': page_size}
+    while True:
+        response = ec2_client.describe_client_vpn_connections(**params)
+        pages += 1
+        connections.extend(response.get('Connections', []))
+        next_token = response.get('NextToken')
+        if not next_token:
+            return connections, pages
+        params['NextToken'] = next_token
+
+
+def parse_endpoint_targets(values, default_region):
+    """'엔드포인트' 또는 '리전:엔드포인트' 목록 (쉼표 구분 허용)을 (리전, 엔드포인트) 목록으로 변환"""
+    targets = []
+    for value in values:
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            region, _, endpoint_id = item.rpartition(':')
+            target = (region or default_region, endpoint_id)
+            if target not in targets:
+                targets.append(target)
+    return targets
+
+
+def fetch_endpoint(client_factory, region, endpoint_id, page_size=DESCRIBE_PAGE_SIZE):
+    """엔드포인트 하나의 연결 조회 (오류는 결과에 담아 다른 엔드포인트에 영향을 주지 않음)"""
+    started = time.perf_counter()
+    result = {
+        'region': region,
+        'endpoint_id': endpoint_id,
+        'connections': [],
+        'pages': 0,
+        'elapsed_ms': 0.0,
+        'error': None,
+    }
+    try:
+        ec2_client = client_factory(region, endpoint_id)
+        result['connections'], result['pages'] = fetch_connections(ec2_client, endpoint_id, page_size)
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def fetch_all_endpoints(targets, client_factory, page_size=DESCRIBE_PAGE_SIZE, max_workers=MAX_FETCH_WORKERS):
+    """여러 엔드포인트를 스레드 풀에서 동시에 조회, targets 순서대로 결과 반환
+
+    전체 소요 시간은 엔드포인트별 시간의 합이 아니라 가장 느린 엔드포인트에 가깝다.
+    client_factory(region, endpoint_id) 는 엔드포인트마다 별도의 클라이언트를 반환해야 하며,
+    작업 스레드에서 동시에 호출되므로 스레드 안전해야 한다 (내부 캐시는 잠금으로 보호).
+    """
+    if len(targets) <= 1 or max_workers <= 1:
+        return [fetch_endpoint(client_factory, region, endpoint_id, page_size) for region, endpoint_id in targets]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix='vpn-sync') as executor:
+        futures = [
+            executor.submit(fetch_endpoint, client_factory, region, endpoint_id, page_size)
+            for region, endpoint_id in targets
+        ]
+        return [future.result() for future in futures]
+
+
+def parse_aws_time(value):
+    """AWS 연결 시각 문자열 ('YYYY-MM-DD HH:MM:SS', UTC) 해석, 실패하면 None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_active(conn):
+    return (
+        conn.get('Status', {}).get('Code') == 'active'
+        and conn.get('Username') and conn.get('ClientIp') and conn.get('ConnectionId')
+    )
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def plan_connection_logs(connections):
+    """활성 연결 중 아직 기록되지 않은 연결의 접근 로그 목록 생성
+
+    사용자/2FA 와 기존 connection_id 를 연결 수와 무관하게 몇 번의 IN 조회로 확인한다.
+    반환값: (저장할 VPNAccessLog 목록, 건너뛴 사유별 건수)
+    """
+    skipped = {'inactive': 0, 'invalid': 0, 'duplicate': 0, 'unknown_user': 0, 'no_2fa': 0}
+
+    candidates = {}
+    for conn in connections:
+        if conn.get('Status', {}).get('Code') != 'active':
+            skipped['inactive'] += 1
+            continue
+        if not conn.get('Username') or not conn.get('ClientIp') or not conn.get('ConnectionId'):
+            skipped['invalid'] += 1
+            continue
+        if conn['ConnectionId'] in candidates:
+            skipped['duplicate'] += 1
+            continue
+        candidates[conn['ConnectionId']] = conn
+
+    users = {}
+    usernames = {conn['Username'] for conn in candidates.values()}
+    for chunk in _chunks(usernames):
+        queryset = (
+            User.objects.filter(username__in=chunk)
+            .select_related('two_factor_auth')
+            .only('id', 'username', 'two_factor_auth__id', 'two_factor_auth__is_enabled')
+        )
+        for user in queryset:
+            users[user.username] = user
+
+    existing = set()
+    for chunk in _chunks(candidates):
+        existing.update(VPNAccessLog.objects.filter(connection_id__in=chunk).values_list('connection_id', flat=True))
+
+    entries = []
+    for connection_id, conn in candidates.items():
+        if connection_id in existing:
+            skipped['duplicate'] += 1
+            continue
+        user = users.get(conn['Username'])
+        if user is None:
+            skipped['unknown_user'] += 1
+            continue
+        try:
+            two_factor_auth = user.two_factor_auth
+        except UserTwoFactorAuth.DoesNotExist:
+            skipped['no_2fa'] += 1
+            continue
+        entries.append(VPNAccessLog(
+            user=user,
+            username=user.username,
+            # DescribeClientVpnConnections 의 ClientIp 는 VPN 할당 (터널) IP 이며 공인 IP 는 제공되지 않음.
+            # client_ip 는 필수 필드라 같은 값을 넣으므로, 이 로그의 client_ip 로 접속 위치를 판단하면 안 됨
+            # (공인 IP 는 Connection Handler 이벤트의 public_ip 로만 기록됨)
+            client_ip=conn['ClientIp'],
+            vpn_ip=conn['ClientIp'],
+            connection_status='connected',
+            # 연결 수립 시각을 접근 시각으로 사용 (종료 시 연결 시간 계산 기준)
+            access_time=parse_aws_time(conn.get('ConnectionEstablishedTime')) or timezone.now(),
+            connection_id=connection_id,
+            endpoint_id=conn.get('ClientVpnEndpointId') or '',
+            two_factor_verified=two_factor_auth.is_enabled,
+            access_granted=True,  # 활성 연결이므로 접근 허용됨
+        ))
+    return entries, skipped
+
+
+class _InsertedRowCounter:
+    """INSERT 문이 실제로 추가한 행 수 합계 (connection.execute_wrapper 로 설치)
+
+    ignore_conflicts 로 건너뛴 행은 cursor.rowcount 에 포함되지 않는다
+    (SQLite INSERT OR IGNORE, PostgreSQL ON CONFLICT DO NOTHING, MySQL INSERT IGNORE).
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.lstrip()[:6].upper() == 'INSERT':
+            self.count += max(context['cursor'].rowcount, 0)
+        return result
+
+
+def insert_connection_logs(entries, batch_size=None):
+    """접근 로그 일괄 저장 (이미 있는 connection_id 는 무시), 실제로 추가된 행 수 반환"""
+    counter = _InsertedRowCounter()
+    with transaction.atomic(), connection.execute_wrapper(counter):
+        VPNAccessLog.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+    return counter.count
+
+
+def write_connection_logs(entries):
+    """접근 로그 일괄 저장 (동시에 실행된 동기화와 겹친 connection_id 는 무시), 추가된 행 수 반환"""
+    return insert_connection_logs(entries, getattr(settings, 'ACCESS_LOG_BATCH_SIZE', 200))
+
+
+def close_connection_logs(terminated):
+    """종료된 연결의 접근 로그에 종료 시각 기록
+
+    terminated: (연결, 종료 시각) 목록. 종료 시각이 같은 연결끼리 묶어 UPDATE 하므로
+    한 번의 폴링에서 종료된 연결 수와 무관하게 쿼리 수가 작다.
+    """
+    by_end_time = {}
+    for conn, ended_at in terminated:
+        by_end_time.setdefault(ended_at, []).append(conn['ConnectionId'])
+
+    closed = 0
+    with transaction.atomic():
+        for ended_at, connection_ids in by_end_time.items():
+            for chunk in _chunks(connection_ids):
+                closed += VPNAccessLog.objects.filter(
+                    connection_id__in=chunk, disconnected_at__isnull=True
+                ).update(disconnected_at=ended_at, connection_status='disconnected')
+    return closed
+
+
+def connection_duration(conn, ended_at):
+    """연결 시간 (초), 연결 수립 시각을 알 수 없으면 None"""
+    established = parse_aws_time(conn.get('ConnectionEstablishedTime'))
+    if established is None:
+        return None
+    return max((ended_at - established).total_seconds(), 0.0)
+
+
+def stale_connection_logs(endpoint_ids, active_ids, connections, before, now=None):
+    """DB에 열린 채로 남아 있지만 활성 목록에 없는 연결 (데몬이 멈춰 있던 동안 종료된 연결)
+
+    endpoint_ids 엔드포인트에서 조회해 기록한 로그만 대상으로 하여, 다른 데몬이 맡은 엔드포인트나
+    엔드포인트를 알 수 없는 로그 (연결 이벤트 수신분 등) 는 닫지 않는다.
+    before 이전에 기록된 로그만 대상으로 하여 조회 도중 새로 기록된 연결은 건드리지 않는다.
+    종료 시각은 조회 결과에 종료된 연결로 남아 있으면 그 ConnectionEndTime, 없으면 now 를 쓴다.
+    반환값: close_connection_logs 형식의 (연결, 종료 시각) 목록
+    """
+    now = now or timezone.now()
+    listed = {conn['ConnectionId']: conn for conn in connections if conn.get('ConnectionId')}
+    rows = (
+        VPNAccessLog.objects.filter(
+            disconnected_at__isnull=True, access_time__lt=before, endpoint_id__in=list(endpoint_ids),
+        )
+        .exclude(connection_id='')
+        .values_list('connection_id', 'endpoint_id', 'username', 'client_ip', 'access_time')
+    )
+    stale = []
+    for connection_id, endpoint_id, username, client_ip, access_time in rows.iterator():
+        if connection_id in active_ids:
+            continue
+        conn = {
+            'ClientVpnEndpointId': endpoint_id,
+            'ConnectionId': connection_id,
+            'Username': username,
+            'ClientIp': client_ip,
+            'ConnectionEstablishedTime': access_time.astimezone(dt_timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        ended_at = parse_aws_time(listed.get(connection_id, {}).get('ConnectionEndTime')) or now
+        stale.append((conn, ended_at))
+    return stale
+
+
+class ConnectionTracker:
+    """직전 폴링의 활성 연결을 메모리에 유지하고 변경분(신규/종료)만 계산
+
+    처음 폴링에서는 모든 활성 연결이 신규로 취급되며 (DB의 connection_id 로 중복 기록은 걸러짐),
+    이후에는 목록에서 사라지거나 terminated 로 바뀐 연결만 종료로 보고한다. diff 는 상태를
+    바꾸지 않으므로, 변경분을 DB에 기록한 뒤에 commit 해야 기록 실패 시 다음 폴링에서 다시 시도된다.
+    """
+
+    def __init__(self):
+        self.active = None
+
+    def diff(self, connections, now=None):
+        """반환값: (신규 연결 목록, (종료된 연결, 종료 시각) 목록, 현재 활성 연결 {connection_id: 연결})"""
+        now = now or timezone.now()
+        current = {}
+        ended = {}
+        for conn in connections:
+            if _is_active(conn):
+                current[conn['ConnectionId']] = conn
+            elif conn.get('ConnectionId'):
+                ended[conn['ConnectionId']] = conn
+
+        previous = self.active or {}
+        new = [conn for connection_id, conn in current.items() if connection_id not in previous]
+        terminated = []
+        for connection_id, conn in previous.items():
+            if connection_id in current:
+                continue
+            ended_conn = ended.get(connection_id, {})
+            ended_at = parse_aws_time(ended_conn.get('ConnectionEndTime')) or now
+            terminated.append((conn, ended_at))
+        return new, terminated, current
+
+    def commit(self, current):
+        """diff 로 얻은 활성 연결을 기준 상태로 반영 (변경분 기록이 끝난 뒤 호출)"""
+        self.active = current
@@ -95,6 +95,8 @@ CSRF_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_HTTPONLY = True
 
 MIDDLEWARE = [
+    # 요청 처리 시간/쿼리 수 메트릭 (다른 미들웨어 시간까지 포함하도록 맨 앞에 둠)
+    'authentication.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -181,8 +183,53 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ASGI 서버 (uvicorn 워커) 로 실행할 때 check-status / verify-2fa / log-vpn-connection 을 비동기 뷰로 처리
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Prometheus 메트릭 (/metrics), Authorization: Bearer <토큰> 필요 (DEBUG 가 아니면 토큰이 없을 때 노출하지 않음)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # 슬랙 웹훅 설정
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
+# 슬랙 알림은 아웃박스에 저장 후 send_slack_notifications 워커가 발송
+SLACK_DEDUPE_WINDOW_SECONDS = int(os.getenv('SLACK_DEDUPE_WINDOW_SECONDS', '3600'))  # 사용자별 중복 알림 방지 기간
+SLACK_MAX_ATTEMPTS = int(os.getenv('SLACK_MAX_ATTEMPTS', '5'))
+SLACK_SEND_TIMEOUT = float(os.getenv('SLACK_SEND_TIMEOUT', '5'))
+
+# 접근 판정 캐시 (프로세스 내 LRU, DB 버전 카운터로 워커/노드 간 무효화)
+DECISION_CACHE_MAX_ENTRIES = int(os.getenv('DECISION_CACHE_MAX_ENTRIES', '10000'))
+DECISION_CACHE_TTL = int(os.getenv('DECISION_CACHE_TTL', '60'))  # 초
+
+# verify-2fa 무차별 대입 방지 (사용자명/클라이언트 IP 별 실패 횟수 슬라이딩 윈도우)
+VERIFY_RATE_LIMIT_ENABLED = os.getenv('VERIFY_RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+VERIFY_RATE_LIMIT_USER_FAILURES = int(os.getenv('VERIFY_RATE_LIMIT_USER_FAILURES', '5'))
+VERIFY_RATE_LIMIT_IP_FAILURES = int(os.getenv('VERIFY_RATE_LIMIT_IP_FAILURES', '20'))
+VERIFY_RATE_LIMIT_WINDOW = int(os.getenv('VERIFY_RATE_LIMIT_WINDOW', '300'))  # 초
+VERIFY_RATE_LIMIT_LOCKOUT = int(os.getenv('VERIFY_RATE_LIMIT_LOCKOUT', '900'))  # 초
+VERIFY_RATE_LIMIT_MAX_KEYS = int(os.getenv('VERIFY_RATE_LIMIT_MAX_KEYS', '100000'))  # 프로세스 내 저장소 최대 키 수
+# 비워두면 프로세스 내 저장소, Django 캐시 별칭 (예: default) 을 지정하면 워커/노드 간 공유
+VERIFY_RATE_LIMIT_CACHE = os.getenv('VERIFY_RATE_LIMIT_CACHE', '')
+# 백엔드 앞의 신뢰하는 프록시 수 (ALB 뒤면 1), 시도 제한은 X-Forwarded-For 에서 이 순번의 주소를 사용
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+# qr-code 이미지 요청 수 제한 (클라이언트 IP 별, 저장소는 VERIFY_RATE_LIMIT_CACHE 와 같음)
+QR_RATE_LIMIT_REQUESTS = int(os.getenv('QR_RATE_LIMIT_REQUESTS', '30'))
+QR_RATE_LIMIT_WINDOW = int(os.getenv('QR_RATE_LIMIT_WINDOW', '300'))  # 초
+
+# VPN 접근 로그 버퍼 기록 (크기 또는 시간 기준으로 bulk_create)
+ACCESS_LOG_BATCH_SIZE = int(os.getenv('ACCESS_LOG_BATCH_SIZE', '200'))
+ACCESS_LOG_FLUSH_INTERVAL = float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', '1.0'))  # 초
+ACCESS_LOG_MAX_BUFFER = int(os.getenv('ACCESS_LOG_MAX_BUFFER', '10000'))
+ACCESS_LOG_SYNC = os.getenv('ACCESS_LOG_SYNC', 'False').lower() == 'true'  # 테스트용 즉시 저장 모드
+# 월 단위 버킷 조회 (기간 조회 시 해당 월 버킷만 읽음, 수년치 로그가 쌓인 경우 권장)
+ACCESS_LOG_PARTITIONING = os.getenv('ACCESS_LOG_PARTITIONING', 'False').lower() == 'true'
+CONNECTION_INGEST_MAX_BATCH = int(os.getenv('CONNECTION_INGEST_MAX_BATCH', '500'))  # log-vpn-connection 요청당 최대 이벤트 수
+# log-vpn-connection 공유 비밀 (Connection Handler Lambda 가 Authorization: Bearer <토큰> 으로 전송)
+# DEBUG 가 아니면 설정되지 않은 경우 연결 이벤트를 받지 않음
+CONNECTION_INGEST_TOKEN = os.getenv('CONNECTION_INGEST_TOKEN', '')
+# 연결 로그보다 먼저 도착한 종료 이벤트를 보류해 다시 처리하는 기간 (초)
+CONNECTION_DISCONNECT_HOLD_SECONDS = int(os.getenv('CONNECTION_DISCONNECT_HOLD_SECONDS', '3600'))
+ACCESS_LOG_EXPORT_CHUNK_SIZE = int(os.getenv('ACCESS_LOG_EXPORT_CHUNK_SIZE', '2000'))  # 내보내기 시 DB에서 한 번에 읽는 행 수
 
 # 이메일 설정 (백업용)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
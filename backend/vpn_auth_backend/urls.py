@@ -18,11 +18,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from authentication.views import setup_2fa_web
+from authentication.views import metrics, setup_2fa_web
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
+    path('metrics', metrics, name='metrics'),  # Prometheus 수집용
     path('', setup_2fa_web, name='setup_2fa_web'),  # 루트 경로에서 2FA 설정 페이지
 ]
 
@@ -34,6 +34,8 @@ const TwoFactorAuth: React.FC = () => {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
   const [success, setSuccess] = useState('')
+  const [backupToken, setBackupToken] = useState('')
+  const [backupCodes, setBackupCodes] = useState<string[]>([])
 
   const steps = ['사용자 입력', 'QR 코드 스캔', '인증 확인']
 
@@ -123,6 +125,35 @@ const TwoFactorAuth: React.FC = () => {
     }
   }
 
+  const handleGenerateBackupCodes = async () => {
+    if (!backupToken.trim()) {
+      setError('새 인증 코드를 입력해주세요.')
+      return
+    }
+
+    setLoading(true)
+    setError('')
+    
+    try {
+      const response = await axios.post(`${API_BASE_URL}/backup-codes/`, {
+        username,
+        token: backupToken.trim()
+      })
+
+      if (response.data.success) {
+        setBackupCodes(response.data.backup_codes)
+        setBackupToken('')
+        setSuccess('백업 코드가 발급되었습니다. 지금 안전한 곳에 보관하세요.')
+      } else {
+        setError(response.data.message || '백업 코드 발급에 실패했습니다.')
+      }
+    } catch (err: any) {
+      setError(err.response?.data?.message || err.response?.data?.error || '백업 코드 발급 중 오류가 발생했습니다.')
+    } finally {
+      setLoading(false)
+    }
+  }
+
   const resetForm = () => {
     setActiveStep(0)
     setUsername('')
@@ -132,6 +163,8 @@ const TwoFactorAuth: React.FC = () => {
     setIsEnabled(false)
     setError('')
     setSuccess('')
+    setBackupToken('')
+    setBackupCodes([])
   }
 
   return (
@@ -247,6 +280,42 @@ const TwoFactorAuth: React.FC = () => {
             <Typography variant="body1" sx={{ mb: 2 }}>
               이제 AWS Client VPN에 연결할 때 2차 인증을 사용할 수 있습니다.
             </Typography>
+
+            {backupCodes.length > 0 ? (
+              <Paper elevation={3} sx={{ p: 2, mb: 2 }}>
+                <Typography variant="subtitle1" gutterBottom>
+                  백업 코드 (각 코드는 한 번만 사용 가능, 이 화면을 벗어나면 다시 볼 수 없습니다)
+                </Typography>
+                {backupCodes.map((code) => (
+                  <Typography key={code} sx={{ fontFamily: 'monospace' }}>
+                    {code}
+                  </Typography>
+                ))}
+              </Paper>
+            ) : (
+              <Box sx={{ mb: 2 }}>
+                <Typography variant="body2" color="text.secondary">
+                  휴대폰을 잃어버렸을 때 사용할 백업 코드를 발급하려면 새로 표시된 인증 코드를 입력하세요.
+                </Typography>
+                <TextField
+                  fullWidth
+                  label="Google Authenticator 코드"
+                  value={backupToken}
+                  onChange={(e) => setBackupToken(e.target.value)}
+                  margin="normal"
+                  variant="outlined"
+                  placeholder="6자리 숫자 입력"
+                />
+                <Button
+                  variant="contained"
+                  onClick={handleGenerateBackupCodes}
+                  disabled={loading}
+                >
+                  {loading ? '발급 중...' : '백업 코드 발급'}
+                </Button>
+              </Box>
+            )}
+
             <Button variant="outlined" onClick={resetForm}>
               새로운 설정
             </Button>
@@ -1,58 +1,230 @@
 import json
 import urllib3
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional
 
 # Private EC2 백엔드 API 엔드포인트
 BACKEND_API_URL = os.environ.get('BACKEND_API_URL', 'http://YOUR-PRIVATE-IP:8000/api/auth')
+# 백엔드 CONNECTION_INGEST_TOKEN 과 같은 값 (log-vpn-connection 인증)
+CONNECTION_INGEST_TOKEN = os.environ.get('CONNECTION_INGEST_TOKEN', '')
+
+# 로그 전송 시간 예산 (연결 로그 때문에 클라이언트 연결이 지연되지 않도록 아주 짧게 유지)
+SEND_CONNECT_TIMEOUT = float(os.environ.get('CONNECTION_LOG_CONNECT_TIMEOUT', '0.1'))
+SEND_BUDGET_SECONDS = float(os.environ.get('CONNECTION_LOG_SEND_BUDGET', '0.3'))
+# Lambda 자체 종료 전에 응답을 돌려줄 수 있도록 남겨두는 여유 시간
+DEADLINE_SAFETY_MARGIN = 0.2
+
+# 전송에 실패한 이벤트를 warm 컨테이너의 /tmp 에 보관했다가 다음 호출에서 묶어서 재전송
+SPOOL_PATH = os.environ.get('CONNECTION_LOG_SPOOL_PATH', '/tmp/vpn-connection-spool.jsonl')
+SPOOL_MAX_EVENTS = int(os.environ.get('CONNECTION_LOG_SPOOL_MAX_EVENTS', '5000'))
+# 한 번의 요청에 함께 보내는 보관 이벤트 수 (백엔드 CONNECTION_INGEST_MAX_BATCH 이하)
+REPLAY_BATCH_SIZE = int(os.environ.get('CONNECTION_LOG_REPLAY_BATCH_SIZE', '200'))
+# 백엔드가 오류 응답 (5xx, 413, 401 등) 을 준 전송에 포함된 이벤트는 이 횟수만큼 실패하면 폐기
+# (보관 파일 앞쪽 이벤트가 계속 실패해서 뒤의 이벤트까지 막히지 않도록)
+REPLAY_MAX_ATTEMPTS = int(os.environ.get('CONNECTION_LOG_REPLAY_MAX_ATTEMPTS', '5'))
+# 보관 이벤트에 남기는 실패 횟수 키 (전송할 때는 제거)
+ATTEMPTS_KEY = 'spool_attempts'
+# 413 응답을 받으면 줄인 재전송 배치 크기 (warm 컨테이너 동안 유지)
+_replay_batch_size = None
+
+# CloudWatch 임베디드 메트릭 (EMF) 네임스페이스
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VPN2FA')
+
+# warm 컨테이너에서 재사용되는 모듈 레벨 커넥션 풀 (keep-alive)
+http = urllib3.PoolManager(
+    num_pools=1,
+    maxsize=1,
+    retries=False,
+    headers={'Connection': 'keep-alive'},
+)
+
+
+def _send_budget(context) -> float:
+    """이번 호출에서 전송에 쓸 수 있는 시간 (Lambda 남은 시간으로 제한)"""
+    budget = SEND_BUDGET_SECONDS
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        remaining = context.get_remaining_time_in_millis() / 1000.0 - DEADLINE_SAFETY_MARGIN
+        budget = min(budget, remaining)
+    return max(budget, 0.0)
+
+
+def _read_spool() -> List[Dict[str, Any]]:
+    try:
+        with open(SPOOL_PATH, 'r') as spool:
+            events = []
+            for line in spool:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # 기록 중 종료되어 잘린 줄은 버림
+                    continue
+            return events
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        print(f"Failed to read connection spool: {str(e)}")
+        return []
+
+
+def _write_spool(events: List[Dict[str, Any]]) -> None:
+    """보관 이벤트를 통째로 다시 기록 (임시 파일 후 rename 으로 원자적으로 교체)"""
+    if len(events) > SPOOL_MAX_EVENTS:
+        print(f"Connection spool full, dropping {len(events) - SPOOL_MAX_EVENTS} oldest events")
+        events = events[-SPOOL_MAX_EVENTS:]
+    try:
+        if not events:
+            if os.path.exists(SPOOL_PATH):
+                os.remove(SPOOL_PATH)
+            return
+        temp_path = f"{SPOOL_PATH}.tmp"
+        with open(temp_path, 'w') as spool:
+            for event in events:
+                spool.write(json.dumps(event) + '\n')
+        os.replace(temp_path, SPOOL_PATH)
+    except Exception as e:
+        print(f"Failed to write connection spool: {str(e)}")
+
+
+def _post_events(events: List[Dict[str, Any]], budget: float) -> Optional[int]:
+    """배치 형식 ({"events": [...]}) 으로 전송, HTTP 상태 코드 (전송 실패 시 None) 반환"""
+    if budget <= 0:
+        return None
+    headers = {'Content-Type': 'application/json'}
+    if CONNECTION_INGEST_TOKEN:
+        headers['Authorization'] = f"Bearer {CONNECTION_INGEST_TOKEN}"
+    try:
+        response = http.request(
+            'POST',
+            f"{BACKEND_API_URL}/log-vpn-connection/",
+            body=json.dumps({'events': events}),
+            headers=headers,
+            timeout=urllib3.Timeout(connect=min(SEND_CONNECT_TIMEOUT, budget), total=budget),
+        )
+        return response.status
+    except Exception as e:
+        print(f"Error logging VPN connection: {str(e)}")
+        return None
+
+
+def deliver(event_data: Optional[Dict[str, Any]], context=None) -> Dict[str, int]:
+    """현재 이벤트와 보관 중인 이벤트를 한 번의 요청으로 전송하고, 실패하면 보관
+
+    응답을 받지 못한 경우 (백엔드 장애, 시간 초과) 는 그대로 보관하고, 오류 응답을 받은
+    이벤트는 실패 횟수를 남겨 REPLAY_MAX_ATTEMPTS 번째에 폐기한다. 413 이면 이후 재전송
+    배치 크기를 절반으로 줄인다.
+    반환값: 전송/보관/폐기 건수 요약
+    """
+    global _replay_batch_size
+    spooled = _read_spool()
+    batch_size = _replay_batch_size or REPLAY_BATCH_SIZE
+    batch = spooled[:batch_size]
+    remaining = spooled[batch_size:]
+    if event_data is not None:
+        batch.append(event_data)
+
+    summary = {'sent': 0, 'spooled': 0, 'dropped': 0}
+    if not batch:
+        return summary
+
+    events = [{key: value for key, value in event.items() if key != ATTEMPTS_KEY} for event in batch]
+    status = _post_events(events, _send_budget(context))
+    if status is not None and status < 300:
+        summary['sent'] = len(batch)
+        if spooled:
+            _write_spool(remaining)
+    elif status == 400:
+        # 백엔드가 모든 이벤트를 거부함 (재전송해도 같은 결과이므로 폐기)
+        print(f"Backend rejected {len(batch)} connection events")
+        summary['dropped'] = len(batch)
+        if spooled:
+            _write_spool(remaining)
+    elif status is None:
+        print(f"Failed to log VPN connection, spooling {len(batch)} events")
+        summary['spooled'] = len(batch)
+        if event_data is not None:
+            _write_spool(spooled + [event_data])
+    else:
+        if status == 413:
+            _replay_batch_size = max(len(batch) // 2, 1)
+        retry = []
+        for event in batch:
+            attempts = event.get(ATTEMPTS_KEY, 0) + 1
+            if attempts < REPLAY_MAX_ATTEMPTS:
+                retry.append({**event, ATTEMPTS_KEY: attempts})
+        summary['spooled'] = len(retry)
+        summary['dropped'] = len(batch) - len(retry)
+        print(
+            f"Failed to log VPN connection: {status}, spooling {summary['spooled']} events, "
+            f"dropping {summary['dropped']} events after {REPLAY_MAX_ATTEMPTS} attempts"
+        )
+        _write_spool(retry + remaining)
+    return summary
+
+
+def _log_delivery(summary: Dict[str, int], elapsed_ms: float) -> None:
+    """전송 결과를 CloudWatch EMF 메트릭 로그로 출력 (sent/spooled/dropped 건수, 전송 시간)"""
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['function']],
+                'Metrics': [
+                    {'Name': 'sent', 'Unit': 'Count'},
+                    {'Name': 'spooled', 'Unit': 'Count'},
+                    {'Name': 'dropped', 'Unit': 'Count'},
+                    {'Name': 'delivery_ms', 'Unit': 'Milliseconds'},
+                ],
+            }],
+        },
+        'metric': 'connection_log_delivery',
+        'function': 'connection_handler',
+        **summary,
+        'delivery_ms': round(elapsed_ms, 2),
+    }))
+
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     AWS Client VPN Connection Handler
     VPN 연결 성공 후 실제 VPN IP와 함께 접근 로그 기록
     """
-    
+
     print(f"Connection event: {json.dumps(event)}")
-    
+
     # 연결 정보 추출
     username = event.get('username')
     vpn_ip = event.get('vpn-ip', '')  # 실제 VPN IP
     connection_id = event.get('connection-id', '')
     public_ip = event.get('public-ip', '')
-    
+
     print(f"VPN Connection: User={username}, VPN-IP={vpn_ip}, Public-IP={public_ip}")
-    
+
+    data = None
     if not username or not vpn_ip:
         print("Missing username or VPN IP")
-        return {'allow': True}
-    
-    try:
-        # Private EC2 백엔드 API로 VPN 접근 로그 기록
-        http = urllib3.PoolManager()
-        
-        log_url = f"{BACKEND_API_URL}/log-vpn-connection/"
+    else:
         data = {
             'username': username,
             'vpn_ip': vpn_ip,
             'public_ip': public_ip,
             'connection_id': connection_id,
-            'connection_status': 'connected'
+            'connection_status': 'connected',
+            # 보관 후 재전송되더라도 실제 연결 시각이 기록되도록 이벤트 시각을 함께 보냄
+            'event_time': time.time()
         }
-        
-        print(f"Logging VPN connection: {data}")
-        
-        response = http.request('POST', log_url, 
-                              body=json.dumps(data),
-                              headers={'Content-Type': 'application/json'},
-                              timeout=10)
-        
-        if response.status == 200:
-            print(f"VPN connection logged successfully for {username}")
-        else:
-            print(f"Failed to log VPN connection: {response.status}")
-            
+
+    try:
+        # 보관 중인 이벤트가 있으면 현재 이벤트와 함께 묶어서 전송
+        started = time.perf_counter()
+        summary = deliver(data, context)
+        _log_delivery(summary, (time.perf_counter() - started) * 1000)
     except Exception as e:
         print(f"Error logging VPN connection: {str(e)}")
-    
+
     # Connection Handler는 항상 allow=True 반환
-    return {'allow': True}
\ No newline at end of file
+    return {'allow': True}
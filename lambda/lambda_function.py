@@ -1,12 +1,233 @@
 import json
 import urllib3
 import os
-from typing import Dict, Any
+import time
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from typing import Dict, Any, Optional
 
 # Private EC2 백엔드 API 엔드포인트
 BACKEND_API_URL = os.environ.get('BACKEND_API_URL', 'http://YOUR-PRIVATE-IP:8000/api/auth')
 WEB_REDIRECT_URL = os.environ.get('WEB_REDIRECT_URL', 'http://your-alb-domain.elb.amazonaws.com')
 
+# 백엔드 호출 지연 예산 (Client VPN 핸들러의 제한 시간 안에 모든 재시도가 끝나야 함)
+CONNECT_TIMEOUT = float(os.environ.get('BACKEND_CONNECT_TIMEOUT', '1.0'))
+READ_TIMEOUT = float(os.environ.get('BACKEND_READ_TIMEOUT', '3.0'))
+MAX_RETRIES = int(os.environ.get('BACKEND_MAX_RETRIES', '2'))
+RETRY_BACKOFF = float(os.environ.get('BACKEND_RETRY_BACKOFF', '0.1'))
+DEADLINE_SECONDS = float(os.environ.get('BACKEND_DEADLINE_SECONDS', '8.0'))
+# Lambda 자체 종료 전에 응답을 돌려줄 수 있도록 남겨두는 여유 시간
+DEADLINE_SAFETY_MARGIN = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+# warm 컨테이너 판정 캐시 (사용자명 기준)
+CACHE_ALLOW_TTL = float(os.environ.get('DECISION_CACHE_ALLOW_TTL', '300'))
+CACHE_DENY_TTL = float(os.environ.get('DECISION_CACHE_DENY_TTL', '15'))
+# 시간 제한 거부는 허용 시간 시작 시각까지 캐시하되, 정책 변경 반영을 위해 상한을 둠
+CACHE_TIME_RESTRICTION_MAX_TTL = float(os.environ.get('DECISION_CACHE_TIME_RESTRICTION_MAX_TTL', '3600'))
+CACHE_MAX_ENTRIES = int(os.environ.get('DECISION_CACHE_MAX_ENTRIES', '5000'))
+# 캐시하지 않는 거부 사유 (일시적인 서버 오류)
+UNCACHEABLE_STATUSES = ('api-response-error',)
+
+# CloudWatch 임베디드 메트릭 (EMF) 네임스페이스 (로그 줄이 그대로 CloudWatch 메트릭으로 집계됨)
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VPN2FA')
+
+# 호출별 소요 시간 (warm 컨테이너에서는 한 번에 하나의 호출만 처리됨)
+_timings: Dict[str, float] = {}
+
+# username -> (만료 시각(monotonic), Client VPN 응답)
+_decision_cache: Dict[str, Any] = {}
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """TCP 연결 수립 시간을 기록하는 커넥션 (keep-alive 재사용 시 0)"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timings['connect_ms'] = _timings.get('connect_ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timings['connect_ms'] = _timings.get('connect_ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+# warm 컨테이너에서 재사용되는 모듈 레벨 커넥션 풀 (keep-alive)
+# 재시도는 아래 _request_with_deadline 에서 전체 마감 시간을 공유하며 직접 수행
+http = urllib3.PoolManager(
+    num_pools=2,
+    maxsize=2,
+    retries=False,
+    headers={'Connection': 'keep-alive'},
+)
+http.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+
+def _remaining_seconds(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+
+def _compute_deadline(context) -> float:
+    """설정된 예산과 Lambda 남은 실행 시간 중 더 짧은 쪽을 마감 시간으로 사용"""
+    budget = DEADLINE_SECONDS
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        lambda_remaining = context.get_remaining_time_in_millis() / 1000 - DEADLINE_SAFETY_MARGIN
+        budget = min(budget, max(lambda_remaining, 0.0))
+    return time.monotonic() + budget
+
+
+def _request_with_deadline(method: str, url: str, fields: Dict[str, Any], deadline: float):
+    """마감 시간 안에서 제한된 횟수만큼 재시도하며 백엔드 호출"""
+    last_error: Optional[Exception] = None
+    response = None
+
+    for attempt in range(MAX_RETRIES + 1):
+        remaining = _remaining_seconds(deadline)
+        if remaining <= 0:
+            break
+
+        timeout = urllib3.Timeout(
+            connect=min(CONNECT_TIMEOUT, remaining),
+            read=min(READ_TIMEOUT, remaining),
+            total=remaining,
+        )
+        _timings['attempts'] = attempt + 1
+
+        try:
+            response = http.request(method, url, fields=fields, timeout=timeout)
+        except (urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError,
+                urllib3.exceptions.NewConnectionError) as e:
+            last_error = e
+            print(f"Backend request attempt {attempt + 1} failed: {str(e)}")
+        else:
+            if response.status not in RETRY_STATUSES:
+                return response
+            print(f"Backend request attempt {attempt + 1} returned {response.status}")
+
+        # 다음 시도까지 대기 (마감 시간을 넘기지 않는 범위에서만)
+        backoff = RETRY_BACKOFF * (2 ** attempt)
+        if attempt < MAX_RETRIES and _remaining_seconds(deadline) > backoff:
+            time.sleep(backoff)
+
+    if response is not None:
+        return response
+    if isinstance(last_error, urllib3.exceptions.TimeoutError) or last_error is None:
+        raise urllib3.exceptions.TimeoutError(f"Backend deadline exceeded: {last_error}")
+    raise last_error
+
+
+def _cache_get(username: str) -> Optional[Dict[str, Any]]:
+    """만료되지 않은 캐시 판정 반환"""
+    entry = _decision_cache.get(username)
+    if entry is None:
+        return None
+    expires_at, result = entry
+    if time.monotonic() >= expires_at:
+        del _decision_cache[username]
+        return None
+    return dict(result)
+
+
+def _cache_put(username: str, result: Dict[str, Any], ttl_hint: Optional[float]) -> None:
+    """판정 결과를 허용/거부별 TTL로 캐시 (백엔드 cache_ttl 힌트가 있으면 우선 적용)
+
+    - 허용: min(CACHE_ALLOW_TTL, 힌트) - 시간 제한 그룹은 허용 시간 종료 시각까지만
+    - 시간 제한 거부: 힌트(허용 시간 시작 시각)까지, CACHE_TIME_RESTRICTION_MAX_TTL 상한
+    - 그 외 거부: min(CACHE_DENY_TTL, 힌트) - 2FA 설정 진행 중이면 힌트가 0이라 캐시하지 않음
+    """
+    statuses = result.get('posture-compliance-statuses', [])
+    if any(status in UNCACHEABLE_STATUSES for status in statuses):
+        return
+
+    if result.get('allow'):
+        ttl = CACHE_ALLOW_TTL
+    elif 'time-restriction' in statuses and ttl_hint is not None:
+        ttl = CACHE_TIME_RESTRICTION_MAX_TTL
+    else:
+        ttl = CACHE_DENY_TTL
+    if ttl_hint is not None:
+        ttl = min(ttl, float(ttl_hint))
+    if ttl <= 0:
+        _decision_cache.pop(username, None)
+        return
+
+    if len(_decision_cache) >= CACHE_MAX_ENTRIES and username not in _decision_cache:
+        # 만료된 항목부터 정리하고, 그래도 가득 차면 가장 오래 전에 저장된 항목 제거
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in _decision_cache.items() if expires_at <= now]:
+            del _decision_cache[key]
+        if len(_decision_cache) >= CACHE_MAX_ENTRIES:
+            del _decision_cache[next(iter(_decision_cache))]
+
+    _decision_cache[username] = (time.monotonic() + ttl, dict(result))
+
+
+def _decision_outcome(result: Optional[Dict[str, Any]]) -> str:
+    """판정 결과 분류 (백엔드 vpn_access_decisions_total 의 outcome 과 같은 이름, 그 밖의 거부는 error)
+
+    백엔드는 없는 사용자에게도 2FA 설정 필요 응답을 주므로 (사용자 존재 여부 비노출)
+    Lambda 에서는 unknown_user 가 2fa_missing 으로 집계된다.
+    """
+    if result is None:
+        return 'error'
+    if result.get('allow'):
+        return 'granted'
+    statuses = result.get('posture-compliance-statuses', [])
+    if 'time-restriction' in statuses:
+        return 'time_restricted'
+    if 'requires-2fa-setup' in statuses or '2fa-required' in statuses:
+        return '2fa_missing'
+    return 'error'
+
+
+def _log_timings(username: Optional[str], started: float, result: Optional[Dict[str, Any]] = None) -> None:
+    """호출별 지연 구간(connect/request/parse/total)과 판정 결과를 구조화된 메트릭 로그로 출력
+
+    CloudWatch EMF 형식이라 로그 줄에서 outcome 별 판정 수 (decisions) 와 지연 시간 메트릭이 만들어진다.
+    """
+    _timings['total_ms'] = (time.perf_counter() - started) * 1000
+    outcome = _decision_outcome(result)
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['function', 'outcome']],
+                'Metrics': [
+                    {'Name': 'decisions', 'Unit': 'Count'},
+                    {'Name': 'total_ms', 'Unit': 'Milliseconds'},
+                ],
+            }],
+        },
+        'metric': 'pre_auth_timing',
+        'function': 'pre_auth',
+        'outcome': outcome,
+        'status': ','.join((result or {}).get('posture-compliance-statuses', [])),
+        'decisions': 1,
+        'username': username,
+        'connect_ms': round(_timings.get('connect_ms', 0.0), 2),
+        'request_ms': round(_timings.get('request_ms', 0.0), 2),
+        'parse_ms': round(_timings.get('parse_ms', 0.0), 2),
+        'total_ms': round(_timings['total_ms'], 2),
+        'attempts': _timings.get('attempts', 0),
+        'cache_hit': bool(_timings.get('cache_hit', False)),
+    }))
+
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     AWS Client VPN Pre-Authentication Handler
@@ -23,9 +244,84 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     
     print(f"User: {username}, Groups: {groups}, Client-IP: {client_ip}")
     
-    return handle_pre_authentication(username, client_ip, connection_id, groups)
+    _timings.clear()
+    started = time.perf_counter()
+    result = None
+    try:
+        result = handle_pre_authentication(username, client_ip, connection_id, groups, context)
+        return result
+    finally:
+        _log_timings(username, started, result)
 
-def handle_pre_authentication(username: str, client_ip: str, connection_id: str, groups: list) -> Dict[str, Any]:
+def _decision_from_response(username: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """백엔드 check-status 응답을 Client VPN 응답 형식으로 변환"""
+    # 응답 데이터 확인
+    if not data.get('success'):
+        print(f"API response error: {data}")
+        
+        # 시간 제한 에러인 경우
+        if data.get('error_code') == 'TIME_RESTRICTION':
+            return {
+                'allow': False,
+                'posture-compliance-statuses': ['time-restriction'],
+                'schema-version': 'v3',
+                'error-msg-on-failed-posture-compliance': data.get('error', '시간 제한으로 접근이 거부되었습니다.')
+            }
+        
+        # 비활성화된 사용자인 경우
+        if data.get('error_code') == 'USER_INACTIVE':
+            return {
+                'allow': False,
+                'posture-compliance-statuses': ['user-inactive'],
+                'schema-version': 'v3',
+                'error-msg-on-failed-posture-compliance': '비활성화된 계정입니다. 관리자에게 문의하세요.'
+            }
+        
+        return {
+            'allow': False,
+            'posture-compliance-statuses': ['api-response-error'],
+            'schema-version': 'v3',
+            'error-msg-on-failed-posture-compliance': '인증 상태를 확인할 수 없습니다.'
+        }
+    
+    # 2FA가 설정되어 있고 활성화된 경우 VPN 접속 허용
+    if data.get('has_2fa') and data.get('is_enabled'):
+        print(f"2FA verified for user: {username} - ACCESS GRANTED")
+        result = {
+            'allow': True,
+            'error-msg-on-denied-connection': '',
+            'posture-compliance-statuses': [],
+            'schema-version': 'v3'
+        }
+        print(f"Returning result: {result}")
+        return result
+    
+    # 2FA가 설정되지 않았거나 비활성화된 경우
+    if data.get('requires_setup') or not data.get('is_enabled'):
+        # 웹 페이지로 리다이렉션하여 2FA 설정 요청
+        redirect_url = f"{WEB_REDIRECT_URL}?username={username}&action=setup_2fa"
+        
+        print(f"2FA setup required for user: {username} - ACCESS DENIED")
+        print(f"Redirect URL: {redirect_url}")
+        
+        return {
+            'allow': False,
+            'posture-compliance-statuses': ['requires-2fa-setup'],
+            'schema-version': 'v3',
+            'error-msg-on-failed-posture-compliance': f'【2차 인증 필요】 웹브라우저에서 {WEB_REDIRECT_URL} 접속 → 사용자명: {username} 입력 → 2FA 설정 완료 후 VPN 재연결하세요'
+        }
+    
+    # 기본적으로 접속 거부
+    print(f"Default deny for user: {username}")
+    return {
+        'allow': False,
+        'posture-compliance-statuses': ['2fa-required'],
+        'schema-version': 'v3',
+        'error-msg-on-failed-posture-compliance': f'【2차 인증 필요】 웹브라우저에서 {WEB_REDIRECT_URL} 접속하여 2FA 설정 후 VPN을 다시 연결하세요'
+    }
+
+def handle_pre_authentication(username: str, client_ip: str, connection_id: str, groups: list,
+                              context=None) -> Dict[str, Any]:
     """VPN 연결 전 2FA 상태 확인"""
     print(f"Pre-authentication for {username}")
     
@@ -40,10 +336,13 @@ def handle_pre_authentication(username: str, client_ip: str, connection_id: str,
     
     print(f"Processing pre-authentication for user: {username}, IP: {client_ip}")
     
+    cached = _cache_get(username)
+    if cached is not None:
+        _timings['cache_hit'] = True
+        print(f"Decision cache hit for user: {username} - allow={cached['allow']}")
+        return cached
+    
     try:
-        # Private EC2 백엔드 API로 2FA 상태 확인
-        http = urllib3.PoolManager()
-        
         # 2FA 상태 확인 API 호출
         check_url = f"{BACKEND_API_URL}/check-status/"
         params = {
@@ -55,7 +354,9 @@ def handle_pre_authentication(username: str, client_ip: str, connection_id: str,
         
         print(f"Calling API: {check_url} with params: {params}")
         
-        response = http.request('GET', check_url, fields=params, timeout=10)
+        request_started = time.perf_counter()
+        response = _request_with_deadline('GET', check_url, params, _compute_deadline(context))
+        _timings['request_ms'] = (time.perf_counter() - request_started) * 1000 - _timings.get('connect_ms', 0.0)
         
         if response.status != 200:
             print(f"Backend API error: {response.status}, Response: {response.data}")
@@ -66,64 +367,14 @@ def handle_pre_authentication(username: str, client_ip: str, connection_id: str,
                 'error-msg-on-failed-posture-compliance': f'인증 서버와 통신할 수 없습니다. (Status: {response.status})'
             }
         
+        parse_started = time.perf_counter()
         data = json.loads(response.data.decode('utf-8'))
+        _timings['parse_ms'] = (time.perf_counter() - parse_started) * 1000
         print(f"API Response: {data}")
         
-        # 응답 데이터 확인
-        if not data.get('success'):
-            print(f"API response error: {data}")
-            
-            # 시간 제한 에러인 경우
-            if data.get('error_code') == 'TIME_RESTRICTION':
-                return {
-                    'allow': False,
-                    'posture-compliance-statuses': ['time-restriction'],
-                    'schema-version': 'v3',
-                    'error-msg-on-failed-posture-compliance': data.get('error', '시간 제한으로 접근이 거부되었습니다.')
-                }
-            
-            return {
-                'allow': False,
-                'posture-compliance-statuses': ['api-response-error'],
-                'schema-version': 'v3',
-                'error-msg-on-failed-posture-compliance': '인증 상태를 확인할 수 없습니다.'
-            }
-        
-        # 2FA가 설정되어 있고 활성화된 경우 VPN 접속 허용
-        if data.get('has_2fa') and data.get('is_enabled'):
-            print(f"2FA verified for user: {username} - ACCESS GRANTED")
-            result = {
-                'allow': True,
-                'error-msg-on-denied-connection': '',
-                'posture-compliance-statuses': [],
-                'schema-version': 'v3'
-            }
-            print(f"Returning result: {result}")
-            return result
-        
-        # 2FA가 설정되지 않았거나 비활성화된 경우
-        if data.get('requires_setup') or not data.get('is_enabled'):
-            # 웹 페이지로 리다이렉션하여 2FA 설정 요청
-            redirect_url = f"{WEB_REDIRECT_URL}?username={username}&action=setup_2fa"
-            
-            print(f"2FA setup required for user: {username} - ACCESS DENIED")
-            print(f"Redirect URL: {redirect_url}")
-            
-            return {
-                'allow': False,
-                'posture-compliance-statuses': ['requires-2fa-setup'],
-                'schema-version': 'v3',
-                'error-msg-on-failed-posture-compliance': f'【2차 인증 필요】 웹브라우저에서 {WEB_REDIRECT_URL} 접속 → 사용자명: {username} 입력 → 2FA 설정 완료 후 VPN 재연결하세요'
-            }
-        
-        # 기본적으로 접속 거부
-        print(f"Default deny for user: {username}")
-        return {
-            'allow': False,
-            'posture-compliance-statuses': ['2fa-required'],
-            'schema-version': 'v3',
-            'error-msg-on-failed-posture-compliance': f'【2차 인증 필요】 웹브라우저에서 {WEB_REDIRECT_URL} 접속하여 2FA 설정 후 VPN을 다시 연결하세요'
-        }
+        result = _decision_from_response(username, data)
+        _cache_put(username, result, data.get('cache_ttl'))
+        return result
         
     except urllib3.exceptions.TimeoutError:
         print(f"Timeout connecting to backend API for user: {username}")
@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+
+import connection_handler
+
+
+class StubResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class StubPool:
+    """http.request 대역 (응답 코드 또는 예외를 순서대로 돌려주고 보낸 이벤트를 기록)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.batches = []
+        self.headers = []
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        self.batches.append(json.loads(body)['events'])
+        self.headers.append(headers)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return StubResponse(outcome)
+
+
+@pytest.fixture(autouse=True)
+def isolated_spool(monkeypatch, tmp_path):
+    monkeypatch.setattr(connection_handler, 'SPOOL_PATH', str(tmp_path / 'spool.jsonl'))
+    monkeypatch.setattr(connection_handler, 'SPOOL_MAX_EVENTS', 5000)
+    monkeypatch.setattr(connection_handler, 'REPLAY_BATCH_SIZE', 200)
+    monkeypatch.setattr(connection_handler, 'REPLAY_MAX_ATTEMPTS', 5)
+    monkeypatch.setattr(connection_handler, 'CONNECTION_INGEST_TOKEN', '')
+    monkeypatch.setattr(connection_handler, '_replay_batch_size', None)
+
+
+def use_pool(monkeypatch, *outcomes):
+    pool = StubPool(*outcomes)
+    monkeypatch.setattr(connection_handler, 'http', pool)
+    return pool
+
+
+def event(index):
+    return {'username': 'alice', 'vpn_ip': f'172.16.0.{index % 250}', 'connection_id': f'cvpn-connection-{index}'}
+
+
+def spooled_ids():
+    return [spooled['connection_id'] for spooled in connection_handler._read_spool()]
+
+
+class TestSpool:
+    def test_write_is_capped_to_newest_events(self):
+        connection_handler._write_spool([event(index) for index in range(5003)])
+        assert spooled_ids() == [f'cvpn-connection-{index}' for index in range(3, 5003)]
+
+    def test_rewrite_is_atomic(self, monkeypatch):
+        connection_handler._write_spool([event(1), event(2)])
+
+        def failing_replace(source, destination):
+            raise OSError('disk full')
+
+        monkeypatch.setattr(connection_handler.os, 'replace', failing_replace)
+        connection_handler._write_spool([event(3)])
+        # 교체에 실패해도 기존 보관 파일은 그대로
+        assert spooled_ids() == ['cvpn-connection-1', 'cvpn-connection-2']
+
+    def test_empty_write_removes_spool(self):
+        connection_handler._write_spool([event(1)])
+        connection_handler._write_spool([])
+        assert not os.path.exists(connection_handler.SPOOL_PATH)
+
+    def test_truncated_line_is_skipped(self):
+        with open(connection_handler.SPOOL_PATH, 'w') as spool:
+            spool.write(json.dumps(event(1)) + '\n{"username": "al')
+        assert spooled_ids() == ['cvpn-connection-1']
+
+
+class TestDeliver:
+    def test_success_trims_replayed_events(self, monkeypatch):
+        monkeypatch.setattr(connection_handler, 'REPLAY_BATCH_SIZE', 2)
+        connection_handler._write_spool([event(1), event(2), event(3)])
+        pool = use_pool(monkeypatch, 202)
+
+        summary = connection_handler.deliver(event(4))
+        assert summary == {'sent': 3, 'spooled': 0, 'dropped': 0}
+        assert [sent['connection_id'] for sent in pool.batches[0]] == [
+            'cvpn-connection-1', 'cvpn-connection-2', 'cvpn-connection-4',
+        ]
+        assert spooled_ids() == ['cvpn-connection-3']
+
+    def test_bad_request_drops_batch(self, monkeypatch):
+        connection_handler._write_spool([event(1)])
+        use_pool(monkeypatch, 400)
+
+        summary = connection_handler.deliver(event(2))
+        assert summary == {'sent': 0, 'spooled': 0, 'dropped': 2}
+        assert spooled_ids() == []
+
+    def test_unreachable_backend_spools_without_counting(self, monkeypatch):
+        use_pool(monkeypatch, ConnectionError('refused'))
+        for index in range(10):
+            connection_handler.deliver(event(index))
+        assert len(spooled_ids()) == 10
+        assert all(connection_handler.ATTEMPTS_KEY not in spooled for spooled in connection_handler._read_spool())
+
+    def test_error_responses_are_dropped_after_max_attempts(self, monkeypatch):
+        pool = use_pool(monkeypatch, 500)
+        connection_handler.deliver(event(1))
+        for _ in range(3):
+            connection_handler.deliver(None)
+        assert spooled_ids() == ['cvpn-connection-1']
+
+        summary = connection_handler.deliver(None)
+        assert summary == {'sent': 0, 'spooled': 0, 'dropped': 1}
+        assert spooled_ids() == []
+        # 실패 횟수는 보관 파일에만 남기고 백엔드로는 보내지 않음
+        assert all(connection_handler.ATTEMPTS_KEY not in sent for batch in pool.batches for sent in batch)
+
+    def test_failing_head_does_not_block_later_events(self, monkeypatch):
+        monkeypatch.setattr(connection_handler, 'REPLAY_BATCH_SIZE', 1)
+        use_pool(monkeypatch, 500)
+        connection_handler.deliver(event(1))
+        connection_handler.deliver(event(2))
+
+        pool = use_pool(monkeypatch, 202)
+        for _ in range(3):
+            connection_handler.deliver(None)
+        assert [sent['connection_id'] for batch in pool.batches for sent in batch] == [
+            'cvpn-connection-1', 'cvpn-connection-2',
+        ]
+        assert spooled_ids() == []
+
+    def test_payload_too_large_halves_replay_batch(self, monkeypatch):
+        connection_handler._write_spool([event(index) for index in range(100)])
+        pool = use_pool(monkeypatch, 413, 202)
+
+        connection_handler.deliver(event(100))
+        assert len(pool.batches[0]) == 101
+        assert connection_handler._replay_batch_size == 50
+        assert len(spooled_ids()) == 101
+
+        connection_handler.deliver(None)
+        assert len(pool.batches[1]) == 50
+        assert len(spooled_ids()) == 51
+
+    def test_ingest_token_is_sent(self, monkeypatch):
+        monkeypatch.setattr(connection_handler, 'CONNECTION_INGEST_TOKEN', 'ingest-secret')
+        pool = use_pool(monkeypatch, 202)
+        connection_handler.deliver(event(1))
+        assert pool.headers[0]['Authorization'] == 'Bearer ingest-secret'
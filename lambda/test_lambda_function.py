@@ -0,0 +1,275 @@
+import json
+
+import pytest
+import urllib3
+
+import lambda_function
+
+
+class StubResponse:
+    def __init__(self, status, payload=None):
+        self.status = status
+        self.data = json.dumps(payload or {}).encode('utf-8')
+
+
+class StubPool:
+    """http.request 대역 (응답 또는 예외를 순서대로 돌려주고 호출 시 timeout 을 기록)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, fields=None, timeout=None):
+        self.calls.append({'method': method, 'url': url, 'fields': fields, 'timeout': timeout})
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeClock:
+    """time.monotonic / time.sleep 대역 (sleep 하면 시계가 그만큼 진행)"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(lambda_function.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(lambda_function.time, 'sleep', fake.sleep)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch):
+    monkeypatch.setattr(lambda_function, '_decision_cache', {})
+    monkeypatch.setattr(lambda_function, 'MAX_RETRIES', 2)
+    monkeypatch.setattr(lambda_function, 'RETRY_BACKOFF', 0.1)
+    monkeypatch.setattr(lambda_function, 'CONNECT_TIMEOUT', 1.0)
+    monkeypatch.setattr(lambda_function, 'READ_TIMEOUT', 3.0)
+    monkeypatch.setattr(lambda_function, 'CACHE_ALLOW_TTL', 300.0)
+    monkeypatch.setattr(lambda_function, 'CACHE_DENY_TTL', 15.0)
+    monkeypatch.setattr(lambda_function, 'CACHE_TIME_RESTRICTION_MAX_TTL', 3600.0)
+
+
+def use_pool(monkeypatch, *outcomes):
+    pool = StubPool(*outcomes)
+    monkeypatch.setattr(lambda_function, 'http', pool)
+    return pool
+
+
+ALLOW = {'allow': True, 'posture-compliance-statuses': [], 'schema-version': 'v3'}
+DENY_SETUP = {'allow': False, 'posture-compliance-statuses': ['requires-2fa-setup'], 'schema-version': 'v3'}
+DENY_TIME = {'allow': False, 'posture-compliance-statuses': ['time-restriction'], 'schema-version': 'v3'}
+DENY_ERROR = {'allow': False, 'posture-compliance-statuses': ['api-response-error'], 'schema-version': 'v3'}
+
+
+class TestRequestWithDeadline:
+    def test_retries_retryable_status_then_returns_success(self, monkeypatch, clock):
+        pool = use_pool(monkeypatch, StubResponse(503), StubResponse(200))
+        response = lambda_function._request_with_deadline('GET', 'http://backend/check-status/', {}, clock.now + 8.0)
+        assert response.status == 200
+        assert len(pool.calls) == 2
+        assert clock.sleeps == [0.1]
+
+    def test_returns_last_response_when_retries_exhausted(self, monkeypatch, clock):
+        pool = use_pool(monkeypatch, StubResponse(503))
+        response = lambda_function._request_with_deadline('GET', 'http://backend/', {}, clock.now + 8.0)
+        assert response.status == 503
+        assert len(pool.calls) == lambda_function.MAX_RETRIES + 1
+        # 마지막 시도 뒤에는 기다리지 않음
+        assert clock.sleeps == [0.1, 0.2]
+
+    def test_non_retryable_status_is_returned_immediately(self, monkeypatch, clock):
+        pool = use_pool(monkeypatch, StubResponse(500), StubResponse(200))
+        response = lambda_function._request_with_deadline('GET', 'http://backend/', {}, clock.now + 8.0)
+        assert response.status == 500
+        assert len(pool.calls) == 1
+
+    def test_attempt_timeouts_share_the_remaining_deadline(self, monkeypatch, clock):
+        error = urllib3.exceptions.ReadTimeoutError(None, '/', 'read timed out')
+        pool = use_pool(monkeypatch, error)
+
+        def slow_request(method, url, fields=None, timeout=None):
+            pool.calls.append({'timeout': timeout, 'started': clock.now})
+            clock.now += timeout.total
+            raise error
+
+        pool.request = slow_request
+        deadline = clock.now + 2.0
+        with pytest.raises(urllib3.exceptions.TimeoutError):
+            lambda_function._request_with_deadline('GET', 'http://backend/', {}, deadline)
+
+        # 첫 시도가 남은 2초를 모두 써서 재시도 없이 마감
+        assert len(pool.calls) == 1
+        first = pool.calls[0]['timeout']
+        assert first.connect_timeout == 1.0
+        assert first.read_timeout == 2.0
+        assert first.total == 2.0
+        assert clock.now <= deadline
+
+    def test_each_attempt_is_capped_by_what_is_left(self, monkeypatch, clock):
+        error = urllib3.exceptions.ProtocolError('connection reset')
+        pool = use_pool(monkeypatch, error)
+
+        def failing_request(method, url, fields=None, timeout=None):
+            pool.calls.append({'timeout': timeout, 'remaining': deadline - clock.now})
+            clock.now += 0.5
+            raise error
+
+        pool.request = failing_request
+        deadline = clock.now + 1.2
+        with pytest.raises(urllib3.exceptions.ProtocolError):
+            lambda_function._request_with_deadline('GET', 'http://backend/', {}, deadline)
+
+        for call in pool.calls:
+            assert call['timeout'].total == pytest.approx(call['remaining'])
+            assert call['timeout'].connect_timeout <= call['remaining']
+        assert clock.now <= deadline + 0.5
+
+    def test_expired_deadline_makes_no_request(self, monkeypatch, clock):
+        pool = use_pool(monkeypatch, StubResponse(200))
+        with pytest.raises(urllib3.exceptions.TimeoutError):
+            lambda_function._request_with_deadline('GET', 'http://backend/', {}, clock.now)
+        assert pool.calls == []
+
+    def test_backoff_is_skipped_when_it_would_pass_the_deadline(self, monkeypatch, clock):
+        pool = use_pool(monkeypatch, StubResponse(503))
+        response = lambda_function._request_with_deadline('GET', 'http://backend/', {}, clock.now + 0.05)
+        assert response.status == 503
+        assert clock.sleeps == []
+        assert len(pool.calls) == lambda_function.MAX_RETRIES + 1
+
+
+class TestComputeDeadline:
+    def test_lambda_remaining_time_caps_the_budget(self, clock):
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 2500
+
+        deadline = lambda_function._compute_deadline(Context())
+        assert deadline == pytest.approx(clock.now + 2.5 - lambda_function.DEADLINE_SAFETY_MARGIN)
+
+    def test_configured_budget_without_context(self, clock):
+        assert lambda_function._compute_deadline(None) == pytest.approx(clock.now + lambda_function.DEADLINE_SECONDS)
+
+
+class TestDecisionCache:
+    def test_allow_uses_allow_ttl(self, clock):
+        lambda_function._cache_put('alice', ALLOW, None)
+        clock.now += 299
+        assert lambda_function._cache_get('alice') == ALLOW
+        clock.now += 1
+        assert lambda_function._cache_get('alice') is None
+        assert 'alice' not in lambda_function._decision_cache
+
+    def test_deny_uses_deny_ttl(self, clock):
+        lambda_function._cache_put('bob', DENY_SETUP, None)
+        clock.now += 14
+        assert lambda_function._cache_get('bob') == DENY_SETUP
+        clock.now += 1
+        assert lambda_function._cache_get('bob') is None
+
+    def test_hint_shorter_than_ttl_wins(self, clock):
+        lambda_function._cache_put('alice', ALLOW, 60)
+        clock.now += 60
+        assert lambda_function._cache_get('alice') is None
+
+    def test_hint_longer_than_ttl_is_clamped(self, clock):
+        lambda_function._cache_put('alice', ALLOW, 86400)
+        clock.now += 300
+        assert lambda_function._cache_get('alice') is None
+
+        lambda_function._cache_put('bob', DENY_SETUP, 86400)
+        clock.now += 15
+        assert lambda_function._cache_get('bob') is None
+
+    def test_time_restriction_deny_follows_hint_up_to_cap(self, clock):
+        lambda_function._cache_put('carol', DENY_TIME, 1800)
+        clock.now += 1799
+        assert lambda_function._cache_get('carol') == DENY_TIME
+        clock.now += 1
+        assert lambda_function._cache_get('carol') is None
+
+        lambda_function._cache_put('carol', DENY_TIME, 7 * 86400)
+        clock.now += 3600
+        assert lambda_function._cache_get('carol') is None
+
+    def test_time_restriction_without_hint_uses_deny_ttl(self, clock):
+        lambda_function._cache_put('carol', DENY_TIME, None)
+        clock.now += 15
+        assert lambda_function._cache_get('carol') is None
+
+    def test_zero_hint_is_not_cached_and_evicts_previous_entry(self, clock):
+        lambda_function._cache_put('dave', DENY_SETUP, None)
+        lambda_function._cache_put('dave', DENY_SETUP, 0)
+        assert lambda_function._cache_get('dave') is None
+
+    def test_api_response_error_is_never_cached(self, clock):
+        lambda_function._cache_put('erin', DENY_ERROR, None)
+        lambda_function._cache_put('erin', DENY_ERROR, 300)
+        assert lambda_function._cache_get('erin') is None
+
+    def test_cached_result_is_a_copy(self, clock):
+        lambda_function._cache_put('alice', ALLOW, None)
+        lambda_function._cache_get('alice')['allow'] = False
+        assert lambda_function._cache_get('alice')['allow'] is True
+
+    def test_full_cache_evicts_oldest_entry(self, monkeypatch, clock):
+        monkeypatch.setattr(lambda_function, 'CACHE_MAX_ENTRIES', 2)
+        lambda_function._cache_put('a', ALLOW, None)
+        lambda_function._cache_put('b', ALLOW, None)
+        lambda_function._cache_put('c', ALLOW, None)
+        assert set(lambda_function._decision_cache) == {'b', 'c'}
+
+
+class TestHandler:
+    def test_second_invocation_is_served_from_cache(self, monkeypatch, clock, capsys):
+        pool = use_pool(monkeypatch, StubResponse(200, {'success': True, 'has_2fa': True, 'is_enabled': True}))
+        event = {'username': 'alice', 'public-ip': '203.0.113.10'}
+
+        assert lambda_function.lambda_handler(dict(event), None)['allow'] is True
+        assert lambda_function.lambda_handler(dict(event), None)['allow'] is True
+        assert len(pool.calls) == 1
+        assert lambda_function._timings['cache_hit'] is True
+
+    def test_backend_error_response_is_not_cached(self, monkeypatch, clock, capsys):
+        pool = use_pool(monkeypatch, StubResponse(200, {'success': False, 'error': 'boom'}))
+        event = {'username': 'alice', 'public-ip': '203.0.113.10'}
+
+        result = lambda_function.lambda_handler(dict(event), None)
+        assert result['posture-compliance-statuses'] == ['api-response-error']
+        lambda_function.lambda_handler(dict(event), None)
+        assert len(pool.calls) == 2
+
+    def test_inactive_user_is_denied_and_cached(self, monkeypatch, clock, capsys):
+        pool = use_pool(monkeypatch, StubResponse(200, {
+            'success': False, 'has_2fa': False, 'is_enabled': False, 'error_code': 'USER_INACTIVE',
+        }))
+        event = {'username': 'leaver', 'public-ip': '203.0.113.12'}
+
+        result = lambda_function.lambda_handler(dict(event), None)
+        assert result['allow'] is False
+        assert result['posture-compliance-statuses'] == ['user-inactive']
+        lambda_function.lambda_handler(dict(event), None)
+        assert len(pool.calls) == 1
+
+    def test_backend_cache_ttl_hint_is_applied(self, monkeypatch, clock, capsys):
+        pool = use_pool(monkeypatch, StubResponse(200, {
+            'success': True, 'has_2fa': False, 'is_enabled': False, 'requires_setup': True, 'cache_ttl': 0,
+        }))
+        event = {'username': 'newbie', 'public-ip': '203.0.113.11'}
+
+        lambda_function.lambda_handler(dict(event), None)
+        lambda_function.lambda_handler(dict(event), None)
+        assert len(pool.calls) == 2